@@ -4,7 +4,6 @@ from flask_login import LoginManager
 from flask_migrate import Migrate
 from config import config
 import markdown
-import re
 
 # Initialize extensions
 db = SQLAlchemy()
@@ -20,43 +19,46 @@ def create_app(config_name='development'):
     login_manager.init_app(app)
     migrate.init_app(app, db)
     
+    # Per-request stage timings (request log line + Server-Timing header)
+    from app import instrumentation
+    instrumentation.init_app(app)
+    
+    # Shopping search backend (SerpAPI or the offline fixture catalog)
+    from app.services import shopping_providers
+    shopping_providers.init_app(app)
+    
     # Configure login manager
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     
     # Add custom template filters
-    @app.template_filter('markdown')
-    def markdown_filter(text):
-        """Convert markdown to HTML, with basic formatting support."""
-        if not text:
-            return text
-        
-        # Simple markdown-like replacements
-        # Convert **text** to <strong>text</strong>
-        text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
-        
-        # Convert *text* to <em>text</em>
-        text = re.sub(r'\*(.*?)\*', r'<em>\1</em>', text)
-        
-        # Convert newlines to <br> tags
-        text = text.replace('\n', '<br>')
-        
-        return text
+    # Convert markdown to HTML (bold, emphasis and line breaks) in one pass
+    from app.utils.outfit_parser import render_markdown
+    app.add_template_filter(render_markdown, 'markdown')
+    
+    # External images are served through the local image proxy and cache
+    from app.services.image_proxy import proxied_image_url
+    app.add_template_filter(proxied_image_url, 'proxied_image')
     
     # Import models to ensure they're registered with SQLAlchemy
     from app.models import user, closet
     from app.models.trip import Trip
+    from app.models.job import GenerationJob
     
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.main import main_bp
     from app.routes.recommendations import recommendations_bp
     from app.routes.closet import closet_bp
+    from app.routes.metrics import metrics_bp
+    from app.routes.images import images_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(recommendations_bp)
     app.register_blueprint(closet_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(images_bp)
     
     # User loader for Flask-Login
     @login_manager.user_loader
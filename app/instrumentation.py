@@ -0,0 +1,185 @@
+"""
+Lightweight latency instrumentation for the recommendation pipeline.
+
+Services wrap upstream calls and expensive steps in ``span('name')`` (or the
+``timed('name')`` decorator). Each span adds its wall time and a call count to
+the collector of the current request, which is written to the request log line
+and the ``Server-Timing`` response header, and to a process-wide sample window
+used for percentile summaries.
+"""
+import math
+import time
+import logging
+import threading
+import contextvars
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# Samples kept per stage for percentile summaries
+SAMPLE_WINDOW = 1000
+
+_current_collector = contextvars.ContextVar('timing_collector', default=None)
+
+class TimingCollector:
+    """Per-request (or per-job) wall time and call count for each stage."""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total, count = self._stages.get(name, (0.0, 0))
+            self._stages[name] = (total + seconds, count + 1)
+
+    def stages(self):
+        """Snapshot of ``{stage: (total_seconds, count)}`` in first-recorded order."""
+        with self._lock:
+            return dict(self._stages)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        """Compact text form used in log lines."""
+        return ' '.join(
+            f"{name}={total * 1000:.0f}ms/{count}"
+            for name, (total, count) in self.stages().items()
+        )
+
+    def server_timing(self):
+        """Value for the Server-Timing response header."""
+        return ', '.join(
+            f'{name};dur={total * 1000:.1f};desc="{count} call{"s" if count != 1 else ""}"'
+            for name, (total, count) in self.stages().items()
+        )
+
+class StageStats:
+    """Process-wide rolling window of span durations for percentile reporting."""
+
+    def __init__(self, window=SAMPLE_WINDOW):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def summary(self, percentiles=(50, 90, 95, 99)):
+        """``{stage: {'count', 'p50_ms', ...}}`` over the current sample window."""
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+        result = {}
+        for name, samples in snapshot.items():
+            stats = {'count': counts[name], 'samples': len(samples)}
+            for p in percentiles:
+                stats[f'p{p}_ms'] = round(percentile(samples, p) * 1000, 1)
+            result[name] = stats
+        return result
+
+def percentile(sorted_samples, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+stage_stats = StageStats()
+
+def record(name, seconds):
+    """Record a duration for ``name`` on the current collector and the global stats."""
+    collector = _current_collector.get()
+    if collector is not None:
+        collector.add(name, seconds)
+    stage_stats.record(name, seconds)
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as stage ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+def timed(name):
+    """Decorator form of ``span``."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+_metrics_sources = {}
+
+def register_metrics_source(name, func):
+    """Expose ``func()`` (returning a JSON-serializable dict) under ``name`` in ``metrics_snapshot``."""
+    _metrics_sources[name] = func
+
+def metrics_snapshot():
+    """Stage percentiles plus every registered metrics source."""
+    snapshot = {'stages': stage_stats.summary()}
+    for name, func in _metrics_sources.items():
+        try:
+            snapshot[name] = func()
+        except Exception as e:
+            logger.error(f"Metrics source {name} failed: {e}")
+    return snapshot
+
+@contextmanager
+def collect_timings():
+    """Collect spans recorded inside the block (used by the job worker)."""
+    collector = TimingCollector()
+    token = _current_collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _current_collector.reset(token)
+
+def init_app(app):
+    """Attach a collector to every request and report it when the response goes out."""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timings():
+        g.timing_collector = TimingCollector()
+        g.timing_token = _current_collector.set(g.timing_collector)
+
+    @app.after_request
+    def report_request_timings(response):
+        collector = g.pop('timing_collector', None)
+        if collector is None:
+            return response
+        stages = collector.server_timing()
+        total = f'total;dur={collector.elapsed() * 1000:.1f}'
+        response.headers['Server-Timing'] = f'{stages}, {total}' if stages else total
+        if not request.path.startswith('/static'):
+            logger.info(
+                f"{request.method} {request.path} {response.status_code} "
+                f"{collector.elapsed() * 1000:.0f}ms {collector.summary()}".rstrip()
+            )
+        return response
+
+    @app.teardown_request
+    def clear_request_timings(exc=None):
+        token = g.pop('timing_token', None)
+        if token is not None:
+            try:
+                _current_collector.reset(token)
+            except ValueError:
+                # Streamed responses finish in a different context; just detach
+                _current_collector.set(None)
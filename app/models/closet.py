@@ -9,8 +9,9 @@ class ClosetItem(db.Model):
     item_type = db.Column(db.String(50))  # e.g., "top", "bottom", "shoes", "accessories"
     source = db.Column(db.String(50))    # Store name
     
-    # Add unique constraint to prevent exact duplicates
-    __table_args__ = (db.UniqueConstraint('user_id', 'title', 'source', name='unique_user_item'),)
+    # Add unique constraint to prevent exact duplicates; the index serves closet pages (fetch_closet_page_orm)
+    __table_args__ = (db.UniqueConstraint('user_id', 'title', 'source', name='unique_user_item'),
+                      db.Index('ix_closet_item_user_type_title', 'user_id', 'item_type', 'title', 'id'))
     
     def __repr__(self):
         return f"ClosetItem('{self.title}', type='{self.item_type}', user_id={self.user_id})"
@@ -0,0 +1,57 @@
+from app import db
+import json
+
+class GenerationJob(db.Model):
+    """Queued recommendation generation job processed by the background worker."""
+    __tablename__ = 'generation_job'
+    # Named so migrations can drop it whichever way the table was created
+    __table_args__ = (db.UniqueConstraint('active_key', name='uq_generation_job_active_key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, completed, failed
+    stage = db.Column(db.String(20))  # current pipeline stage while running
+    payload = db.Column(db.Text)  # JSON string of trip_data and user_profile
+    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id'))
+    error = db.Column(db.Text)
+    fingerprint = db.Column(db.String(64))  # plan_fingerprint of the trip being generated
+    # "<user_id>:<fingerprint>" while queued/running, NULL once finished; the unique
+    # constraint stops the same user generating the same plan twice concurrently
+    active_key = db.Column(db.String(100))
+    worker_id = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+    TERMINAL_STATUSES = ('completed', 'failed')
+
+    def get_payload(self):
+        """Get parsed job payload as Python dict."""
+        if self.payload:
+            try:
+                return json.loads(self.payload)
+            except json.JSONDecodeError:
+                return {}
+        return {}
+
+    def set_payload(self, data):
+        """Set job payload as JSON string."""
+        self.payload = json.dumps(data) if data else None
+
+    @property
+    def is_finished(self):
+        return self.status in self.TERMINAL_STATUSES
+
+    def to_status_dict(self):
+        """Status fields exposed to the polling/SSE endpoints."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'trip_id': self.trip_id,
+            'error': self.error
+        }
+
+    def __repr__(self):
+        return f"GenerationJob({self.id}, status='{self.status}', user_id={self.user_id})"
@@ -1,9 +1,22 @@
 from app import db
 from app.models.user import User
+from app.models.weather import WeatherSeries
+from sqlalchemy.orm import selectinload, undefer_group
+from datetime import datetime
 import json
 
+# Keys of an outfit_data dict that are stored in the trip_day / trip_shopping_item tables
+NORMALIZED_KEYS = ('days', 'outfit_data', 'rendered_html')
+# Shopping item fields with their own columns; anything else is kept in ``details``
+SHOPPING_ITEM_COLUMNS = ('title', 'price', 'source', 'thumbnail', 'link', 'product_id')
+# Longest preview stored in Trip.summary
+SUMMARY_LENGTH = 200
+
 class Trip(db.Model):
     """Trip model for Flask-SQLAlchemy ORM."""
+    # Serves the newest-first keyset pages of a user's trips (fetch_trips_page_orm)
+    __table_args__ = (db.Index('ix_trip_user_created', 'user_id', 'created_at', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     city = db.Column(db.String(100), nullable=False)
@@ -12,28 +25,205 @@ class Trip(db.Model):
     age = db.Column(db.Integer)
     activities = db.Column(db.Text)
     duration = db.Column(db.Integer)
-    weather = db.Column(db.Text)
-    recommendations = db.Column(db.Text)
-    
-    # New fields for storing outfit data
-    outfit_data = db.Column(db.Text)  # JSON string of outfit images and shopping items
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # The large columns are deferred: list pages never load them, and the first
+    # access on a trip loads all three in one query (see Trip.with_content())
+    weather = db.deferred(db.Column(db.Text), group='content')  # WeatherSeries.to_json() (plain summary text on older trips)
+    recommendations = db.deferred(db.Column(db.Text), group='content')
+
+    # JSON of outfit data not kept in trip_day rows (e.g. an overall outfit image),
+    # or the whole outfit data for trips saved before the tables were added
+    outfit_data = db.deferred(db.Column(db.Text), group='content')
+    # Short plain-text preview for list pages, set on save (see build_summary)
+    summary = db.Column(db.String(SUMMARY_LENGTH + 1))
+    # Set in Python so SQLite stores every value in one format that page cursors can compare against
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Hash of the trip plan + profile that produced this trip (see plan_fingerprint)
+    plan_fingerprint = db.Column(db.String(64), index=True)
     
     # Relationship to User
     user = db.relationship('User', backref=db.backref('trips', lazy=True))
-    
-    def get_outfit_data(self):
-        """Get parsed outfit data as Python dict."""
+    # Days load only when accessed; pages showing them use Trip.with_days()
+    days = db.relationship('TripDay', backref='trip', order_by='TripDay.position',
+                           cascade='all, delete-orphan', lazy='select')
+
+    @staticmethod
+    def with_content():
+        """Loader option fetching the deferred content columns with the trip itself."""
+        return undefer_group('content')
+
+    @staticmethod
+    def with_days():
+        """Loader option fetching days and their shopping items in two extra queries (no per-day queries)."""
+        return selectinload(Trip.days).selectinload(TripDay.shopping_items)
+
+    def _stored_json(self):
         if self.outfit_data:
             try:
                 return json.loads(self.outfit_data)
             except json.JSONDecodeError:
                 return {}
         return {}
-    
+
+    def get_outfit_data(self):
+        """
+        Get outfit data as a Python dict: ``days``, ``outfit_data`` (day title ->
+        content and shopping) and ``rendered_html`` assembled from the trip's
+        day rows, plus any other stored keys. Trips without day rows return
+        their stored JSON unchanged.
+        """
+        data = self._stored_json()
+        if not self.days:
+            return data
+        if not isinstance(data, dict):
+            data = {}
+        data['days'] = [day.to_dict() for day in self.days]
+        data['outfit_data'] = {
+            day.title: {'content': day.content, 'shopping': [item.to_dict() for item in day.shopping_items]}
+            for day in self.days
+        }
+        versions = {day.renderer_version for day in self.days}
+        if len(versions) == 1 and None not in versions:
+            data['rendered_html'] = {
+                'version': versions.pop(),
+                'days': {day.title: day.rendered_html for day in self.days}
+            }
+        return data
+
     def set_outfit_data(self, data):
-        """Set outfit data as JSON string."""
-        self.outfit_data = json.dumps(data) if data else None
+        """
+        Store outfit data: days and their shopping items as rows, the remaining
+        keys as JSON. Data without a ``days`` list (legacy shapes) is stored as JSON.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get('days'), list):
+            self.days = []
+            self.outfit_data = json.dumps(data) if data else None
+            return
+        shopping = data.get('outfit_data') or {}
+        rendered = data.get('rendered_html') or {}
+        rendered_days = rendered.get('days') or {}
+        self.days = [
+            TripDay.from_dict(position, day, (shopping.get(day.get('title')) or {}).get('shopping') or [],
+                              rendered_days.get(day.get('title')), rendered.get('version'))
+            for position, day in enumerate(data['days'])
+        ]
+        rest = {key: value for key, value in data.items() if key not in NORMALIZED_KEYS}
+        self.outfit_data = json.dumps(rest) if rest else None
+
+    def set_rendered_html(self, rendered_html):
+        """Store pre-rendered day HTML (see render_days_html) on the trip's days."""
+        if not self.days:
+            data = self.get_outfit_data()
+            if isinstance(data, list):
+                data = {'days': data}
+            self.set_outfit_data(dict(data, rendered_html=rendered_html))
+            return
+        for day in self.days:
+            day.rendered_html = rendered_html['days'].get(day.title)
+            day.renderer_version = rendered_html['version']
     
+    def get_weather(self):
+        """Get stored weather as a WeatherSeries."""
+        return WeatherSeries.from_json(self.weather)
+
+    def build_summary(self):
+        """
+        Preview shown on list pages: the day headings of the recommendations,
+        or their first line when they have no days. Empty when there's nothing to show.
+        """
+        from app.utils.outfit_parser import parse_response
+
+        document = parse_response(self.recommendations)
+        parts = list(dict.fromkeys(day.heading for day in document.days if day.heading))
+        if parts:
+            summary = ' · '.join(parts)
+        else:
+            summary = next((line.strip('*# ') for line in document.preamble.splitlines() if line.strip('*# ')), '')
+        if len(summary) > SUMMARY_LENGTH:
+            summary = summary[:SUMMARY_LENGTH - 1].rstrip() + '…'
+        return summary
+
     def __repr__(self):
         return f"Trip('{self.city}', '{self.region}', user_id={self.user_id})"
+
+class TripDay(db.Model):
+    """One day of a trip's recommendations."""
+    __tablename__ = 'trip_day'
+
+    id = db.Column(db.Integer, primary_key=True)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # order within the trip, from 0
+    title = db.Column(db.String(300))
+    content = db.Column(db.Text)
+    details = db.Column(db.Text)  # JSON of other day fields (e.g. parsed outfit items)
+    rendered_html = db.Column(db.Text)  # content rendered by render_markdown
+    renderer_version = db.Column(db.Integer)  # RENDERER_VERSION that produced rendered_html
+
+    # Shopping items are always shown with their day, so load them with it
+    shopping_items = db.relationship('TripShoppingItem', backref='day', order_by='TripShoppingItem.position',
+                                     cascade='all, delete-orphan', lazy='selectin')
+
+    @classmethod
+    def from_dict(cls, position, day, shopping=(), rendered_html=None, renderer_version=None):
+        """Row for a day dict, its shopping item dicts and optional pre-rendered HTML."""
+        details = {key: value for key, value in day.items() if key not in ('title', 'content')}
+        return cls(
+            position=position,
+            title=day.get('title'),
+            content=day.get('content'),
+            details=json.dumps(details) if details else None,
+            rendered_html=rendered_html,
+            renderer_version=renderer_version if rendered_html is not None else None,
+            shopping_items=[TripShoppingItem.from_dict(index, item) for index, item in enumerate(shopping)]
+        )
+
+    def to_dict(self):
+        """The day dict this row was stored from."""
+        day = json.loads(self.details) if self.details else {}
+        day.update(title=self.title, content=self.content)
+        return day
+
+    def __repr__(self):
+        return f"TripDay({self.trip_id}, {self.position}, '{self.title}')"
+
+class TripShoppingItem(db.Model):
+    """A product suggested for one day of a trip, with its purchase options."""
+    __tablename__ = 'trip_shopping_item'
+
+    id = db.Column(db.Integer, primary_key=True)
+    trip_day_id = db.Column(db.Integer, db.ForeignKey('trip_day.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # order within the day, from 0
+    title = db.Column(db.String(500))
+    price = db.Column(db.String(50))
+    source = db.Column(db.String(200))
+    thumbnail = db.Column(db.Text)
+    link = db.Column(db.Text)
+    product_id = db.Column(db.String(100), index=True)
+    purchase_options = db.Column(db.Text)  # JSON list of {source, link, price}
+    details = db.Column(db.Text)  # JSON of other product fields (rating, reviews, delivery, ...)
+
+    @classmethod
+    def from_dict(cls, position, item):
+        """Row for a shopping item dict as built by the shopping pipeline."""
+        item = dict(item)
+        columns = {key: item.pop(key, None) for key in SHOPPING_ITEM_COLUMNS}
+        purchase_options = item.pop('purchase_options', None)
+        return cls(
+            position=position,
+            purchase_options=json.dumps(purchase_options) if purchase_options is not None else None,
+            details=json.dumps(item) if item else None,
+            **columns
+        )
+
+    def get_purchase_options(self):
+        return json.loads(self.purchase_options) if self.purchase_options else []
+
+    def to_dict(self):
+        """The shopping item dict this row was stored from."""
+        item = json.loads(self.details) if self.details else {}
+        item.update({key: getattr(self, key) for key in SHOPPING_ITEM_COLUMNS})
+        if self.purchase_options is not None:
+            item['purchase_options'] = self.get_purchase_options()
+        return item
+
+    def __repr__(self):
+        return f"TripShoppingItem({self.trip_day_id}, {self.position}, '{self.title}')"
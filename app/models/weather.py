@@ -0,0 +1,139 @@
+"""
+Structured weather records.
+Plain value objects (not database tables) for a trip's daily forecast, so
+prompting, caching and display code can work with numbers and only format
+text at the edges.
+"""
+import json
+from datetime import date, timedelta
+
+# Version of the compact JSON layout produced by WeatherSeries.to_json
+SERIES_FORMAT_VERSION = 1
+
+class WeatherDay:
+    """One day of forecast (or historical-normal) weather."""
+    __slots__ = ('date', 'high', 'low', 'conditions', 'precip_prob', 'normal')
+
+    def __init__(self, date, high=None, low=None, conditions=None, precip_prob=None, normal=False):
+        self.date = date  # "YYYY-MM-DD"
+        self.high = high  # °F
+        self.low = low  # °F
+        self.conditions = conditions
+        self.precip_prob = precip_prob  # percent
+        self.normal = normal  # True when from historical averages rather than a forecast
+
+    @classmethod
+    def from_api(cls, record):
+        """Build from a VisualCrossing timeline ``days`` entry."""
+        return cls(
+            date=record.get('datetime'),
+            high=record.get('tempmax'),
+            low=record.get('tempmin'),
+            conditions=record.get('conditions'),
+            precip_prob=record.get('precipprob', 'N/A'),
+            normal='normal' in str(record.get('source', '')).lower()
+        )
+
+    def format(self):
+        """Summary line used in prompts and plain-text displays."""
+        source_note = " (historical average)" if self.normal else ""
+        return (
+            f"{self.date}: high {self.high}°F, low {self.low}°F, {self.conditions} "
+            f"(precip chance {self.precip_prob}%){source_note}"
+        )
+
+    def __str__(self):
+        return self.format()
+
+    def __eq__(self, other):
+        return isinstance(other, WeatherDay) and all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+    def __repr__(self):
+        return f"WeatherDay('{self.date}', high={self.high}, low={self.low}, conditions='{self.conditions}')"
+
+class WeatherSeries:
+    """
+    Weather for a trip's date range.
+
+    ``message`` carries text shown instead of days, e.g. an API error or a
+    trip saved before weather was stored in structured form.
+    """
+    __slots__ = ('days', 'message')
+
+    def __init__(self, days=None, message=None):
+        self.days = list(days or [])
+        self.message = message
+
+    @classmethod
+    def unavailable(cls, message):
+        return cls(message=message)
+
+    def format(self):
+        """Multi-line summary text; built on demand rather than stored."""
+        if not self.days:
+            return self.message or ''
+        return "\n".join(day.format() for day in self.days)
+
+    def __str__(self):
+        return self.format()
+
+    def __bool__(self):
+        return bool(self.days or self.message)
+
+    def __len__(self):
+        return len(self.days)
+
+    def __iter__(self):
+        return iter(self.days)
+
+    @property
+    def max_high(self):
+        highs = [day.high for day in self.days if isinstance(day.high, (int, float))]
+        return max(highs) if highs else None
+
+    @property
+    def min_low(self):
+        lows = [day.low for day in self.days if isinstance(day.low, (int, float))]
+        return min(lows) if lows else None
+
+    def to_json(self):
+        """
+        Compact storage form: the first date once, then one row per day of
+        ``[day_offset, high, low, conditions, precip_prob, normal]``.
+        """
+        if not self.days:
+            return json.dumps({'v': SERIES_FORMAT_VERSION, 'm': self.message},
+                              separators=(',', ':'), ensure_ascii=False)
+        start = date.fromisoformat(self.days[0].date)
+        rows = [
+            [(date.fromisoformat(day.date) - start).days, day.high, day.low,
+             day.conditions, day.precip_prob, int(day.normal)]
+            for day in self.days
+        ]
+        return json.dumps({'v': SERIES_FORMAT_VERSION, 's': start.isoformat(), 'd': rows},
+                          separators=(',', ':'), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        """Load a stored series; legacy plain-text summaries come back as ``message``."""
+        if not text:
+            return cls()
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError):
+            return cls(message=text)
+        if not isinstance(data, dict) or 'v' not in data:
+            return cls(message=text)
+        if 'd' not in data:
+            return cls(message=data.get('m'))
+        start = date.fromisoformat(data['s'])
+        return cls(days=[
+            WeatherDay((start + timedelta(days=offset)).isoformat(), high, low,
+                       conditions, precip_prob, bool(normal))
+            for offset, high, low, conditions, precip_prob, normal in data['d']
+        ])
+
+    def __repr__(self):
+        return f"WeatherSeries({len(self.days)} days)"
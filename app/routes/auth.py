@@ -5,7 +5,8 @@ from app import db
 from app.models.user import User
 from app.models.closet import ClosetItem
 from app.forms import RegistrationForm, LoginForm
-import requests
+from app.utils.http_client import http_client
+from app.utils.rate_limiter import rate_limiter
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -162,8 +163,12 @@ def starter_closet():
 
     products = []
     for category in categories:
-        res = requests.get(f'https://dummyjson.com/products/category/{category}?limit=55')
-        products += res.json().get('products', [])
+        try:
+            rate_limiter.acquire('dummyjson')
+            res = http_client.get(f'https://dummyjson.com/products/category/{category}?limit=55')
+            products += res.json().get('products', [])
+        except Exception as e:
+            print(f"Could not load starter closet category {category}: {e}")
 
     return render_template('starter-closet.html', products=products)
 
@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app import db
 from app.models.closet import ClosetItem
+from app.services.database_service import (
+    fetch_closet_page_orm, count_closet_items_orm, DatabaseError, DatabaseValidationError
+)
 from sqlalchemy.exc import IntegrityError
 
 closet_bp = Blueprint('closet', __name__)
@@ -112,35 +115,65 @@ def update_item_category(item_id):
 def view_closet():
     # Get filter parameter
     filter_category = request.args.get('filter', '')
+    category = filter_category if filter_category and filter_category != 'all' else None
     
-    # Get ALL user's items first (to check if they have any items at all)
-    all_user_items = ClosetItem.query.filter_by(user_id=current_user.id).all()
-    has_any_items = len(all_user_items) > 0
-    
-    # Get items organized by category (with filter applied)
-    query = ClosetItem.query.filter_by(user_id=current_user.id)
-    
-    if filter_category and filter_category != 'all':
-        query = query.filter_by(item_type=filter_category)
-    
-    items = query.order_by(ClosetItem.item_type, ClosetItem.title).all()
-    
-    # Group items by category
-    items_by_category = {}
-    for item in items:
-        category = item.item_type or 'other'
-        if category not in items_by_category:
-            items_by_category[category] = []
-        items_by_category[category].append(item)
+    # Item counts per category from one grouped query, instead of loading every item
+    try:
+        category_counts = closet_category_counts(current_user.id)
+        # First page of items (with filter applied); the rest load from closet_items as the grid scrolls
+        items, next_cursor = fetch_closet_page_orm(current_user.id, category)
+    except DatabaseError:
+        flash('Could not load your closet. Please try again.', 'error')
+        category_counts, items, next_cursor = {}, [], None
+    total_user_items = sum(category_counts.values())
     
     # Define standard categories (same as dropdown options)
     standard_categories = ['top', 'bottom', 'dress', 'shoe', 'accessory', 'jewelry', 'other']
     
     # Always show all standard categories as filter options
     return render_template('closet.html', 
-                         items_by_category=items_by_category, 
-                         total_items=len(items),
+                         items=items,
+                         category_counts=category_counts,
+                         total_items=category_counts.get(category, 0) if category else total_user_items,
                          all_categories=standard_categories,
                          current_filter=filter_category,
-                         has_any_items=has_any_items,
-                         total_user_items=len(all_user_items))
+                         has_any_items=total_user_items > 0,
+                         total_user_items=total_user_items,
+                         next_url=closet_page_url(filter_category, next_cursor))
+
+@closet_bp.route('/closet/items')
+@login_required
+def closet_items():
+    """JSON page of closet item cards after ``cursor``: the rendered cards, the items and the next page's URL."""
+    filter_category = request.args.get('filter', '')
+    category = filter_category if filter_category and filter_category != 'all' else None
+    try:
+        items, next_cursor = fetch_closet_page_orm(current_user.id, category, request.args.get('cursor'))
+    except DatabaseValidationError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except DatabaseError:
+        return jsonify({'success': False, 'message': 'Could not load closet items'}), 500
+    return jsonify({
+        'success': True,
+        'html': ''.join(render_template('closet_item_card.html', item=item) for item in items),
+        'items': [
+            {'id': item.id, 'title': item.title, 'price': item.price, 'image_url': item.image_url,
+             'item_type': item.item_type, 'source': item.source}
+            for item in items
+        ],
+        'next_url': closet_page_url(filter_category, next_cursor)
+    })
+
+def closet_category_counts(user_id):
+    """Item count per category, with untyped items counted as 'other'."""
+    counts = {}
+    for item_type, count in count_closet_items_orm(user_id).items():
+        category = item_type or 'other'
+        counts[category] = counts.get(category, 0) + count
+    return counts
+
+def closet_page_url(filter_category, cursor):
+    """URL of the closet_items page after ``cursor``, or None when there are no more items."""
+    if not cursor:
+        return None
+    return url_for('closet.closet_items', filter=filter_category or None, cursor=cursor)
@@ -0,0 +1,30 @@
+from flask import Blueprint, Response, request, redirect, abort, current_app
+from app.services.image_proxy import (
+    IMAGE_SIZES, IMAGE_PROXY_MAX_AGE, ImageProxyError, get_proxied_image, verify_image_signature
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+images_bp = Blueprint('images', __name__)
+
+@images_bp.route('/images/<size>')
+def proxy(size):
+    """Serve a cached, resized copy of a signed external image URL."""
+    url = request.args.get('url', '')
+    if size not in IMAGE_SIZES or not verify_image_signature(
+            url, size, request.args.get('sig'), current_app.config['SECRET_KEY']):
+        abort(404)
+    try:
+        image = get_proxied_image(url, size)
+    except ImageProxyError as e:
+        logger.warning(f"Image proxy falling back to source: {e}")
+        # Let the browser try the original; the URL was signed by this server
+        return redirect(url)
+
+    response = Response(image.data, mimetype=image.content_type)
+    response.set_etag(image.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_PROXY_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
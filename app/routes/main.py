@@ -1,7 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, abort
 from flask_login import login_required, current_user
 from app import db
-from app.services.database_service import fetch_trips_by_user_orm, delete_trip_orm, get_trip_by_id_orm
+from app.services.database_service import (
+    fetch_trips_page_orm, count_trips_orm, delete_trip_orm, get_trip_by_id_orm, DatabaseValidationError
+)
+from app.services.recommendation_service import plan_fingerprint
+from app.services.link_health import cached_link_health, collect_outfit_links
+from app.utils.helpers import parse_daily_outfits
+from app.utils.outfit_parser import render_days_html, stored_days_html
 
 main_bp = Blueprint('main', __name__)
 
@@ -83,6 +89,20 @@ def duration():
     
     return render_template('duration.html')
 
+def trip_card(trip):
+    """Fields of a trip list dict shown on its profile card."""
+    location = trip['city']
+    if trip.get('region'):
+        location += f", {trip['region']}"
+    return {
+        'id': trip['id'],
+        'location': location,
+        'activities': trip['activities'].split(',') if trip['activities'] else [],
+        'duration': trip['duration'],
+        'summary': trip['summary'],
+        'created_at': trip['created_at']
+    }
+
 @main_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
@@ -100,26 +120,37 @@ def profile():
 
         return redirect(url_for('main.profile'))
 
-    # Fetch user's trips for display
+    # First page of the user's trips; the rest load from profile_trips as the list scrolls
     try:
-        trips_data = fetch_trips_by_user_orm(current_user.id)
-        trips_to_show = []
-        for trip in trips_data:
-            location = trip['city']
-            if trip.get('region'):
-                location += f", {trip['region']}"
-            trips_to_show.append({
-                'id': trip['id'],
-                'location': location,
-                'activities': trip['activities'].split(',') if trip['activities'] else [],
-                'duration': trip['duration'],
-                'recommendations': trip['recommendations']
-            })
+        trips_data, next_cursor = fetch_trips_page_orm(current_user.id)
+        trips_to_show = [trip_card(trip) for trip in trips_data]
+        trip_count = count_trips_orm(current_user.id)
     except Exception as e:
         print(f"Error fetching trips: {e}")
-        trips_to_show = []
+        trips_to_show, next_cursor, trip_count = [], None, 0
+
+    return render_template('profile.html', user=current_user, trips=trips_to_show, trip_count=trip_count,
+                           next_url=url_for('main.profile_trips', cursor=next_cursor) if next_cursor else None)
 
-    return render_template('profile.html', user=current_user, trips=trips_to_show)
+@main_bp.route('/profile/trips')
+@login_required
+def profile_trips():
+    """JSON page of trip cards after ``cursor``: the rendered cards, the trips and the next page's URL."""
+    try:
+        trips_data, next_cursor = fetch_trips_page_orm(current_user.id, request.args.get('cursor'))
+    except DatabaseValidationError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error fetching trips: {e}")
+        return jsonify({'success': False, 'message': 'Could not load trips'}), 500
+    trips = [trip_card(trip) for trip in trips_data]
+    return jsonify({
+        'success': True,
+        'html': ''.join(render_template('trip_card.html', trip=trip) for trip in trips),
+        'trips': [dict(trip, created_at=trip['created_at'].isoformat() if trip['created_at'] else None)
+                  for trip in trips],
+        'next_url': url_for('main.profile_trips', cursor=next_cursor) if next_cursor else None
+    })
 
 @main_bp.route('/trip/<int:trip_id>/delete', methods=['POST'])
 @login_required
@@ -148,8 +179,8 @@ def delete_trip(trip_id):
 def view_trip(trip_id):
     """View complete trip recommendations"""
     try:
-        # Get trip details
-        trip = get_trip_by_id_orm(trip_id, current_user.id)
+        # Get trip details, with its recommendations, days and shopping items
+        trip = get_trip_by_id_orm(trip_id, current_user.id, full=True)
         if not trip:
             flash('Trip not found or you do not have permission to view it.', 'error')
             return redirect(url_for('main.profile'))
@@ -160,25 +191,6 @@ def view_trip(trip_id):
         if isinstance(outfit_data, list):
             outfit_data = {'days': outfit_data}
 
-        # Get days from outfit_data if available
-        days = outfit_data.get('days', []) if isinstance(outfit_data, dict) else []
-        # Debug: print shopping data for each day
-        for d in days:
-            key = d.get('title')
-            shopping = outfit_data.get('outfit_data', {}).get(key, {}).get('shopping')
-            print(f"[DEBUG] Shopping for '{key}': {shopping}")
-        # Get trip details
-        trip = get_trip_by_id_orm(trip_id, current_user.id)
-        if not trip:
-            flash('Trip not found or you do not have permission to view it.', 'error')
-            return redirect(url_for('main.profile'))
-        
-        # Get outfit data if available - use the model's method
-        outfit_data = trip.get_outfit_data() if hasattr(trip, 'get_outfit_data') else {}
-        # If outfit_data is a list (legacy), wrap in dict for compatibility
-        if isinstance(outfit_data, list):
-            outfit_data = {'days': outfit_data}
-
         # Prepare location string
         location = trip.city
         if trip.region:
@@ -190,6 +202,13 @@ def view_trip(trip_id):
 
         # Get days from outfit_data if available
         days = outfit_data.get('days', []) if isinstance(outfit_data, dict) else []
+        if not days and trip.recommendations:
+            # Trips saved without parsed days are parsed from their stored response
+            days = parse_daily_outfits(trip.recommendations)
+        # Each day carries its own shopping items for the day cards
+        shopping_by_day = (outfit_data.get('outfit_data') or {}) if isinstance(outfit_data, dict) else {}
+        for day in days:
+            day.setdefault('shopping', (shopping_by_day.get(day.get('title')) or {}).get('shopping') or [])
 
         # Debug: print keys in outfit_data['outfit_data'] and day titles
         debug_outfit_keys = []
@@ -199,6 +218,19 @@ def view_trip(trip_id):
         print(f"[DEBUG] outfit_data['outfit_data'] keys: {debug_outfit_keys}")
         print(f"[DEBUG] days titles: {debug_day_titles}")
 
+        # Day HTML rendered when the trip was saved; older trips are rendered once here and stored
+        rendered_days = stored_days_html(outfit_data)
+        if rendered_days is None:
+            rendered_html = render_days_html(days)
+            rendered_days = rendered_html['days']
+            if isinstance(outfit_data, dict) and outfit_data.get('days'):
+                try:
+                    trip.set_rendered_html(rendered_html)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Could not store rendered HTML for trip {trip_id}: {e}")
+
         # Prepare template context
         context = {
             'trip': {
@@ -213,10 +245,19 @@ def view_trip(trip_id):
             'activities': activities_list,
             'outfit_data': outfit_data,
             'days': days,
+            'rendered_days': rendered_days,
             'overall_outfit_image': outfit_data.get('overall_outfit_image', '') if isinstance(outfit_data, dict) else '',
-            'shopping_items': outfit_data.get('shopping_items', []) if isinstance(outfit_data, dict) else []
+            'shopping_items': outfit_data.get('shopping_items', []) if isinstance(outfit_data, dict) else [],
+            # Last known link status from the background checks; never probed while rendering
+            'link_health': cached_link_health(collect_outfit_links(outfit_data))
         }
 
+        # Offer a fresh generation when this trip was made from the plan currently in the session
+        session_trip = session.get('trip_data')
+        if session_trip and trip.plan_fingerprint and \
+                trip.plan_fingerprint == plan_fingerprint(session_trip, session.get('user_profile', {})):
+            context['regenerate_url'] = url_for('recommendations.recommendations', regenerate=1)
+
         return render_template('trip_details.html', **context)
         
     except Exception as e:
@@ -0,0 +1,11 @@
+from flask import Blueprint, jsonify, current_app, abort
+from app.instrumentation import metrics_snapshot
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Per-stage latency percentiles and other process metrics for this worker."""
+    if not current_app.config.get('METRICS_ENABLED'):
+        abort(404)
+    return jsonify(metrics_snapshot())
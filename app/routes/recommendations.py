@@ -1,15 +1,19 @@
-from urllib import response
-from flask import Blueprint, render_template, session, flash, redirect, url_for
-import os, json
-import markdown
+from flask import (Blueprint, render_template, request, session, flash, redirect, url_for,
+                   jsonify, current_app, Response, stream_with_context)
+import json
+import time
 from flask_login import current_user, login_required
-from app.services.weather_service import get_weather_summary
-from app.services.genai_service import build_prompt_from_session, get_recommendations
-from app.services.serp_service import get_overall_outfit_image, get_shopping_items
-from app.services.database_service import add_trip_orm, DatabaseError, DatabaseValidationError
-from app.services.session_service import TripPlanningSession
-from app.utils.helpers import parse_daily_outfits, remove_product_searches_section
-import re
+from app import db
+from app.services.database_service import DatabaseError, DatabaseValidationError, get_trip_by_fingerprint_orm
+from app.services.recommendation_service import (
+    generate_recommendations, save_recommendations, stream_generation, build_template_data,
+    plan_fingerprint
+)
+from app.services.job_service import (
+    start_generation, get_job_for_user, update_job_stage, complete_job, fail_job, INLINE_WORKER_ID
+)
+from app.services.shopping_service import get_purchase_options
+from app.utils.outfit_parser import render_markdown
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,8 +24,7 @@ recommendations_bp = Blueprint('recommendations', __name__)
 @login_required
 def recommendations():
     try:
-        print("=== RECOMMENDATIONS ROUTE DEBUG ===")
-        print(f"Session data: {dict(session)}")
+        logger.debug(f"Recommendations request, session data: {dict(session)}")
         # === PRODUCTION: Use real API/database logic ===
         # Check if all required data is present
         required_fields = ['city', 'start_date', 'end_date', 'days', 'activities']
@@ -31,97 +34,208 @@ def recommendations():
         if missing_fields:
             flash(f'Missing information: {", ".join(missing_fields)}. Please complete your trip planning.', 'error')
             return redirect(url_for('main.destination'))
-        try:
-            weather_summary = get_weather_summary(
-                trip_data['city'],
-                trip_data['region'],
-                trip_data['start_date'],
-                trip_data['end_date']
+
+        # Same plan generated before: serve the stored trip unless a regenerate was asked for
+        fingerprint = plan_fingerprint(trip_data, user_profile)
+        if request.args.get('regenerate') != '1':
+            existing_trip = get_trip_by_fingerprint_orm(current_user.id, fingerprint)
+            if existing_trip:
+                logger.info(f"Serving stored trip {existing_trip.id} for repeated plan")
+                return redirect(url_for('main.view_trip', trip_id=existing_trip.id))
+
+        # Register the generation; a duplicate request waits on the job already in flight
+        jobs_enabled = current_app.config.get('RECOMMENDATION_JOBS_ENABLED')
+        job, created = start_generation(current_user.id, trip_data, user_profile,
+                                        fingerprint, inline=not jobs_enabled)
+        # Background mode: hand the pipeline to the worker and return immediately
+        if jobs_enabled or not created:
+            return redirect(url_for('recommendations.job_page', job_id=job.id))
+
+        # Streaming mode: render the page shell now and push each day as it's generated
+        if current_app.config.get('RECOMMENDATION_STREAMING_ENABLED'):
+            return render_template(
+                'recommendations.html',
+                data=build_template_data(trip_data, user_profile, None),
+                outfit_data={},
+                stream_url=url_for('recommendations.recommendations_stream', job_id=job.id)
             )
-        except Exception as weather_exc:
-            logger.error(f"Error fetching weather summary: {weather_exc}")
-            weather_summary = 'Weather data not available'
-        template_data = {
-            'city': trip_data['city'],
-            'region': trip_data['region'],
-            'start_date': trip_data['start_date'],
-            'end_date': trip_data['end_date'],
-            'days': trip_data['days'],
-            'activities': trip_data['activities'],
-            'weather_summary': weather_summary,
-            'gender': user_profile.get('gender', ''),
-            'age': user_profile.get('age', 'N/A')
-        }
-        trip_data_with_weather = dict(trip_data)
-        trip_data_with_weather['weather_summary'] = weather_summary
-        prompt = build_prompt_from_session(trip_data_with_weather)
-        response = get_recommendations(prompt)
-        print(f"Raw OpenAI response: {response[:200] if response else 'No response'}...")
-        days = parse_daily_outfits(response, template_data['gender'])
-        for day in days:
-            day['content'] = remove_product_searches_section(day['content'])
-        outfit_data = {}
-        for day in days:
-            day_title = day.get('title', 'Day')
-            content = day.get('content', '')
-            gender = template_data.get('gender', '')
-            import re
-            complete_outfit_match = re.search(r'\*\*Complete Outfit:\*\*(.*?)(\*\*|$)', content, re.DOTALL)
-            shopping_items = []
-            if complete_outfit_match:
-                outfit_section = complete_outfit_match.group(1)
-                item_lines = re.findall(r'-\s*([A-Za-z ]+):\s*(.+)', outfit_section)
-                for item_type, item_desc in item_lines:
-                    item_query = f"{gender} {item_desc}".strip()
-                    logger.info(f"Searching for: {item_query}")
-                    results = get_shopping_items(item_desc, gender, num_results=3)
-                    if results:
-                        shopping_items.extend(results)
-                    else:
-                        shopping_items.append({
-                            'title': item_desc,
-                            'source': None,
-                            'price': None,
-                            'thumbnail': None,
-                            'link': None
-                        })
-            else:
-                logger.warning(f"No 'Complete Outfit' section found for {day_title}")
-            outfit_data[day_title] = {
-                'content': content,
-                'shopping': shopping_items
-            }
-        print(f"Built outfit_data with shopping items: {list(outfit_data.keys())}")
-        activities_str = ','.join(trip_data['activities']) if isinstance(trip_data['activities'], list) else (trip_data['activities'] or '')
+
         try:
-            add_trip_orm(
-                user_id=current_user.id,
-                city=trip_data['city'],
-                region=trip_data['region'] or '',
-                gender=template_data['gender'],
-                age=template_data['age'],
-                activities=activities_str,
-                duration=trip_data['days'],
-                weather=weather_summary,
-                recommendations=response,
-                outfit_data={'days': days, 'outfit_data': outfit_data}
+            result = generate_recommendations(
+                trip_data, user_profile, on_stage=lambda stage: update_job_stage(job, stage)
             )
+        except Exception as e:
+            fail_job(job, e)
+            raise
+        try:
+            trip = save_recommendations(current_user.id, trip_data, result, fingerprint=fingerprint)
+            complete_job(job, trip.id)
         except DatabaseValidationError as db_val_exc:
             logger.error(f"Validation error saving trip: {db_val_exc}")
+            fail_job(job, db_val_exc)
             flash(f'Could not save trip: {db_val_exc}', 'warning')
         except DatabaseError as db_exc:
             logger.error(f"Error saving trip to database: {db_exc}")
+            fail_job(job, db_exc)
             flash('Could not save trip to your profile. Please try again later.', 'warning')
         return render_template(
             'recommendations.html',
-            data=template_data,
-            response=response,
-            days=days,
-            outfit_data=outfit_data
+            data=result['template_data'],
+            response=result['response'],
+            days=result['days'],
+            outfit_data=result['outfit_data'],
+            rendered_days=result['rendered_html']['days']
         )
-    
+
     except Exception as e:
         logger.error(f"Error generating recommendations: {e}")
-        print(f"ERROR in recommendations route: {e}")
         flash('An error occurred while generating recommendations. Please try again.', 'error')
         return redirect(url_for('main.destination'))
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@recommendations_bp.route('/recommendations/stream')
+@login_required
+def recommendations_stream():
+    """Server-Sent Events stream of days rendered as soon as OpenAI finishes each one."""
+    try:
+        job = get_job_for_user(request.args.get('job_id', type=int), current_user.id)
+    except DatabaseValidationError:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    # Only the inline job registered by /recommendations can be streamed, and only once
+    if job.is_finished or job.worker_id != INLINE_WORKER_ID:
+        return jsonify({'success': False, 'message': 'Job is not streamable'}), 409
+    payload = job.get_payload()
+    trip_data = payload.get('trip_data', {})
+    user_profile = payload.get('user_profile', {})
+    user_id = current_user.id
+
+    def events():
+        # Each day's HTML is rendered once and reused when its card is redrawn with shopping results
+        rendered_days = {}
+        try:
+            for event in stream_generation(trip_data, user_profile):
+                kind = event[0]
+                if kind == 'weather':
+                    update_job_stage(job, 'generating')
+                    html = render_template('weather_section.html', data=event[1])
+                    yield sse_event('weather', {'html': html})
+                elif kind == 'day':
+                    _, index, day = event
+                    rendered_days[day['title']] = render_markdown(day['content'])
+                    html = render_template('day_card.html', day=day['title'], rendered_days=rendered_days,
+                                           info={'content': day['content'], 'shopping': []})
+                    yield sse_event('day', {'index': index, 'title': day['title'], 'html': html})
+                elif kind == 'generated':
+                    update_job_stage(job, 'shopping')
+                    yield sse_event('shopping-start', {})
+                elif kind == 'shopping':
+                    update_job_stage(job, 'saving')
+                    for index, (title, info) in enumerate(event[1].items()):
+                        html = render_template('day_card.html', day=title, info=info, rendered_days=rendered_days)
+                        yield sse_event('day', {'index': index, 'title': title, 'html': html})
+                elif kind == 'result':
+                    message = ''
+                    try:
+                        trip = save_recommendations(user_id, trip_data, event[1], fingerprint=job.fingerprint)
+                        complete_job(job, trip.id)
+                    except DatabaseValidationError as db_val_exc:
+                        logger.error(f"Validation error saving trip: {db_val_exc}")
+                        fail_job(job, db_val_exc)
+                        message = f'Could not save trip: {db_val_exc}'
+                    except DatabaseError as db_exc:
+                        logger.error(f"Error saving trip to database: {db_exc}")
+                        fail_job(job, db_exc)
+                        message = 'Could not save trip to your profile. Please try again later.'
+                    yield sse_event('done', {'message': message})
+        except Exception as e:
+            logger.error(f"Error streaming recommendations: {e}")
+            fail_job(job, e)
+            yield sse_event('failed', {'message': 'An error occurred while generating recommendations. Please try again.'})
+        finally:
+            # Browser went away mid-generation: free the plan so it can be requested again
+            if not job.is_finished:
+                fail_job(job, 'Stream closed before generation finished')
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@recommendations_bp.route('/recommendations/jobs/<int:job_id>')
+@login_required
+def job_page(job_id):
+    """Progress page for a queued generation job; redirects to the trip when done."""
+    try:
+        job = get_job_for_user(job_id, current_user.id)
+    except DatabaseValidationError:
+        flash('Recommendation request not found.', 'error')
+        return redirect(url_for('main.destination'))
+    if job.status == 'completed' and job.trip_id:
+        return redirect(url_for('main.view_trip', trip_id=job.trip_id))
+    trip_data = job.get_payload().get('trip_data', {})
+    return render_template('recommendation_job.html', job=job.to_status_dict(), trip=trip_data)
+
+@recommendations_bp.route('/recommendations/jobs/<int:job_id>/status')
+@login_required
+def job_status(job_id):
+    """JSON status of a generation job for polling clients."""
+    try:
+        job = get_job_for_user(job_id, current_user.id)
+    except DatabaseValidationError:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    status = job.to_status_dict()
+    if job.status == 'completed' and job.trip_id:
+        status['trip_url'] = url_for('main.view_trip', trip_id=job.trip_id)
+    return jsonify(status)
+
+@recommendations_bp.route('/recommendations/jobs/<int:job_id>/events')
+@login_required
+def job_events(job_id):
+    """Server-Sent Events stream of job status changes."""
+    try:
+        get_job_for_user(job_id, current_user.id)
+    except DatabaseValidationError:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+
+    user_id = current_user.id
+    poll_interval = current_app.config['JOB_POLL_INTERVAL']
+    timeout = current_app.config['JOB_EVENTS_TIMEOUT']
+
+    def events():
+        last_sent = None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            # Drop cached state so each poll sees the worker's latest commit
+            db.session.expire_all()
+            job = get_job_for_user(job_id, user_id)
+            status = job.to_status_dict()
+            if job.status == 'completed' and job.trip_id:
+                status['trip_url'] = url_for('main.view_trip', trip_id=job.trip_id)
+            if status != last_sent:
+                yield sse_event('status', status)
+                last_sent = status
+            if job.is_finished:
+                return
+            time.sleep(poll_interval)
+        # Tell the browser to reconnect rather than hold this worker indefinitely
+        yield sse_event('timeout', {})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@recommendations_bp.route('/recommendations/products/<product_id>/purchase-options')
+@login_required
+def purchase_options(product_id):
+    """Additional sellers for a product, loaded when the user expands its seller list."""
+    try:
+        options = get_purchase_options(product_id, exclude_sources=request.args.getlist('exclude'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid product'}), 400
+    return jsonify({'success': True, 'product_id': product_id, 'purchase_options': options})
@@ -2,7 +2,7 @@
 Marshmallow schemas for data validation and serialization.
 Provides input validation for API endpoints and forms.
 """
-from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError, EXCLUDE
 
 class UserRegistrationSchema(Schema):
     """Schema for user registration validation."""
@@ -41,6 +41,33 @@ class ClosetItemSchema(Schema):
     image_url = fields.Str(validate=validate.Length(max=300))
     source = fields.Str(validate=validate.Length(max=50))
 
+OUTFIT_ITEM_CATEGORIES = ['Top', 'Bottom', 'Shoes', 'Accessories', 'Outerwear', 'Dress']
+
+class GeneratedSchema(Schema):
+    """Base for schemas validating model output, which may carry extra keys."""
+    class Meta:
+        unknown = EXCLUDE
+
+class OutfitItemSchema(GeneratedSchema):
+    """Schema for one item of a generated outfit."""
+    category = fields.Str(required=True, validate=validate.OneOf(OUTFIT_ITEM_CATEGORIES))
+    description = fields.Str(required=True, validate=validate.Length(min=1, max=300))
+    search_query = fields.Str(required=True, validate=validate.Length(min=1, max=200))
+
+class OutfitDaySchema(GeneratedSchema):
+    """Schema for one day of a generated outfit plan."""
+    day = fields.Int(required=True, validate=validate.Range(min=1))
+    date = fields.Str(required=True, validate=validate.Regexp(r'^\d{4}-\d{2}-\d{2}$'))
+    activity = fields.Str(required=True, validate=validate.Length(min=1, max=200))
+    weather_adjustments = fields.Str(load_default='')
+    items = fields.List(fields.Nested(OutfitItemSchema), required=True, validate=validate.Length(min=1))
+    activity_considerations = fields.Str(load_default='')
+    packing_notes = fields.Str(load_default='')
+
+class OutfitPlanSchema(GeneratedSchema):
+    """Schema for the structured outfit plan returned by the model."""
+    days = fields.List(fields.Nested(OutfitDaySchema), required=True, validate=validate.Length(min=1))
+
 def validate_request_data(schema_class, data):
     """Helper function to validate request data against a schema."""
     schema = schema_class()
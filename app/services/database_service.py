@@ -6,12 +6,24 @@ from app import db
 from app.models.user import User
 from app.models.trip import Trip
 from app.models.closet import ClosetItem
+from app.models.job import GenerationJob
+from sqlalchemy import and_, or_, func
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+import os
+import json
+from datetime import datetime
+import base64
+import binascii
 import logging
+from app.instrumentation import span, timed
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Rows per page of the keyset-paginated list queries
+TRIP_PAGE_SIZE = int(os.environ.get('TRIP_PAGE_SIZE', 10))
+CLOSET_PAGE_SIZE = int(os.environ.get('CLOSET_PAGE_SIZE', 30))
+
 class DatabaseError(Exception):
     """Custom exception for database operations."""
     pass
@@ -20,7 +32,7 @@ class DatabaseValidationError(Exception):
     """Custom exception for database validation errors."""
     pass
 
-def add_trip_orm(user_id, city, region, gender=None, age=None, activities=None, duration=None, weather=None, recommendations=None, outfit_data=None):
+def add_trip_orm(user_id, city, region, gender=None, age=None, activities=None, duration=None, weather=None, recommendations=None, outfit_data=None, plan_fingerprint=None):
     """Add a trip using Flask-SQLAlchemy ORM with error handling."""
     try:
         # Validate user exists
@@ -41,15 +53,18 @@ def add_trip_orm(user_id, city, region, gender=None, age=None, activities=None,
             activities=activities,
             duration=duration,
             weather=weather,
-            recommendations=recommendations
+            recommendations=recommendations,
+            plan_fingerprint=plan_fingerprint
         )
         
         # Set outfit data using the model method
         if outfit_data:
             trip.set_outfit_data(outfit_data)
+        trip.summary = trip.build_summary()
         
         db.session.add(trip)
-        db.session.commit()
+        with span('db_commit'):
+            db.session.commit()
         
         logger.info(f"Successfully created trip {trip.id} for user {user_id}")
         return trip
@@ -69,8 +84,51 @@ def add_trip_orm(user_id, city, region, gender=None, age=None, activities=None,
         logger.error(f"Unexpected error creating trip: {e}")
         raise DatabaseError(f"Unexpected error: {str(e)}")
 
+def encode_cursor(values):
+    """Opaque page cursor for the sort key of the last row on a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, size):
+    """Sort key values from ``encode_cursor``; raises DatabaseValidationError for a malformed cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError, binascii.Error):
+        raise DatabaseValidationError("Invalid page cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise DatabaseValidationError("Invalid page cursor")
+    return values
+
+def _trip_list_data(trips, user_id):
+    """List-page dicts for trips loaded without their content columns."""
+    # Trips saved before summaries existed get theirs once, loading their content just this time
+    missing = [trip for trip in trips if trip.summary is None]
+    if missing:
+        for trip in missing:
+            trip.summary = trip.build_summary()
+        db.session.commit()
+        logger.info(f"Stored summaries for {len(missing)} trips of user {user_id}")
+    return [
+        {
+            'id': trip.id,
+            'city': trip.city,
+            'region': trip.region,
+            'activities': trip.activities,
+            'duration': trip.duration,
+            'summary': trip.summary,
+            'created_at': trip.created_at,
+            'gender': trip.gender,
+            'age': trip.age
+        }
+        for trip in trips
+    ]
+
+@timed('db_query')
 def fetch_trips_by_user_orm(user_id):
-    """Fetch all trips for a specific user using ORM with error handling."""
+    """
+    Fetch all trips for a specific user for list pages.
+    Only the small columns are read (recommendations, weather and outfit data
+    stay deferred); each trip's ``summary`` stands in for its recommendations.
+    """
     try:
         # Validate user exists
         user = User.query.get(user_id)
@@ -78,26 +136,13 @@ def fetch_trips_by_user_orm(user_id):
             raise DatabaseValidationError(f"User with ID {user_id} not found")
         
         trips = Trip.query.filter_by(user_id=user_id).all()
-        
-        trips_data = [
-            {
-                'id': trip.id,
-                'city': trip.city,
-                'region': trip.region,
-                'activities': trip.activities,
-                'duration': trip.duration,
-                'recommendations': trip.recommendations,
-                'weather': trip.weather,
-                'gender': trip.gender,
-                'age': trip.age
-            }
-            for trip in trips
-        ]
+        trips_data = _trip_list_data(trips, user_id)
         
         logger.info(f"Successfully fetched {len(trips_data)} trips for user {user_id}")
         return trips_data
         
     except SQLAlchemyError as e:
+        db.session.rollback()
         logger.error(f"Database error fetching trips for user {user_id}: {e}")
         raise DatabaseError(f"Database error: {str(e)}")
     except DatabaseValidationError:
@@ -106,6 +151,113 @@ def fetch_trips_by_user_orm(user_id):
         logger.error(f"Unexpected error fetching trips for user {user_id}: {e}")
         raise DatabaseError(f"Unexpected error: {str(e)}")
 
+@timed('db_query')
+def fetch_trips_page_orm(user_id, cursor=None, limit=None):
+    """
+    One page of a user's trips, newest first, as ``(trips_data, next_cursor)``.
+
+    Pages are keyed on (created_at, id) rather than an offset, so each page is
+    an index range scan however many trips come before it. ``next_cursor`` is
+    None on the last page. Trip dicts are the same as fetch_trips_by_user_orm's.
+    """
+    limit = limit or TRIP_PAGE_SIZE
+    try:
+        query = Trip.query.filter_by(user_id=user_id)
+        if cursor:
+            created_at, trip_id = decode_cursor(cursor, 2)
+            try:
+                created_at = datetime.fromisoformat(created_at)
+            except (TypeError, ValueError):
+                raise DatabaseValidationError("Invalid page cursor")
+            if not isinstance(trip_id, int):
+                raise DatabaseValidationError("Invalid page cursor")
+            query = query.filter(or_(
+                Trip.created_at < created_at,
+                and_(Trip.created_at == created_at, Trip.id < trip_id)
+            ))
+        # One extra row tells whether another page follows
+        trips = query.order_by(Trip.created_at.desc(), Trip.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(trips) > limit:
+            trips = trips[:limit]
+            # The last trip's own sort key, so the next page doesn't depend on that trip still existing
+            next_cursor = encode_cursor([trips[-1].created_at.isoformat(), trips[-1].id])
+        return _trip_list_data(trips, user_id), next_cursor
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error fetching trip page for user {user_id}: {e}")
+        raise DatabaseError(f"Database error: {str(e)}")
+
+@timed('db_query')
+def count_trips_orm(user_id):
+    """Number of trips a user has, counted in the database."""
+    try:
+        return db.session.query(func.count(Trip.id)).filter(Trip.user_id == user_id).scalar()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error counting trips for user {user_id}: {e}")
+        raise DatabaseError(f"Database error: {str(e)}")
+
+def closet_category_filter(category):
+    """Filter for one closet category; untyped items belong to 'other'."""
+    if category == 'other':
+        return or_(ClosetItem.item_type == 'other', ClosetItem.item_type.is_(None))
+    return ClosetItem.item_type == category
+
+@timed('db_query')
+def fetch_closet_page_orm(user_id, category=None, cursor=None, limit=None):
+    """
+    One page of a user's closet items as ``(items, next_cursor)``, ordered by
+    (item_type, title, id) and keyed on those values like fetch_trips_page_orm.
+    ``category`` limits the page to one category (see closet_category_filter).
+    """
+    limit = limit or CLOSET_PAGE_SIZE
+    # Items without a type sort first, as '' rather than NULL so the cursor can compare them
+    item_type = func.coalesce(ClosetItem.item_type, '')
+    try:
+        query = ClosetItem.query.filter_by(user_id=user_id)
+        if category:
+            query = query.filter(closet_category_filter(category))
+        if cursor:
+            last_type, last_title, last_id = decode_cursor(cursor, 3)
+            if not (isinstance(last_type, str) and isinstance(last_title, str) and isinstance(last_id, int)):
+                raise DatabaseValidationError("Invalid page cursor")
+            query = query.filter(or_(
+                item_type > last_type,
+                and_(item_type == last_type, ClosetItem.title > last_title),
+                and_(item_type == last_type, ClosetItem.title == last_title, ClosetItem.id > last_id)
+            ))
+        items = query.order_by(item_type, ClosetItem.title, ClosetItem.id).limit(limit + 1).all()
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor([last.item_type or '', last.title, last.id])
+        return items, next_cursor
+
+    except SQLAlchemyError as e:
+        logger.error(f"Database error fetching closet page for user {user_id}: {e}")
+        raise DatabaseError(f"Database error: {str(e)}")
+
+@timed('db_query')
+def count_closet_items_orm(user_id, category=None):
+    """
+    Item counts per item_type (None for untyped items) for a user's closet, in one
+    grouped query. ``category`` counts only the items fetch_closet_page_orm pages for it.
+    """
+    try:
+        query = db.session.query(ClosetItem.item_type, func.count(ClosetItem.id)).filter(ClosetItem.user_id == user_id)
+        if category:
+            query = query.filter(closet_category_filter(category))
+        rows = (query
+                .group_by(ClosetItem.item_type)
+                .order_by(ClosetItem.item_type)
+                .all())
+        return {item_type: count for item_type, count in rows}
+    except SQLAlchemyError as e:
+        logger.error(f"Database error counting closet items for user {user_id}: {e}")
+        raise DatabaseError(f"Database error: {str(e)}")
+
 def get_user_by_email(email):
     """Get user by email using ORM."""
     return User.query.filter_by(email=email).first()
@@ -158,6 +310,8 @@ def delete_trip_orm(trip_id, user_id):
         if not trip:
             raise DatabaseValidationError(f"Trip with ID {trip_id} not found or access denied")
         
+        # Jobs keep their history but stop pointing at the trip, so the foreign key allows the delete
+        GenerationJob.query.filter_by(trip_id=trip.id).update({'trip_id': None}, synchronize_session=False)
         db.session.delete(trip)
         db.session.commit()
         
@@ -175,10 +329,30 @@ def delete_trip_orm(trip_id, user_id):
         logger.error(f"Unexpected error deleting trip: {e}")
         raise DatabaseError(f"Unexpected error: {str(e)}")
 
-def get_trip_by_id_orm(trip_id, user_id):
-    """Get a specific trip by ID, ensuring user owns the trip."""
+@timed('db_query')
+def get_trip_by_fingerprint_orm(user_id, plan_fingerprint):
+    """Get the user's most recent trip generated from a plan fingerprint, or None."""
     try:
-        trip = Trip.query.filter_by(id=trip_id, user_id=user_id).first()
+        return (Trip.query
+                .filter_by(user_id=user_id, plan_fingerprint=plan_fingerprint)
+                .order_by(Trip.created_at.desc(), Trip.id.desc())
+                .first())
+    except SQLAlchemyError as e:
+        logger.error(f"Database error fetching trip by fingerprint: {e}")
+        raise DatabaseError(f"Database error: {str(e)}")
+
+@timed('db_query')
+def get_trip_by_id_orm(trip_id, user_id, full=False):
+    """
+    Get a specific trip by ID, ensuring user owns the trip.
+    ``full`` loads everything the trip page shows up front: the deferred
+    content columns, days and shopping items. Otherwise those load on first access.
+    """
+    try:
+        query = Trip.query.filter_by(id=trip_id, user_id=user_id)
+        if full:
+            query = query.options(Trip.with_content(), Trip.with_days())
+        trip = query.first()
         if not trip:
             raise DatabaseValidationError(f"Trip with ID {trip_id} not found or access denied")
         
@@ -5,17 +5,37 @@ from openai import OpenAI
 from dotenv import load_dotenv
 import logging
 import re
+import time
+import json
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from app.instrumentation import span, record, register_metrics_source
+from app.utils.rate_limiter import rate_limiter
+from app.utils.singleflight import single_flight
+from app.utils.persistent_cache import SQLiteCache
+from app.utils.concurrency import run_concurrently
+from app.utils.outfit_parser import DAY_PATTERN
+from app.schemas import OutfitPlanSchema, OUTFIT_ITEM_CATEGORIES, validate_request_data
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client with your API key
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Initialize OpenAI client with your API key. It keeps its own pooled httpx
+# client; bound it like the shared HTTP client so a stalled completion can't
+# hold a worker indefinitely.
+client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    timeout=float(os.getenv("OPENAI_TIMEOUT", 60)),
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", 2))
+)
 
-def build_prompt_from_session(session):
+def build_prompt_from_session(session, day_range=None, structured=False):
     # Generate list of dates for the trip
     start_date = session.get('start_date')
     end_date = session.get('end_date')
@@ -25,20 +45,54 @@ def build_prompt_from_session(session):
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
             end_dt = datetime.strptime(end_date, "%Y-%m-%d")
             num_days = (end_dt - start_dt).days + 1
+            first_day, last_day = day_range or (1, num_days)
             date_lines = "The trip is from {} to {}. The days are:\n".format(start_date, end_date)
-            for i in range(num_days):
+            if day_range:
+                date_lines = (
+                    "The trip is from {} to {} ({} days). This request covers only Days {} to {}; "
+                    "write recommendations for those days alone, numbered as listed. The days are:\n"
+                ).format(start_date, end_date, num_days, first_day, last_day)
+            for i in range(first_day - 1, last_day):
                 day_dt = start_dt + timedelta(days=i)
                 date_lines += f"- Day {i+1}: {day_dt.strftime('%Y-%m-%d')}\n"
         except Exception as e:
             date_lines = ""
     """
     Constructs a natural-language prompt for the travel stylist based on session data.
+    ``day_range`` (first, last) limits the listed days to one chunk of a longer trip.
+    With ``structured`` the outfits are asked for as a save_outfit_plan call instead of markdown.
     """
     activities = session.get('activities', [])
     activities_text = ', '.join(activities) if activities else 'general travel'
     weather_text = session.get('weather_summary', 'no weather data available')
     days = session.get('days', 'multi-day')
-    
+
+    if structured:
+        prompt = f"""
+    You are a travel stylist. Based on the following trip details:
+    Location: {session.get('city', 'N/A')}, {session.get('region', 'N/A')}
+    Gender: {session.get('gender', 'N/A')}
+    Age: {session.get('age', 'N/A')}
+    Activities: {activities_text}
+    Duration: {days} days
+    Weather Forecast: {weather_text}
+
+    {date_lines}
+
+    Your task:
+    For each day listed above, recommend a complete outfit tailored to the actual activities and city from the trip details. For all weather-related details use ONLY the provided Weather Forecast; do NOT generate your own forecast.
+
+    Return the plan by calling {OUTFIT_PLAN_FUNCTION['name']} with one entry per day, using the day number and exact date listed above:
+    - activity: "[Specific Activity] in [City] [Weather Summary]"
+    - weather_adjustments: weather-based adjustments like sunscreen, layers, etc.
+    - items: the top, bottom, shoes and accessories, each with a detailed description and a specific search_query (brand suggestions when relevant, style/cut, color and material)
+    - activity_considerations: how the outfit works for the planned activities
+    - packing_notes: whether items should be packed or purchased
+
+    Use a helpful and stylish tone. Write plain text in every field: no markdown or HTML.
+    """
+        return prompt.strip()
+
     prompt = f"""
     You are a travel stylist. Based on the following trip details:
     Location: {session.get('city', 'N/A')}, {session.get('region', 'N/A')}
@@ -111,78 +165,477 @@ def build_prompt_from_session(session):
     """
     return prompt.strip()
 
-def parse_daily_outfits_with_products(gpt_response):
+SYSTEM_MESSAGE = "You are a helpful travel stylist that provides detailed outfit recommendations."
+COMPLETION_PARAMS = {
+    'model': "gpt-3.5-turbo",
+    'max_tokens': 2000,
+    'temperature': 0.3
+}
+
+# Long trips are generated as several day-range completions requested concurrently,
+# so they aren't cut off by max_tokens and take about as long as a short trip
+GENERATION_CHUNK_DAYS = int(os.getenv('GENERATION_CHUNK_DAYS', 4))
+GENERATION_MAX_WORKERS = int(os.getenv('GENERATION_MAX_WORKERS', 4))
+# max_tokens per completion: a fixed allowance plus a share for each day requested
+COMPLETION_TOKENS_BASE = int(os.getenv('COMPLETION_TOKENS_BASE', 200))
+COMPLETION_TOKENS_PER_DAY = int(os.getenv('COMPLETION_TOKENS_PER_DAY', 450))
+MAX_COMPLETION_TOKENS = int(os.getenv('MAX_COMPLETION_TOKENS', 4000))
+
+def completion_params(num_days=None):
+    """COMPLETION_PARAMS with max_tokens scaled to the number of days in the request."""
+    if not num_days:
+        return COMPLETION_PARAMS
+    max_tokens = min(MAX_COMPLETION_TOKENS, COMPLETION_TOKENS_BASE + COMPLETION_TOKENS_PER_DAY * num_days)
+    return dict(COMPLETION_PARAMS, max_tokens=max_tokens)
+
+def plan_day_chunks(num_days, chunk_days=None):
     """
-    Parse the AI response to extract both outfit descriptions and specific product search queries
+    Split days 1..num_days into inclusive (first, last) ranges of at most
+    ``chunk_days`` days, as evenly sized as possible (9 days -> 3, 3, 3).
     """
-    outfits = {}
-    
-    # Split by days
-    days = re.split(r'### Day (\d+):', gpt_response)
-    
-    for i in range(1, len(days), 2):
-        day_num = days[i].strip()
-        content = days[i + 1]
-        day_label = f"Day {day_num}"
-        
-        # Extract product searches section
-        product_section = re.search(r'\*\*Product Searches:\*\*(.*?)(?=\n###|\n\*\*|$)', content, re.DOTALL)
-        
-        if product_section:
-            product_text = product_section.group(1).strip()
-            
-            # Parse individual product lines
-            product_queries = {}
-            for line in product_text.split('\n'):
-                line = line.strip()
-                if line.startswith('- '):
-                    # Remove the "- " prefix
-                    line = line[2:]
-                    if ':' in line:
-                        category, query = line.split(':', 1)
-                        product_queries[category.strip()] = query.strip()
-            
-            outfits[day_label] = {
-                'content': content,
-                'products': product_queries
-            }
-        else:
-            # Fallback to old method if new format not found
-            match = re.search(r'\*\*Search Query:\*\* (.*)', content)
-            general_query = match.group(1).strip() if match else "default outfit"
-            outfits[day_label] = {
-                'content': content,
-                'products': {'general': general_query}
+    chunk_days = max(1, chunk_days or GENERATION_CHUNK_DAYS)
+    num_days = max(1, num_days)
+    count = -(-num_days // chunk_days)
+    size, extra = divmod(num_days, count)
+    chunks = []
+    first = 1
+    for i in range(count):
+        last = first + size + (1 if i < extra else 0) - 1
+        chunks.append((first, last))
+        first = last + 1
+    return chunks
+
+# Structured output: the model returns the plan as the arguments of a forced function
+# call, validated with OutfitPlanSchema, and markdown is rendered from it
+STRUCTURED_OUTPUT = os.getenv('STRUCTURED_OUTPUT', 'false').lower() == 'true'
+OUTFIT_PLAN_FUNCTION = {
+    'name': 'save_outfit_plan',
+    'description': 'Save the day-by-day outfit recommendations for the trip.',
+    'parameters': {
+        'type': 'object',
+        'properties': {
+            'days': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'day': {'type': 'integer', 'description': 'Trip day number, as listed'},
+                        'date': {'type': 'string', 'description': 'Date of the day, YYYY-MM-DD'},
+                        'activity': {'type': 'string'},
+                        'weather_adjustments': {'type': 'string'},
+                        'items': {
+                            'type': 'array',
+                            'items': {
+                                'type': 'object',
+                                'properties': {
+                                    'category': {'type': 'string', 'enum': OUTFIT_ITEM_CATEGORIES},
+                                    'description': {'type': 'string'},
+                                    'search_query': {'type': 'string'}
+                                },
+                                'required': ['category', 'description', 'search_query']
+                            }
+                        },
+                        'activity_considerations': {'type': 'string'},
+                        'packing_notes': {'type': 'string'}
+                    },
+                    'required': ['day', 'date', 'activity', 'items']
+                }
             }
-    
-    return outfits
+        },
+        'required': ['days']
+    }
+}
+
+def structured_params(params=None):
+    """Completion params that force the response through the save_outfit_plan function."""
+    return dict(
+        params or COMPLETION_PARAMS,
+        tools=[{'type': 'function', 'function': OUTFIT_PLAN_FUNCTION}],
+        tool_choice={'type': 'function', 'function': {'name': OUTFIT_PLAN_FUNCTION['name']}}
+    )
+
+def build_messages(prompt):
+    """Chat messages sent for an outfit recommendation prompt."""
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt}
+    ]
+
+# Identical prompts submitted concurrently share one completion
+openai_flight = single_flight('openai')
+
+ERROR_PREFIX = "Error getting recommendations:"
+
+# Completions keyed by everything sent to OpenAI, shared by every worker on the host
+COMPLETION_CACHE_ENABLED = os.getenv('COMPLETION_CACHE_ENABLED', 'true').lower() == 'true'
+COMPLETION_CACHE_TTL = int(os.getenv('COMPLETION_CACHE_TTL', 7 * 24 * 60 * 60))
+# Optional looser tier: reuse the response generated for a similar trip (same destination,
+# month, length, activities, gender and age band) with its dates moved to the new trip
+SIMILAR_TRIP_CACHE_ENABLED = os.getenv('SIMILAR_TRIP_CACHE_ENABLED', 'false').lower() == 'true'
+SIMILAR_TRIP_CACHE_TTL = int(os.getenv('SIMILAR_TRIP_CACHE_TTL', 30 * 24 * 60 * 60))
+COMPLETION_CACHE_PATH = os.getenv('COMPLETION_CACHE_PATH', os.getenv('SERP_CACHE_PATH', 'serp_cache.sqlite3'))
+completion_cache = SQLiteCache(
+    COMPLETION_CACHE_PATH,
+    max_entries=int(os.getenv('COMPLETION_CACHE_MAX_ENTRIES', 2000)),
+    table='completion_cache'
+)
+similar_trip_cache = SQLiteCache(
+    COMPLETION_CACHE_PATH,
+    max_entries=int(os.getenv('SIMILAR_TRIP_CACHE_MAX_ENTRIES', 2000)),
+    table='similar_trip_cache'
+)
+
+# bypassed: calls made with every tier disabled, kept out of the hit rate
+_cache_counters = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0, 'bypassed': 0}
+_cache_counters_lock = threading.Lock()
+
+def _count(field):
+    with _cache_counters_lock:
+        _cache_counters[field] += 1
+
+def completion_cache_stats():
+    """Hits per tier and the share of completions served without calling OpenAI."""
+    with _cache_counters_lock:
+        stats = dict(_cache_counters)
+    lookups = stats['exact_hits'] + stats['similar_hits'] + stats['misses']
+    stats['hit_rate'] = round((stats['exact_hits'] + stats['similar_hits']) / lookups, 3) if lookups else None
+    stats['similar_hit_rate'] = round(stats['similar_hits'] / lookups, 3) if lookups else None
+    stats['similar_tier_enabled'] = SIMILAR_TRIP_CACHE_ENABLED
+    stats['exact'] = completion_cache.stats()
+    stats['similar'] = similar_trip_cache.stats()
+    return stats
+
+register_metrics_source('completion_cache', completion_cache_stats)
+
+def prompt_key(prompt, params=None):
+    """Hash of everything sent to OpenAI for a prompt."""
+    payload = json.dumps({'messages': build_messages(prompt), 'params': params or COMPLETION_PARAMS}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def age_band(age):
+    """Coarse age bracket used by the similar-trip key."""
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return 'unknown'
+    for upper, band in ((17, 'under-18'), (24, '18-24'), (34, '25-34'), (44, '35-44'), (54, '45-54'), (64, '55-64')):
+        if age <= upper:
+            return band
+    return '65+'
 
-def get_recommendations(prompt):
+def similar_trip_key(trip_data, user_profile, structured=False):
+    """
+    Key shared by trips similar enough to reuse each other's outfits: same destination,
+    start month, length, activities, gender and age band. None when the dates are unusable.
+    Markdown and structured responses are kept under different keys.
+    """
+    try:
+        start = datetime.strptime(trip_data['start_date'], "%Y-%m-%d")
+        days = (datetime.strptime(trip_data['end_date'], "%Y-%m-%d") - start).days + 1
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    def clean(value):
+        return ' '.join(str(value if value is not None else '').lower().split())
+
+    activities = trip_data.get('activities') or []
+    if isinstance(activities, str):
+        activities = activities.split(',')
+    trip = {
+        'city': clean(trip_data.get('city')),
+        'region': clean(trip_data.get('region')),
+        'month': start.month,
+        'days': days,
+        'activities': sorted({clean(a) for a in activities if clean(a)}),
+        'gender': clean(user_profile.get('gender')),
+        'age_band': age_band(user_profile.get('age')),
+        'params': COMPLETION_PARAMS,
+    }
+    if structured:
+        trip['structured'] = True
+    return hashlib.sha256(json.dumps(trip, sort_keys=True).encode('utf-8')).hexdigest()
+
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def shift_trip_dates(text, from_start, to_start, days):
+    """Move the day-by-day dates in a response from one trip's start date to another's."""
+    try:
+        from_dt = datetime.strptime(from_start, "%Y-%m-%d")
+        to_dt = datetime.strptime(to_start, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return text
+    mapping = {
+        (from_dt + timedelta(days=i)).strftime("%Y-%m-%d"): (to_dt + timedelta(days=i)).strftime("%Y-%m-%d")
+        for i in range(days)
+    }
+    # One pass so a shifted date is never shifted again
+    return DATE_PATTERN.sub(lambda match: mapping.get(match.group(0), match.group(0)), text)
+
+def cached_similar_trip(similar_trip, structured=False):
+    """Response stored for a similar trip with its dates moved to this one, or None."""
+    if not (SIMILAR_TRIP_CACHE_ENABLED and similar_trip):
+        return None
+    key = similar_trip_key(*similar_trip, structured=structured)
+    entry = similar_trip_cache.get(key) if key else None
+    if not entry:
+        return None
+    _count('similar_hits')
+    trip_data = similar_trip[0]
+    logging.info(f"OpenAI similar-trip cache hit ({entry.age:.0f}s old)")
+    return shift_trip_dates(entry.value['response'], entry.value['start_date'],
+                            trip_data.get('start_date'), entry.value['days'])
+
+def store_similar_trip(similar_trip, response, structured=False):
+    """Cache a complete trip response under its similar-trip key, when that tier is enabled."""
+    if not (SIMILAR_TRIP_CACHE_ENABLED and similar_trip) or not response or response.startswith(ERROR_PREFIX):
+        return
+    key = similar_trip_key(*similar_trip, structured=structured)
+    if key:
+        trip_data = similar_trip[0]
+        start = datetime.strptime(trip_data['start_date'], "%Y-%m-%d")
+        days = (datetime.strptime(trip_data['end_date'], "%Y-%m-%d") - start).days + 1
+        similar_trip_cache.set(key, {'response': response, 'start_date': trip_data['start_date'], 'days': days},
+                               SIMILAR_TRIP_CACHE_TTL)
+
+def cached_completion(prompt, similar_trip=None, params=None):
+    """
+    Cached response for a prompt, or None.
+    ``similar_trip`` is the (trip_data, user_profile) the prompt was built from; with
+    it the similar-trip tier is consulted when there is no exact hit.
+    """
+    if COMPLETION_CACHE_ENABLED:
+        entry = completion_cache.get(prompt_key(prompt, params))
+        if entry:
+            _count('exact_hits')
+            logging.info(f"OpenAI completion cache hit ({entry.age:.0f}s old)")
+            return entry.value
+    similar = cached_similar_trip(similar_trip)
+    if similar is not None:
+        return similar
+    looked_up = COMPLETION_CACHE_ENABLED or (SIMILAR_TRIP_CACHE_ENABLED and similar_trip)
+    _count('misses' if looked_up else 'bypassed')
+    return None
+
+def store_completion(prompt, response, similar_trip=None, params=None):
+    """Cache a successful response under its exact key and, if enabled, its similar-trip key."""
+    if not response or response.startswith(ERROR_PREFIX):
+        return
+    if COMPLETION_CACHE_ENABLED:
+        completion_cache.set(prompt_key(prompt, params), response, COMPLETION_CACHE_TTL)
+    store_similar_trip(similar_trip, response)
+
+def get_recommendations(prompt, similar_trip=None, params=None):
     """
     Sends the prompt to the OpenAI API and returns the generated outfit recommendations.
+    Responses are cached (see cached_completion), and concurrent calls with the
+    same prompt wait for and share one completion. ``params`` overrides
+    COMPLETION_PARAMS, e.g. with a max_tokens from completion_params.
     """
+    cached = cached_completion(prompt, similar_trip, params)
+    if cached is not None:
+        return cached
+    response = openai_flight.do(prompt_key(prompt, params), request_completion, prompt, params)
+    store_completion(prompt, response, similar_trip, params)
+    return response
+
+def request_completion(prompt, params=None):
+    """Uncoalesced completion request behind get_recommendations."""
     try:
         logging.info("Sending enhanced prompt to OpenAI...")
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful travel stylist that provides detailed outfit recommendations."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=2000,
-            temperature=0.3
-        )
-        return response.choices[0].message.content
+        rate_limiter.acquire('openai')
+        with span('openai'):
+            response = client.chat.completions.create(
+                messages=build_messages(prompt),
+                **(params or COMPLETION_PARAMS)
+            )
+        message = response.choices[0].message
+        if message.tool_calls:
+            return message.tool_calls[0].function.arguments
+        return message.content
     except Exception as e:
         logging.error(f"OpenAI API error: {e}")
-        return f"Error getting recommendations: {str(e)}"
+        return f"{ERROR_PREFIX} {str(e)}"
+
+def stream_recommendations(prompt, similar_trip=None, params=None):
+    """
+    Streams the completion for a prompt, yielding text fragments as OpenAI produces them.
+    On API errors a single error message is yielded, mirroring get_recommendations.
+    A cached response is yielded whole; a completed stream is added to the cache.
+    """
+    cached = cached_completion(prompt, similar_trip, params)
+    if cached is not None:
+        yield cached
+        return
+    fragments = []
+    # Only time spent waiting on OpenAI is recorded, not the consumer's work between chunks
+    waited = 0.0
+    first_token = None
+    try:
+        logging.info("Streaming enhanced prompt to OpenAI...")
+        rate_limiter.acquire('openai')
+        started = time.perf_counter()
+        stream = iter(client.chat.completions.create(
+            messages=build_messages(prompt),
+            stream=True,
+            **(params or COMPLETION_PARAMS)
+        ))
+        waited += time.perf_counter() - started
+        while True:
+            started = time.perf_counter()
+            chunk = next(stream, None)
+            waited += time.perf_counter() - started
+            if chunk is None:
+                break
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token is None:
+                    first_token = waited
+                    record('openai_first_token', first_token)
+                fragments.append(delta)
+                yield delta
+        store_completion(prompt, ''.join(fragments), similar_trip, params)
+    except Exception as e:
+        logging.error(f"OpenAI API streaming error: {e}")
+        yield f"{ERROR_PREFIX} {str(e)}"
+    finally:
+        record('openai', waited)
+
+def trim_chunk_response(response):
+    """Drop any preamble before a chunk's first day header so it can't attach to the previous day."""
+    match = DAY_PATTERN.search(response)
+    return response[match.start():] if match else response
+
+def merge_chunk_responses(responses):
+    """
+    Join day-range responses in day order into one response.
+    Failed chunks are left out (their days are missing); if every chunk failed
+    the first error is returned.
+    """
+    parts = []
+    for index, response in enumerate(responses):
+        if not response or response.startswith(ERROR_PREFIX):
+            logging.error(f"Generation chunk {index + 1} of {len(responses)} failed: {response}")
+            continue
+        parts.append((response if index == 0 else trim_chunk_response(response)).strip())
+    if not parts:
+        return next((response for response in responses if response), f"{ERROR_PREFIX} no response")
+    return '\n\n'.join(parts)
+
+def get_chunked_recommendations(chunks, similar_trip=None):
+    """
+    Generate a trip as several day-range completions and merge them in order.
+    ``chunks`` is a list of (prompt, params) in day order. Each chunk goes
+    through get_recommendations (cached and coalesced); the chunks run
+    concurrently, so a long trip takes about as long as its slowest chunk.
+    """
+    cached = cached_similar_trip(similar_trip)
+    if cached is not None:
+        return cached
+    calls = [(get_recommendations, (prompt,), {'params': params}) for prompt, params in chunks]
+    results = run_concurrently(calls, GENERATION_MAX_WORKERS)
+    responses = [
+        result['result'] if result['error'] is None else f"{ERROR_PREFIX} {result['error']}"
+        for result in results
+    ]
+    logger.info(f"Generated {len(chunks)} chunks in {max(result['seconds'] for result in results):.1f}s")
+    response = merge_chunk_responses(responses)
+    if not any(r.startswith(ERROR_PREFIX) for r in responses):
+        store_similar_trip(similar_trip, response)
+    return response
+
+def stream_chunked_recommendations(chunks, similar_trip=None):
+    """
+    Streaming variant of get_chunked_recommendations.
+    The first chunk is streamed as OpenAI produces it while the remaining chunks
+    are generated in the background; each is yielded whole, in order, once the
+    chunks before it have been yielded.
+    """
+    cached = cached_similar_trip(similar_trip)
+    if cached is not None:
+        yield cached
+        return
+    (first_prompt, first_params), rest = chunks[0], chunks[1:]
+    executor = ThreadPoolExecutor(max_workers=max(1, min(GENERATION_MAX_WORKERS, len(rest))))
+    try:
+        futures = [
+            executor.submit(contextvars.copy_context().run, get_recommendations, prompt, params=params)
+            for prompt, params in rest
+        ]
+        first = []
+        for fragment in stream_recommendations(first_prompt, params=first_params):
+            first.append(fragment)
+            yield fragment
+        responses = [''.join(first)]
+        for future in futures:
+            try:
+                response = future.result()
+            except Exception as e:
+                response = f"{ERROR_PREFIX} {str(e)}"
+            responses.append(response)
+            if response.startswith(ERROR_PREFIX):
+                logging.error(f"Generation chunk {len(responses)} of {len(chunks)} failed: {response}")
+                continue
+            yield '\n\n' + trim_chunk_response(response).strip()
+        if not any(r.startswith(ERROR_PREFIX) for r in responses):
+            store_similar_trip(similar_trip, merge_chunk_responses(responses))
+    finally:
+        # Chunks still running when the consumer stops finish in the background and are cached
+        executor.shutdown(wait=False)
+
+def parse_outfit_plan(text):
+    """Validated days of a structured response, or None when it isn't a valid outfit plan."""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        logging.warning(f"Structured outfit plan is not JSON: {str(text)[:200]}")
+        return None
+    plan, errors = validate_request_data(OutfitPlanSchema, data)
+    if errors:
+        logging.warning(f"Structured outfit plan failed validation: {errors}")
+        return None
+    return plan['days']
+
+def get_outfit_plan(chunks, similar_trip=None):
+    """
+    Structured-output counterpart of get_chunked_recommendations.
+    ``chunks`` are (prompt, params) built with ``structured=True``; each is
+    completed through a forced save_outfit_plan call (cached and coalesced like
+    any completion) and validated. Returns the valid days in day order; chunks
+    that fail or don't validate are left out and dropped from the cache.
+    """
+    cached = cached_similar_trip(similar_trip, structured=True)
+    if cached is not None:
+        days = parse_outfit_plan(cached)
+        if days:
+            return days
+    chunk_params = [structured_params(params) for _, params in chunks]
+    calls = [(get_recommendations, (prompt,), {'params': params}) for (prompt, _), params in zip(chunks, chunk_params)]
+    results = run_concurrently(calls, GENERATION_MAX_WORKERS)
+    days_by_number = {}
+    complete = True
+    for (prompt, _), params, result in zip(chunks, chunk_params, results):
+        text = result['result'] if result['error'] is None else f"{ERROR_PREFIX} {result['error']}"
+        chunk_days = None if text.startswith(ERROR_PREFIX) else parse_outfit_plan(text)
+        if not chunk_days:
+            complete = False
+            logging.error(f"Structured generation chunk failed: {text[:200]}")
+            completion_cache.delete(prompt_key(prompt, params))
+            continue
+        for day in chunk_days:
+            days_by_number.setdefault(day['day'], day)
+    days = [days_by_number[number] for number in sorted(days_by_number)]
+    if complete and days:
+        store_similar_trip(similar_trip, json.dumps({'days': days}), structured=True)
+    return days
 
 # Enhanced SERP API integration
 def get_product_with_real_links(query: str, gender: str = '', num_results: int = 5) -> list[dict]:
     """
     Enhanced version that gets more specific product results with better filtering
     """
-    from serp_service import get_shopping_items
+    from app.services.shopping_service import get_shopping_items
     
     # Add gender and make query more specific for shopping
     enhanced_query = f"{gender} {query} buy online shop".strip()
@@ -205,7 +658,7 @@ def get_outfit_inspiration_image(day_outfit_content: str, gender: str = '') -> s
     """
     Generate a search query for overall outfit inspiration based on the day's content
     """
-    from serp_utils import get_overall_outfit_image
+    from app.services.shopping_service import get_overall_outfit_image
     
     # Extract key clothing items from the content
     clothing_keywords = []
@@ -229,4 +682,4 @@ def get_outfit_inspiration_image(day_outfit_content: str, gender: str = '') -> s
     else:
         outfit_query = "casual travel outfit"
     
-    return get_overall_outfit_image(outfit_query, gender)
\ No newline at end of file
+    return get_overall_outfit_image(outfit_query, gender)
@@ -0,0 +1,205 @@
+"""
+Image proxy.
+Third-party images (SerpAPI/Google thumbnails, dummyjson and closet images)
+are fetched once, resized to the sizes the templates display and served from
+the local disk cache with long-lived cache headers. Proxy URLs are signed so
+the endpoint can't be used to fetch arbitrary URLs, and only public hosts
+are ever contacted.
+"""
+import io
+import os
+import hmac
+import socket
+import hashlib
+import logging
+import ipaddress
+from urllib.parse import urlparse, urljoin
+from flask import current_app, url_for
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from app.services.link_resolver import BROWSER_HEADERS, REDIRECT_STATUSES
+from app.utils.cache import TTLCache
+from app.utils.http_client import HttpClient
+from app.utils.image_cache import DiskImageCache, sniff_image_type
+from app.utils.singleflight import single_flight
+from app.instrumentation import register_metrics_source
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # without Pillow images are cached and served at their original size
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PROXY_ENABLED = os.getenv('IMAGE_PROXY_ENABLED', 'true').lower() == 'true'
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', 'image_cache')
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+IMAGE_PROXY_MAX_BYTES = int(os.getenv('IMAGE_PROXY_MAX_BYTES', 5 * 1024 * 1024))
+# Proxy URLs embed the source URL and size, so browsers may keep responses for a long time
+IMAGE_PROXY_MAX_AGE = int(os.getenv('IMAGE_PROXY_MAX_AGE', 30 * 24 * 60 * 60))
+# Sources that failed are sent straight to the original URL for a while instead of refetched
+IMAGE_PROXY_FAILURE_TTL = int(os.getenv('IMAGE_PROXY_FAILURE_TTL', 10 * 60))
+
+# Bounding boxes for the sizes templates render (2x the CSS size for high-DPI screens)
+IMAGE_SIZES = {
+    'thumb': (360, 360),   # 180px product cards, 80px starter closet items
+    'card': (480, 480),    # closet grid cards
+    'large': (700, 700),   # overall outfit image
+}
+JPEG_QUALITY = 85
+
+image_cache = DiskImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+register_metrics_source('image_cache', image_cache.stats)
+image_flight = single_flight('image_proxy')
+failed_images = TTLCache(max_entries=2000)
+
+class ImageProxyError(Exception):
+    """Raised when a source image can't be fetched or isn't a supported image."""
+    pass
+
+def sign_image_url(url, size, secret):
+    """Signature binding a source URL and size to this server's secret key."""
+    message = f"{size}|{url}".encode('utf-8')
+    return hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()[:32]
+
+def verify_image_signature(url, size, signature, secret):
+    return hmac.compare_digest(sign_image_url(url, size, secret), signature or '')
+
+def proxied_image_url(url, size='thumb'):
+    """
+    Template filter: the proxy URL for an external image.
+    Local and non-HTTP URLs, and every URL while the proxy is disabled, are returned unchanged.
+    """
+    if not IMAGE_PROXY_ENABLED or not url or not url.startswith(('http://', 'https://')):
+        return url
+    signature = sign_image_url(url, size, current_app.config['SECRET_KEY'])
+    return url_for('images.proxy', size=size, url=url, sig=signature)
+
+def is_public_address(address):
+    """True when an IP address (as a string, possibly with an IPv6 zone) is publicly routable."""
+    try:
+        return ipaddress.ip_address(address.split('%')[0]).is_global
+    except (AttributeError, ValueError):
+        return False
+
+def is_public_host(hostname):
+    """True when every address the host resolves to is publicly routable."""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(hostname, None)}
+    except (socket.gaierror, UnicodeError):
+        return False
+    return bool(addresses) and all(is_public_address(address) for address in addresses)
+
+class PublicPeerMixin:
+    """
+    Connection mixin that refuses a socket whose peer isn't publicly routable.
+    The check runs on the address actually connected to, before TLS or the request
+    is sent, so a DNS answer that changes after is_public_host can't reach an
+    internal service.
+    """
+
+    def _new_conn(self):
+        sock = super()._new_conn()
+        peer = sock.getpeername()[0]
+        if not is_public_address(peer):
+            sock.close()
+            raise ImageProxyError(f"Refusing to connect to non-public address {peer}")
+        return sock
+
+class PublicHTTPConnection(PublicPeerMixin, HTTPConnection):
+    pass
+
+class PublicHTTPSConnection(PublicPeerMixin, HTTPSConnection):
+    pass
+
+class PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = PublicHTTPConnection
+
+class PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = PublicHTTPSConnection
+
+class PublicOnlyAdapter(HTTPAdapter):
+    """requests adapter whose pools only connect to public addresses."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': PublicHTTPConnectionPool, 'https': PublicHTTPSConnectionPool
+        }
+
+# Source images are fetched through their own pool so every connection is vetted
+image_http_client = HttpClient(adapter_class=PublicOnlyAdapter)
+register_metrics_source('image_http', image_http_client.stats)
+
+def fetch_image(url, max_redirects=3):
+    """
+    Download a source image, following redirects only to public hosts and capping its size.
+    Connections themselves are vetted by image_http_client's PublicOnlyAdapter.
+    """
+    for _ in range(max_redirects + 1):
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname or not is_public_host(parsed.hostname):
+            raise ImageProxyError(f"Refusing to fetch image from {url[:100]}")
+        response = image_http_client.get(url, allow_redirects=False, stream=True, headers=BROWSER_HEADERS)
+        try:
+            if response.status_code in REDIRECT_STATUSES and response.headers.get('Location'):
+                url = urljoin(url, response.headers['Location'])
+                continue
+            if response.status_code != 200:
+                raise ImageProxyError(f"Image fetch returned {response.status_code} for {url[:100]}")
+            data = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                data.extend(chunk)
+                if len(data) > IMAGE_PROXY_MAX_BYTES:
+                    raise ImageProxyError(f"Image larger than {IMAGE_PROXY_MAX_BYTES} bytes: {url[:100]}")
+            return bytes(data)
+        finally:
+            response.close()
+    raise ImageProxyError(f"Too many redirects fetching {url[:100]}")
+
+def resize_image(data, box):
+    """Shrink an image to fit ``box``; returns the original bytes when no resize is needed or possible."""
+    if Image is None:
+        return data
+    try:
+        image = Image.open(io.BytesIO(data))
+        if getattr(image, 'is_animated', False) or (image.width <= box[0] and image.height <= box[1]):
+            return data
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(box)
+        output = io.BytesIO()
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image.save(output, format='PNG', optimize=True)
+        else:
+            image.convert('RGB').save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return output.getvalue()
+    except Exception as e:
+        logger.warning(f"Could not resize image, serving original: {e}")
+        return data
+
+def load_image(key, url, size):
+    """Fetch, validate, resize and cache one image."""
+    data = fetch_image(url)
+    if sniff_image_type(data) is None:
+        raise ImageProxyError(f"Not an image: {url[:100]}")
+    return image_cache.put(key, resize_image(data, IMAGE_SIZES[size]))
+
+def get_proxied_image(url, size):
+    """
+    The cached image for a source URL at a named size, fetching it on a miss.
+    Concurrent misses for the same image share one download.
+    """
+    if size not in IMAGE_SIZES:
+        raise ImageProxyError(f"Unknown image size: {size}")
+    key = image_cache.key(url, size)
+    image = image_cache.get(key)
+    if image:
+        return image
+    if failed_images.get(key):
+        raise ImageProxyError(f"Recently failed: {url[:100]}")
+    try:
+        return image_flight.do(key, load_image, key, url, size)
+    except Exception as e:
+        failed_images.set(key, True, IMAGE_PROXY_FAILURE_TTL)
+        raise ImageProxyError(str(e)) from e
@@ -0,0 +1,227 @@
+"""
+Database-backed job queue for background recommendation generation.
+The web route enqueues a job and returns immediately; a separate worker
+process (see worker.py) claims queued jobs and runs the pipeline.
+"""
+import os
+import time
+import socket
+import logging
+from datetime import datetime, timedelta
+from app import db
+from app.models.job import GenerationJob
+from app.services.database_service import DatabaseError, DatabaseValidationError
+from app.services.recommendation_service import (
+    generate_recommendations, save_recommendations, plan_fingerprint
+)
+from app.services.link_health import revalidate_links_if_due
+from app.instrumentation import collect_timings
+from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# Running jobs older than this are assumed abandoned (dead worker or closed stream)
+STALE_JOB_SECONDS = int(os.getenv('STALE_JOB_SECONDS', 600))
+
+# worker_id of jobs run by the web process itself (inline and streaming modes)
+INLINE_WORKER_ID = 'inline'
+
+def default_worker_id():
+    """Identify this worker process in claimed jobs."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def active_job_key(user_id, fingerprint):
+    """Value of GenerationJob.active_key while a user's plan is being generated."""
+    return f"{user_id}:{fingerprint}"
+
+def release_if_stale(job):
+    """Fail an abandoned running job so its plan can be generated again."""
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_JOB_SECONDS)
+    if job.status != 'running' or not job.started_at or job.started_at >= cutoff:
+        return False
+    logger.warning(f"Releasing stale generation job {job.id}")
+    fail_job(job, 'Generation was abandoned')
+    return True
+
+def start_generation(user_id, trip_data, user_profile, fingerprint=None, inline=False):
+    """
+    Register a generation for a trip plan unless one is already in flight.
+
+    Returns ``(job, created)``. If the user already has a queued or running job
+    for the same plan fingerprint, that job is returned with ``created`` False
+    and the caller should wait on it instead of starting duplicate work. The
+    unique ``active_key`` column makes this safe across concurrent requests.
+    Inline jobs are run by the web process, so they start out 'running'.
+    """
+    fingerprint = fingerprint or plan_fingerprint(trip_data, user_profile)
+    key = active_job_key(user_id, fingerprint)
+    try:
+        for _ in range(2):
+            existing = GenerationJob.query.filter_by(active_key=key).first()
+            if existing and not release_if_stale(existing):
+                logger.info(f"Plan already being generated by job {existing.id} for user {user_id}")
+                return existing, False
+
+            job = GenerationJob(user_id=user_id, fingerprint=fingerprint, active_key=key)
+            if inline:
+                job.status = 'running'
+                job.stage = 'weather'
+                job.worker_id = INLINE_WORKER_ID
+                job.started_at = datetime.utcnow()
+            else:
+                job.status = 'queued'
+                job.stage = 'queued'
+            job.set_payload({'trip_data': trip_data, 'user_profile': user_profile})
+            db.session.add(job)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another request registered the same plan first; return its job
+                db.session.rollback()
+                continue
+            logger.info(f"{'Started' if inline else 'Queued'} generation job {job.id} for user {user_id}")
+            return job, True
+
+        existing = GenerationJob.query.filter_by(active_key=key).first()
+        if existing:
+            return existing, False
+        raise DatabaseError("Could not register generation job")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error queueing generation job: {e}")
+        raise DatabaseError(f"Database error: {str(e)}")
+
+def enqueue_job(user_id, trip_data, user_profile, fingerprint=None):
+    """Queue a recommendation generation job for a trip plan, reusing one already in flight."""
+    job, _ = start_generation(user_id, trip_data, user_profile, fingerprint)
+    return job
+
+def get_job_for_user(job_id, user_id):
+    """Get a job by ID, ensuring the user owns it."""
+    job = GenerationJob.query.filter_by(id=job_id, user_id=user_id).first()
+    if not job:
+        raise DatabaseValidationError(f"Job with ID {job_id} not found or access denied")
+    return job
+
+def claim_next_job(worker_id=None):
+    """
+    Atomically claim the oldest queued job.
+
+    The conditional UPDATE only succeeds for one worker, so several worker
+    processes can poll the same table safely. Returns None when the queue is empty.
+    """
+    worker_id = worker_id or default_worker_id()
+    try:
+        candidates = (GenerationJob.query
+                      .filter_by(status='queued')
+                      .order_by(GenerationJob.created_at, GenerationJob.id)
+                      .with_entities(GenerationJob.id)
+                      .limit(5)
+                      .all())
+        for (job_id,) in candidates:
+            claimed = (GenerationJob.query
+                       .filter_by(id=job_id, status='queued')
+                       .update({'status': 'running', 'worker_id': worker_id,
+                                'started_at': datetime.utcnow()},
+                               synchronize_session=False))
+            db.session.commit()
+            if claimed:
+                return db.session.get(GenerationJob, job_id)
+        return None
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error claiming generation job: {e}")
+        raise DatabaseError(f"Database error: {str(e)}")
+
+def update_job_stage(job, stage):
+    """Record the pipeline stage a running job has reached."""
+    job.stage = stage
+    db.session.commit()
+
+def complete_job(job, trip_id):
+    """Mark a job finished and link the saved trip."""
+    job.status = 'completed'
+    job.stage = 'done'
+    job.trip_id = trip_id
+    job.active_key = None
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+def fail_job(job, error):
+    """Mark a job failed with an error message."""
+    db.session.rollback()
+    job.status = 'failed'
+    job.error = str(error)
+    job.active_key = None
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+def requeue_stale_jobs(max_age_seconds=None):
+    """
+    Put jobs back on the queue whose worker died mid-run.
+    Inline jobs belong to the web process and are failed by release_if_stale instead.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds or STALE_JOB_SECONDS)
+    count = (GenerationJob.query
+             .filter(GenerationJob.status == 'running', GenerationJob.started_at < cutoff,
+                     or_(GenerationJob.worker_id.is_(None), GenerationJob.worker_id != INLINE_WORKER_ID))
+             .update({'status': 'queued', 'worker_id': None, 'started_at': None},
+                     synchronize_session=False))
+    db.session.commit()
+    if count:
+        logger.warning(f"Requeued {count} stale generation jobs")
+    return count
+
+def process_job(job):
+    """Run the recommendation pipeline for a claimed job and save the trip."""
+    payload = job.get_payload()
+    trip_data = payload.get('trip_data', {})
+    user_profile = payload.get('user_profile', {})
+    with collect_timings() as timings:
+        try:
+            result = generate_recommendations(
+                trip_data,
+                user_profile,
+                on_stage=lambda stage: update_job_stage(job, stage)
+            )
+            update_job_stage(job, 'saving')
+            trip = save_recommendations(job.user_id, trip_data, result, fingerprint=job.fingerprint)
+            complete_job(job, trip.id)
+            logger.info(
+                f"Generation job {job.id} completed with trip {trip.id} in "
+                f"{timings.elapsed() * 1000:.0f}ms {timings.summary()}"
+            )
+            return trip
+        except Exception as e:
+            logger.error(f"Generation job {job.id} failed: {e}")
+            fail_job(job, e)
+            return None
+
+def run_worker(worker_id=None, poll_interval=2.0, once=False, sleep=None):
+    """
+    Worker loop: claim and process queued jobs until stopped.
+    With ``once`` the loop exits as soon as the queue is empty.
+    """
+    sleep = sleep or time.sleep
+    worker_id = worker_id or default_worker_id()
+    logger.info(f"Generation worker {worker_id} started")
+    processed = 0
+    while True:
+        try:
+            job = claim_next_job(worker_id)
+            if job is None:
+                if once:
+                    return processed
+                requeue_stale_jobs()
+                # Idle time goes to rechecking saved trips' shopping links
+                revalidate_links_if_due()
+                sleep(poll_interval)
+                continue
+            process_job(job)
+            processed += 1
+        except Exception as e:
+            # e.g. SQLite "database is locked": back off and try again rather than letting the worker die
+            logger.error(f"Generation worker {worker_id} loop error: {e}")
+            db.session.rollback()
+            sleep(poll_interval)
@@ -0,0 +1,160 @@
+"""
+Product link health checks.
+Whether a shopping link still works is checked with concurrent HEAD requests
+and cached per URL. Pages only read the cache, and the generation worker
+rechecks links stored on saved trips in the background as entries expire.
+"""
+import os
+import time
+import logging
+import threading
+import requests
+from app.services.link_resolver import BROWSER_HEADERS
+from app.utils.concurrency import provider_limiter, run_concurrently
+from app.utils.http_client import http_client, HTTP_CONNECT_TIMEOUT
+from app.utils.persistent_cache import SQLiteCache
+from app.instrumentation import register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+LINK_HEALTH_TTL = int(os.getenv('LINK_HEALTH_TTL', 24 * 60 * 60))
+# Broken links are rechecked sooner; retailers' outages are usually short
+LINK_HEALTH_BROKEN_TTL = int(os.getenv('LINK_HEALTH_BROKEN_TTL', 60 * 60))
+LINK_HEALTH_MAX_WORKERS = int(os.getenv('LINK_HEALTH_MAX_WORKERS', 8))
+LINK_HEALTH_TIMEOUT = (HTTP_CONNECT_TIMEOUT, float(os.getenv('LINK_HEALTH_READ_TIMEOUT', 5)))
+# How often the worker rechecks saved trips' links (0 disables) and how many recent trips it scans
+LINK_REVALIDATION_INTERVAL = int(os.getenv('LINK_REVALIDATION_INTERVAL', 60 * 60))
+LINK_REVALIDATION_TRIP_LIMIT = int(os.getenv('LINK_REVALIDATION_TRIP_LIMIT', 200))
+
+link_health_cache = SQLiteCache(
+    os.getenv('LINK_HEALTH_CACHE_PATH', os.getenv('SERP_CACHE_PATH', 'serp_cache.sqlite3')),
+    max_entries=int(os.getenv('LINK_HEALTH_CACHE_MAX_ENTRIES', 50000)),
+    # Pages keep showing the last known status until the worker rechecks it
+    stale_seconds=int(os.getenv('LINK_HEALTH_STALE_SECONDS', 7 * 24 * 60 * 60)),
+    table='link_health'
+)
+
+# Hosts that refuse HEAD are asked again with a GET that doesn't read the body
+HEAD_UNSUPPORTED_STATUSES = {405, 501}
+
+_counters = {'probes': 0, 'broken': 0, 'revalidations': 0}
+_counters_lock = threading.Lock()
+_last_revalidation = time.monotonic()
+
+def _count(field):
+    with _counters_lock:
+        _counters[field] += 1
+
+def link_health_stats():
+    with _counters_lock:
+        stats = dict(_counters)
+    stats['cache'] = link_health_cache.stats()
+    return stats
+
+register_metrics_source('link_health', link_health_stats)
+
+def probe_link(url: str) -> bool:
+    """Request a link once and report whether it answers with a non-error status."""
+    _count('probes')
+    try:
+        with provider_limiter.slot('redirect'):
+            response = http_client.head(url, allow_redirects=True, headers=BROWSER_HEADERS,
+                                        timeout=LINK_HEALTH_TIMEOUT, retries=0)
+            if response.status_code in HEAD_UNSUPPORTED_STATUSES:
+                response = http_client.get(url, allow_redirects=True, headers=BROWSER_HEADERS,
+                                           timeout=LINK_HEALTH_TIMEOUT, retries=0, stream=True)
+                response.close()
+    except requests.RequestException as e:
+        print(f"❌ Link test failed for {url[:50]}... - Error: {e}")
+        _count('broken')
+        return False
+    is_working = response.status_code < 400
+    print(f"🔍 Link test for {url[:50]}... - Status: {response.status_code} ({'✅ Working' if is_working else '❌ Broken'})")
+    if not is_working:
+        _count('broken')
+    return is_working
+
+def check_link(url: str, refresh: bool = False) -> bool:
+    """Cached health of one link; probes it when the cache has no fresh answer (or ``refresh``)."""
+    if not url or not url.startswith('http'):
+        return False
+    if not refresh:
+        entry = link_health_cache.get(url)
+        if entry and entry.fresh:
+            return entry.value
+    is_working = probe_link(url)
+    link_health_cache.set(url, is_working, LINK_HEALTH_TTL if is_working else LINK_HEALTH_BROKEN_TTL)
+    return is_working
+
+def check_links(urls, refresh: bool = False, max_workers=None) -> dict:
+    """Health of a batch of links, probing the uncached ones concurrently. Maps each URL to a bool."""
+    distinct = list(dict.fromkeys(url for url in urls if url))
+    outcomes = run_concurrently(
+        [(check_link, (url, refresh), {}) for url in distinct],
+        max_workers=max_workers or LINK_HEALTH_MAX_WORKERS
+    )
+    return {url: bool(outcome['result']) for url, outcome in zip(distinct, outcomes)}
+
+def cached_link_health(urls) -> dict:
+    """Last known health of each link without any network I/O; None when never checked."""
+    health = {}
+    for url in dict.fromkeys(url for url in urls if url):
+        entry = link_health_cache.peek(url)
+        health[url] = entry.value if entry else None
+    return health
+
+def collect_outfit_links(data) -> list:
+    """Every product and purchase option link in stored outfit data, whatever its layout."""
+    links = []
+    if isinstance(data, dict):
+        link = data.get('link')
+        if isinstance(link, str) and link.startswith('http'):
+            links.append(link)
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                links.extend(collect_outfit_links(value))
+    elif isinstance(data, list):
+        for value in data:
+            links.extend(collect_outfit_links(value))
+    return list(dict.fromkeys(links))
+
+def _needs_check(url):
+    entry = link_health_cache.peek(url)
+    return entry is None or not entry.fresh
+
+def revalidate_trip_links(trip_limit=None):
+    """
+    Recheck links on the most recent saved trips whose cached status is missing or expired.
+    Needs an app context. Returns counts of what was scanned and checked.
+    """
+    from app.models.trip import Trip
+
+    trips = (Trip.query.filter(Trip.outfit_data.isnot(None) | Trip.days.any())
+             .options(Trip.with_content(), Trip.with_days())
+             .order_by(Trip.created_at.desc())
+             .limit(trip_limit or LINK_REVALIDATION_TRIP_LIMIT)
+             .all())
+    links = list(dict.fromkeys(link for trip in trips for link in collect_outfit_links(trip.get_outfit_data())))
+    due = [link for link in links if _needs_check(link)]
+    health = check_links(due, refresh=True)
+    _count('revalidations')
+    summary = {
+        'trips': len(trips),
+        'links': len(links),
+        'checked': len(health),
+        'broken': sum(1 for ok in health.values() if not ok)
+    }
+    logger.info(f"Link revalidation: {summary}")
+    return summary
+
+def revalidate_links_if_due():
+    """Run revalidate_trip_links when LINK_REVALIDATION_INTERVAL has passed; for idle worker loops."""
+    global _last_revalidation
+    if not LINK_REVALIDATION_INTERVAL or time.monotonic() - _last_revalidation < LINK_REVALIDATION_INTERVAL:
+        return None
+    _last_revalidation = time.monotonic()
+    try:
+        return revalidate_trip_links()
+    except Exception as e:
+        logger.error(f"Link revalidation failed: {e}")
+        return None
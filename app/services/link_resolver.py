@@ -0,0 +1,203 @@
+"""
+Product link resolution.
+Turns the tracking/redirect links SerpAPI returns into clean retailer URLs.
+Known retailer product URLs and Google redirect wrappers are handled without
+any network I/O, every other link is followed once and the raw -> final
+mapping is cached persistently, and batches of links resolve concurrently.
+"""
+import os
+import logging
+import threading
+from urllib.parse import urlparse, parse_qs, urljoin
+import requests
+from app.utils.concurrency import provider_limiter, run_concurrently
+from app.utils.http_client import http_client
+from app.utils.persistent_cache import SQLiteCache
+from app.instrumentation import timed, register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+# Retailer hosts whose product URLs are already final; the path markers are the
+# ones extract_clean_product_url knows how to clean ('' = any path)
+RETAILER_PRODUCT_PATHS = {
+    'amazon.com': ('/dp/', '/gp/product/'),
+    'target.com': ('/p/',),
+    'walmart.com': ('/ip/',),
+    'hm.com': ('',),
+}
+
+# Raw -> resolved URL mappings, stored alongside the SerpAPI cache
+LINK_CACHE_TTL = int(os.getenv('LINK_CACHE_TTL', 7 * 24 * 60 * 60))
+# Links that couldn't be followed to the end are retried sooner
+LINK_CACHE_FAILURE_TTL = int(os.getenv('LINK_CACHE_FAILURE_TTL', 60 * 60))
+LINK_RESOLVE_MAX_WORKERS = int(os.getenv('LINK_RESOLVE_MAX_WORKERS', 8))
+link_cache = SQLiteCache(
+    os.getenv('LINK_CACHE_PATH', os.getenv('SERP_CACHE_PATH', 'serp_cache.sqlite3')),
+    max_entries=int(os.getenv('LINK_CACHE_MAX_ENTRIES', 20000)),
+    table='redirect_cache'
+)
+
+_counters = {'short_circuits': 0, 'network_resolutions': 0}
+_counters_lock = threading.Lock()
+
+def _count(field):
+    with _counters_lock:
+        _counters[field] += 1
+
+def resolver_stats():
+    """Short-circuit and network counters plus the persistent cache counters."""
+    with _counters_lock:
+        stats = dict(_counters)
+    stats['cache'] = link_cache.stats()
+    return stats
+
+register_metrics_source('link_resolver', resolver_stats)
+
+def is_retailer_product_url(url: str) -> bool:
+    """True for a known retailer's product page, which needs no redirect resolution."""
+    parsed = urlparse(url or '')
+    host = parsed.netloc.lower().split(':')[0]
+    for domain, markers in RETAILER_PRODUCT_PATHS.items():
+        if host == domain or host.endswith('.' + domain):
+            return any(marker in parsed.path for marker in markers)
+    return False
+
+def extract_google_redirect_target(redirect_url: str):
+    """Destination embedded in a Google redirect link (url/q/u parameter), if any."""
+    if 'google.com' not in urlparse(redirect_url).netloc:
+        return None
+    params = parse_qs(urlparse(redirect_url).query)
+    # Try different parameter names that Google uses
+    for param_name in ['url', 'q', 'u']:
+        if param_name in params and params[param_name]:
+            direct_url = params[param_name][0]
+            if direct_url.startswith('http'):
+                return direct_url
+    return None
+
+def resolve_without_network(redirect_url: str):
+    """Resolve a link from its shape alone, or return None when it has to be followed."""
+    if is_retailer_product_url(redirect_url):
+        return redirect_url
+    direct_url = extract_google_redirect_target(redirect_url)
+    if direct_url:
+        print(f"✅ Extracted direct URL from redirect: {direct_url[:100]}...")
+        return direct_url
+    return None
+
+@timed('redirect')
+def follow_redirects(redirect_url: str, max_redirects: int = 3):
+    """
+    Follow a redirect chain with HEAD requests over the shared pool.
+    Returns ``(url, complete)``; ``complete`` is False when the chain was cut short.
+    """
+    current_url = redirect_url
+    for i in range(max_redirects):
+        try:
+            with provider_limiter.slot('redirect'):
+                response = http_client.head(current_url, allow_redirects=False, headers=BROWSER_HEADERS)
+        except requests.RequestException as e:
+            print(f"⚠️ Error following redirect {i+1}: {e}")
+            return current_url, False
+
+        if response.status_code not in REDIRECT_STATUSES:
+            # Final destination reached
+            print(f"✅ Final URL resolved: {current_url[:100]}...")
+            return current_url, True
+        location = response.headers.get('Location')
+        if not location:
+            return current_url, False
+        # Relative URLs are made absolute
+        current_url = urljoin(current_url, location)
+        print(f"🔄 Redirect {i+1}: {current_url[:100]}...")
+        # A known retailer product page is final; skip the remaining hops
+        if is_retailer_product_url(current_url):
+            return current_url, True
+    return current_url, False
+
+def resolve_redirect_link(redirect_url: str, max_redirects: int = 3) -> str:
+    """
+    Resolve redirect links to get the actual product page URL
+    """
+    if not redirect_url or not redirect_url.startswith('http'):
+        return redirect_url
+
+    try:
+        direct_url = resolve_without_network(redirect_url)
+        if direct_url:
+            _count('short_circuits')
+            return direct_url
+
+        entry = link_cache.get(redirect_url)
+        if entry:
+            return entry.value
+
+        print(f"🔄 Resolving redirect: {redirect_url[:100]}...")
+        _count('network_resolutions')
+        resolved_url, complete = follow_redirects(redirect_url, max_redirects)
+        link_cache.set(redirect_url, resolved_url, LINK_CACHE_TTL if complete else LINK_CACHE_FAILURE_TTL)
+        return resolved_url
+
+    except Exception as e:
+        print(f"❌ Error resolving redirect: {e}")
+        return redirect_url
+
+def extract_clean_product_url(raw_url: str) -> str:
+    """
+    Clean and extract the actual product URL from various link formats
+    """
+    if not raw_url:
+        return None
+
+    # Handle different URL patterns
+    if 'amazon.com' in raw_url:
+        # Clean Amazon URLs - remove tracking parameters
+        if '/dp/' in raw_url:
+            product_id = raw_url.split('/dp/')[1].split('/')[0].split('?')[0]
+            return f"https://www.amazon.com/dp/{product_id}"
+        elif '/gp/product/' in raw_url:
+            product_id = raw_url.split('/gp/product/')[1].split('/')[0].split('?')[0]
+            return f"https://www.amazon.com/dp/{product_id}"
+
+    elif 'target.com' in raw_url:
+        # Clean Target URLs
+        if '/p/' in raw_url:
+            return raw_url.split('?')[0]  # Remove query parameters
+
+    elif 'walmart.com' in raw_url:
+        # Clean Walmart URLs
+        if '/ip/' in raw_url:
+            return raw_url.split('?')[0]  # Remove query parameters
+
+    elif 'hm.com' in raw_url:
+        # H&M URLs are usually clean
+        return raw_url.split('?')[0]
+
+    # For other domains, try to clean common tracking parameters
+    clean_url = raw_url.split('?')[0]  # Remove all query parameters
+    return clean_url
+
+def resolve_product_link(raw_url: str) -> str:
+    """Resolve and clean one product link."""
+    return extract_clean_product_url(resolve_redirect_link(raw_url))
+
+def resolve_links(raw_urls, max_workers=None) -> dict:
+    """
+    Resolve and clean a batch of product links concurrently.
+    Returns a dict mapping each distinct raw URL to its clean URL.
+    """
+    distinct = list(dict.fromkeys(url for url in raw_urls if url))
+    outcomes = run_concurrently(
+        [(resolve_product_link, (url,), {}) for url in distinct],
+        max_workers=max_workers or LINK_RESOLVE_MAX_WORKERS
+    )
+    return {
+        url: outcome['result'] if outcome['error'] is None else extract_clean_product_url(url)
+        for url, outcome in zip(distinct, outcomes)
+    }
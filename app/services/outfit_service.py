@@ -0,0 +1,127 @@
+"""
+Outfit shopping pipeline.
+Turns parsed daily outfits into per-day shopping suggestions. Item queries
+for the whole trip are collected first, duplicates across days are
+collapsed to one search, and the distinct searches run concurrently.
+"""
+import os
+import re
+import copy
+import logging
+from app.services.shopping_service import get_shopping_items
+from app.utils.concurrency import run_concurrently
+from app.utils.outfit_parser import parse_sections, OUTFIT_SECTION
+
+logger = logging.getLogger(__name__)
+
+# Thread pool size for the per-trip shopping fan-out
+SHOPPING_MAX_WORKERS = int(os.getenv('SHOPPING_MAX_WORKERS', 8))
+
+def extract_outfit_items(content):
+    """Extract (item_type, description) pairs from a day's 'Complete Outfit' section."""
+    sections, _ = parse_sections(content or '')
+    outfit = next((section for section in sections if section.name.lower() == OUTFIT_SECTION), None)
+    return list(outfit.items) if outfit else []
+
+GENDER_PREFIXES = {
+    'women', 'womens', 'woman', 'female', 'ladies',
+    'men', 'mens', 'man', 'male', 'unisex'
+}
+QUERY_STOPWORDS = {'a', 'an', 'the', 'and', 'with', 'for', 'of', 'in', 'on', 'or', 'to', 'pair'}
+QUERY_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def normalize_item_query(item_desc, gender=''):
+    """
+    Normalize an item query so equivalent searches share one key.
+    Ignores case, punctuation, whitespace, word order, stopwords and a
+    leading gender prefix ("Women's White Sneakers" == "sneakers, white").
+    """
+    text = (item_desc or '').lower().replace("'s ", ' ').replace("'", '')
+    tokens = QUERY_TOKEN_PATTERN.findall(text)
+    prefixes = GENDER_PREFIXES | set(QUERY_TOKEN_PATTERN.findall((gender or '').lower()))
+    while tokens and tokens[0] in prefixes:
+        tokens = tokens[1:]
+    return ' '.join(sorted(token for token in tokens if token not in QUERY_STOPWORDS))
+
+def placeholder_item(item_desc):
+    """Shopping entry shown when a search returns nothing for an outfit item."""
+    return {
+        'title': item_desc,
+        'source': None,
+        'price': None,
+        'thumbnail': None,
+        'link': None
+    }
+
+def build_outfit_data(days, gender, num_results=3, max_workers=None):
+    """
+    Search shopping results for every outfit item of the trip.
+
+    Items are planned for the whole trip first so a query repeated across days
+    ("white sneakers" on day 1 and day 4) is searched once and its results are
+    copied back to every day that uses it. Distinct searches run in parallel.
+
+    Returns ``(outfit_data, item_timings, stats)`` where ``outfit_data`` maps each
+    day title to its content and shopping list (in the original day/item order),
+    ``item_timings`` records how long each item's search took and ``stats``
+    counts item searches, upstream searches and searches saved by deduplication.
+    """
+    planned = []
+    distinct = {}  # normalized query -> index of its upstream search
+    calls = []
+    for day in days:
+        day_title = day.get('title', 'Day')
+        if day.get('items'):
+            # Parsed days carry their outfit items; structured ones add a search query for each
+            items = [(item['category'], item.get('search_query') or item['description']) for item in day['items']]
+        else:
+            items = extract_outfit_items(day.get('content', ''))
+        if not items:
+            logger.warning(f"No 'Complete Outfit' section found for {day_title}")
+        day_items = []
+        for item_type, item_desc in items:
+            key = normalize_item_query(item_desc, gender) or item_desc
+            if key not in distinct:
+                distinct[key] = len(calls)
+                logger.info(f"Searching for: {f'{gender} {item_desc}'.strip()}")
+                calls.append((get_shopping_items, (item_desc, gender), {'num_results': num_results}))
+            day_items.append((item_type, item_desc, distinct[key]))
+        planned.append((day_title, day.get('content', ''), day_items))
+
+    results = run_concurrently(calls, max_workers=max_workers or SHOPPING_MAX_WORKERS)
+
+    outfit_data = {}
+    item_timings = []
+    used = set()
+    for day_title, content, day_items in planned:
+        shopping_items = []
+        for item_type, item_desc, call_index in day_items:
+            outcome = results[call_index]
+            deduplicated = call_index in used
+            used.add(call_index)
+            if outcome['result']:
+                # Each day gets its own copy so later per-day edits don't leak across days
+                shopping_items.extend(copy.deepcopy(outcome['result']))
+            else:
+                shopping_items.append(placeholder_item(item_desc))
+            item_timings.append({
+                'day': day_title,
+                'item_type': item_type.strip(),
+                'query': item_desc,
+                'seconds': 0.0 if deduplicated else round(outcome['seconds'], 3),
+                'results': len(outcome['result'] or []),
+                'deduplicated': deduplicated,
+                'error': str(outcome['error']) if outcome['error'] else None
+            })
+        outfit_data[day_title] = {
+            'content': content,
+            'shopping': shopping_items
+        }
+
+    item_count = len(item_timings)
+    stats = {
+        'item_searches': item_count,
+        'upstream_searches': len(calls),
+        'searches_saved': item_count - len(calls)
+    }
+    return outfit_data, item_timings, stats
@@ -0,0 +1,286 @@
+"""
+Recommendation generation pipeline.
+Runs weather lookup, outfit generation, parsing and shopping search for a
+trip plan, independently of the request/session so the same pipeline can be
+used inline by the route or by the background job worker.
+"""
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from app.services.weather_service import get_weather
+from app.models.weather import WeatherSeries
+from app.services.genai_service import (
+    build_prompt_from_session, get_recommendations, stream_recommendations, completion_params,
+    plan_day_chunks, get_chunked_recommendations, stream_chunked_recommendations, get_outfit_plan,
+    STRUCTURED_OUTPUT
+)
+from app.services.outfit_service import build_outfit_data
+from app.services.database_service import add_trip_orm
+from app.utils.outfit_parser import render_days_html
+from app.utils.helpers import (
+    parse_daily_outfits, IncrementalDayParser, outfit_plan_days, render_outfit_plan
+)
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages, in the order they run
+STAGES = ['weather', 'generating', 'parsing', 'shopping', 'saving']
+
+# Bump when the pipeline changes enough that old trips should not be reused
+FINGERPRINT_VERSION = 1
+
+def plan_fingerprint(trip_data, user_profile):
+    """
+    Stable hash of everything that shapes a trip's recommendations.
+
+    Two plans with the same destination, dates, activities and profile get the
+    same fingerprint regardless of key order, letter case, surrounding
+    whitespace or activity order, so a repeated plan can reuse its stored Trip.
+    """
+    def clean(value):
+        return str(value if value is not None else '').strip().lower()
+
+    activities = trip_data.get('activities') or []
+    if isinstance(activities, str):
+        activities = activities.split(',')
+    plan = {
+        'version': FINGERPRINT_VERSION,
+        'city': clean(trip_data.get('city')),
+        'region': clean(trip_data.get('region')),
+        'start_date': clean(trip_data.get('start_date')),
+        'end_date': clean(trip_data.get('end_date')),
+        'activities': sorted({clean(a) for a in activities if clean(a)}),
+        'gender': clean(user_profile.get('gender')),
+        'age': clean(user_profile.get('age')),
+    }
+    canonical = json.dumps(plan, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def build_template_data(trip_data, user_profile, weather_summary):
+    """Assemble the trip overview shown on the recommendations page (weather as a WeatherSeries)."""
+    return {
+        'city': trip_data['city'],
+        'region': trip_data['region'],
+        'start_date': trip_data['start_date'],
+        'end_date': trip_data['end_date'],
+        'days': trip_data['days'],
+        'activities': trip_data['activities'],
+        'weather_summary': weather_summary,
+        'gender': user_profile.get('gender', ''),
+        'age': user_profile.get('age', 'N/A')
+    }
+
+def fetch_weather(trip_data):
+    """WeatherSeries for the trip, or a placeholder series when the lookup fails."""
+    try:
+        return get_weather(
+            trip_data['city'],
+            trip_data['region'],
+            trip_data['start_date'],
+            trip_data['end_date']
+        )
+    except Exception as weather_exc:
+        logger.error(f"Error fetching weather summary: {weather_exc}")
+        return WeatherSeries.unavailable('Weather data not available')
+
+def trip_length(trip_data):
+    """Number of days in the trip, or None when its dates can't be read."""
+    try:
+        start = datetime.strptime(trip_data['start_date'], "%Y-%m-%d")
+        return (datetime.strptime(trip_data['end_date'], "%Y-%m-%d") - start).days + 1
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def weather_for_days(trip_data, weather, day_range):
+    """The part of the forecast covering ``day_range``; the whole forecast if none of it matches."""
+    start = datetime.strptime(trip_data['start_date'], "%Y-%m-%d")
+    first = (start + timedelta(days=day_range[0] - 1)).strftime("%Y-%m-%d")
+    last = (start + timedelta(days=day_range[1] - 1)).strftime("%Y-%m-%d")
+    days = [day for day in weather if first <= str(day.date) <= last]
+    return WeatherSeries(days) if days else weather
+
+def build_prompt(trip_data, weather, day_range=None, structured=False):
+    """Prompt for a trip plan (or one day range of it) with its weather forecast filled in."""
+    trip_data_with_weather = dict(trip_data)
+    if day_range:
+        weather = weather_for_days(trip_data, weather, day_range)
+    trip_data_with_weather['weather_summary'] = str(weather)
+    return build_prompt_from_session(trip_data_with_weather, day_range, structured=structured)
+
+def generation_chunks(trip_data, weather, structured=False):
+    """
+    (prompt, params) for each completion a trip is generated with: one for a
+    short trip, one per day range for a long one, each with max_tokens sized
+    to its days.
+    """
+    num_days = trip_length(trip_data)
+    if not num_days or num_days < 1:
+        return [(build_prompt(trip_data, weather, structured=structured), completion_params())]
+    day_ranges = plan_day_chunks(num_days)
+    if len(day_ranges) == 1:
+        return [(build_prompt(trip_data, weather, structured=structured), completion_params(num_days))]
+    return [
+        (build_prompt(trip_data, weather, day_range, structured), completion_params(day_range[1] - day_range[0] + 1))
+        for day_range in day_ranges
+    ]
+
+def generate_structured(trip_data, user_profile, weather):
+    """
+    Days and markdown response for a trip generated in structured-output mode:
+    the outfits come back as validated JSON and the markdown is rendered from it.
+    """
+    plan = get_outfit_plan(generation_chunks(trip_data, weather, structured=True),
+                           similar_trip=(trip_data, user_profile))
+    days = outfit_plan_days(plan)
+    return render_outfit_plan(days), days
+
+def search_shopping(days, gender):
+    """Run the shopping fan-out for parsed days and log per-item timings."""
+    outfit_data, item_timings, stats = build_outfit_data(days, gender)
+    for timing in item_timings:
+        if timing['deduplicated']:
+            continue
+        logger.info(
+            f"Shopping search '{timing['query']}' ({timing['day']}) took "
+            f"{timing['seconds']}s, {timing['results']} results"
+        )
+    logger.info(
+        f"Shopping searches: {stats['item_searches']} items, {stats['upstream_searches']} upstream "
+        f"calls, {stats['searches_saved']} saved by deduplication"
+    )
+    logger.debug(f"Built outfit_data with shopping items: {list(outfit_data.keys())}")
+    return outfit_data
+
+def generate_recommendations(trip_data, user_profile, on_stage=None):
+    """
+    Run the full generation pipeline for a trip plan.
+
+    ``on_stage`` is called with each stage name from ``STAGES`` as it starts.
+    Returns a dict with ``template_data``, ``response``, ``days``, ``outfit_data``
+    and ``rendered_html`` (each day's content as HTML, see render_days_html).
+    """
+    def stage(name):
+        if on_stage:
+            on_stage(name)
+
+    stage('weather')
+    weather = fetch_weather(trip_data)
+    template_data = build_template_data(trip_data, user_profile, weather)
+
+    stage('generating')
+    if STRUCTURED_OUTPUT:
+        response, days = generate_structured(trip_data, user_profile, weather)
+        print(f"Structured OpenAI response: {len(days)} days")
+        stage('parsing')
+    else:
+        chunks = generation_chunks(trip_data, weather)
+        if len(chunks) == 1:
+            prompt, params = chunks[0]
+            response = get_recommendations(prompt, similar_trip=(trip_data, user_profile), params=params)
+        else:
+            response = get_chunked_recommendations(chunks, similar_trip=(trip_data, user_profile))
+        print(f"Raw OpenAI response: {response[:200] if response else 'No response'}...")
+
+        stage('parsing')
+        days = parse_daily_outfits(response)
+
+    stage('shopping')
+    outfit_data = search_shopping(days, template_data.get('gender', ''))
+
+    return {
+        'template_data': template_data,
+        'response': response,
+        'days': days,
+        'outfit_data': outfit_data,
+        'rendered_html': render_days_html(days)
+    }
+
+def stream_generation(trip_data, user_profile):
+    """
+    Streaming variant of ``generate_recommendations``.
+
+    Yields ``('weather', template_data)`` first, then ``('day', index, day)`` as
+    soon as each day's section of the completion has closed,
+    ``('generated', response)`` when the completion ends, then
+    ``('shopping', outfit_data)`` once the shopping fan-out finishes and finally
+    ``('result', result)`` with the same dict ``generate_recommendations`` returns.
+    In structured-output mode the days are yielded together once the plan is complete.
+    """
+    weather = fetch_weather(trip_data)
+    template_data = build_template_data(trip_data, user_profile, weather)
+    yield ('weather', template_data)
+
+    if STRUCTURED_OUTPUT:
+        response, days = generate_structured(trip_data, user_profile, weather)
+        for index, day in enumerate(days):
+            yield ('day', index, day)
+        yield ('generated', response)
+        yield from finish_stream(template_data, response, days)
+        return
+
+    parser = IncrementalDayParser()
+    fragments = []
+    days = []
+
+    def emit(completed):
+        for day in completed:
+            days.append(day)
+            yield ('day', len(days) - 1, day)
+
+    chunks = generation_chunks(trip_data, weather)
+    if len(chunks) == 1:
+        prompt, params = chunks[0]
+        stream = stream_recommendations(prompt, similar_trip=(trip_data, user_profile), params=params)
+    else:
+        stream = stream_chunked_recommendations(chunks, similar_trip=(trip_data, user_profile))
+    for fragment in stream:
+        fragments.append(fragment)
+        yield from emit(parser.feed(fragment))
+    yield from emit(parser.close())
+    response = ''.join(fragments)
+    print(f"Raw OpenAI response: {response[:200] if response else 'No response'}...")
+    yield ('generated', response)
+    yield from finish_stream(template_data, response, days)
+
+def finish_stream(template_data, response, days):
+    """Shopping and result events that end ``stream_generation``."""
+    outfit_data = search_shopping(days, template_data.get('gender', ''))
+    yield ('shopping', outfit_data)
+
+    yield ('result', {
+        'template_data': template_data,
+        'response': response,
+        'days': days,
+        'outfit_data': outfit_data,
+        'rendered_html': render_days_html(days)
+    })
+
+def save_recommendations(user_id, trip_data, result, fingerprint=None):
+    """
+    Persist a generated result as a Trip, tagged with the plan ``fingerprint``
+    so repeats of the same plan can be served from it. Raises the database
+    service errors.
+    """
+    template_data = result['template_data']
+    activities = trip_data['activities']
+    activities_str = ','.join(activities) if isinstance(activities, list) else (activities or '')
+    weather = template_data['weather_summary']
+    return add_trip_orm(
+        user_id=user_id,
+        city=trip_data['city'],
+        region=trip_data['region'] or '',
+        gender=template_data['gender'],
+        age=template_data['age'],
+        activities=activities_str,
+        duration=trip_data['days'],
+        weather=weather.to_json() if isinstance(weather, WeatherSeries) else weather,
+        recommendations=result['response'],
+        outfit_data={
+            'days': result['days'],
+            'outfit_data': result['outfit_data'],
+            # Day HTML rendered once here and served as-is when the trip is viewed
+            'rendered_html': result.get('rendered_html') or render_days_html(result['days'])
+        },
+        plan_fingerprint=fingerprint
+    )
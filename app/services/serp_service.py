@@ -1,325 +1,133 @@
+"""
+SerpAPI transport.
+Every SerpAPI query goes through serpapi_search, which adds the shared
+persistent cache, request coalescing and rate limiting. The shopping
+pipeline reaches it through SerpApiProvider in shopping_providers.
+"""
 import os
 from serpapi import GoogleSearch
 from dotenv import load_dotenv
 import json
-import time
-import requests
-from urllib.parse import urlparse, parse_qs
-import re
+import threading
+from app.utils.concurrency import provider_limiter
+from app.utils.rate_limiter import rate_limiter
+from app.utils.persistent_cache import SQLiteCache
+from app.utils.singleflight import single_flight, ProcessLock
+from app.utils.http_client import http_client, HTTP_CONNECT_TIMEOUT, HTTP_SLOW_READ_TIMEOUT
+from app.instrumentation import span, register_metrics_source
 
 load_dotenv()
 API_KEY = os.getenv("SERPAPI_KEY")
 
-if not API_KEY:
-    raise EnvironmentError("SERPAPI_KEY environment variable not set")
-
-def get_overall_outfit_image(query: str, gender: str = '') -> str:
-    """Get one image representing the full outfit (from Google Images)"""
-    full_query = f"{gender} {query}".strip()
-    print(f"🖼️ [Images] Searching: {full_query}")
-    
-    params = {
-        "engine": "google_images",
-        "q": full_query,
-        "google_domain": "google.com",
-        "hl": "en",
-        "gl": "us",
-        "api_key": API_KEY
-    }
-    
-    search = GoogleSearch(params)
-    results = search.get_dict()
-    
-    print("🧾 RAW IMAGE RESPONSE:")
-    print(json.dumps(results, indent=2)[:1000])  # print first 1000 characters only
-    
-    images = results.get("images_results", [])
-    print(f"📸 Found {len(images)} images for '{full_query}'")
-    
-    if images:
-        print("🔗 First Image URL:", images[0].get("thumbnail"))
-        return images[0].get("thumbnail")
-    
-    return None
-
-def resolve_redirect_link(redirect_url: str, max_redirects: int = 3) -> str:
-    """
-    Resolve redirect links to get the actual product page URL
-    """
-    if not redirect_url or not redirect_url.startswith('http'):
-        return redirect_url
-    
-    try:
-        print(f"🔄 Resolving redirect: {redirect_url[:100]}...")
-        
-        # First, try to extract direct URL from Google redirect
-        if 'google.com' in redirect_url and ('url=' in redirect_url or 'q=' in redirect_url):
-            parsed = urlparse(redirect_url)
-            params = parse_qs(parsed.query)
-            
-            # Try different parameter names that Google uses
-            for param_name in ['url', 'q', 'u']:
-                if param_name in params and params[param_name]:
-                    direct_url = params[param_name][0]
-                    if direct_url.startswith('http'):
-                        print(f"✅ Extracted direct URL from redirect: {direct_url[:100]}...")
-                        return direct_url
-        
-        # If extraction fails, follow the redirect manually
-        session = requests.Session()
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-        
-        current_url = redirect_url
-        for i in range(max_redirects):
-            try:
-                response = session.head(current_url, allow_redirects=False, timeout=10)
-                
-                if response.status_code in [301, 302, 303, 307, 308]:
-                    location = response.headers.get('Location')
-                    if location:
-                        if location.startswith('/'):
-                            # Relative URL, make it absolute
-                            from urllib.parse import urljoin
-                            current_url = urljoin(current_url, location)
-                        else:
-                            current_url = location
-                        print(f"🔄 Redirect {i+1}: {current_url[:100]}...")
-                    else:
-                        break
-                else:
-                    # Final destination reached
-                    print(f"✅ Final URL resolved: {current_url[:100]}...")
-                    return current_url
-                    
-            except requests.RequestException as e:
-                print(f"⚠️ Error following redirect {i+1}: {e}")
-                break
-        
-        return current_url
-        
-    except Exception as e:
-        print(f"❌ Error resolving redirect: {e}")
-        return redirect_url
-
-def extract_clean_product_url(raw_url: str) -> str:
-    """
-    Clean and extract the actual product URL from various link formats
-    """
-    if not raw_url:
-        return None
-    
-    # Handle different URL patterns
-    if 'amazon.com' in raw_url:
-        # Clean Amazon URLs - remove tracking parameters
-        if '/dp/' in raw_url:
-            product_id = raw_url.split('/dp/')[1].split('/')[0].split('?')[0]
-            return f"https://www.amazon.com/dp/{product_id}"
-        elif '/gp/product/' in raw_url:
-            product_id = raw_url.split('/gp/product/')[1].split('/')[0].split('?')[0]
-            return f"https://www.amazon.com/dp/{product_id}"
-    
-    elif 'target.com' in raw_url:
-        # Clean Target URLs
-        if '/p/' in raw_url:
-            return raw_url.split('?')[0]  # Remove query parameters
-    
-    elif 'walmart.com' in raw_url:
-        # Clean Walmart URLs
-        if '/ip/' in raw_url:
-            return raw_url.split('?')[0]  # Remove query parameters
-    
-    elif 'hm.com' in raw_url:
-        # H&M URLs are usually clean
-        return raw_url.split('?')[0]
-    
-    # For other domains, try to clean common tracking parameters
-    clean_url = raw_url.split('?')[0]  # Remove all query parameters
-    return clean_url
-
-def get_shopping_items(query: str, gender: str = '', num_results: int = 3) -> list[dict]:
-    """Searches Google Shopping for product results with REAL working product links."""
-    full_query = f"{gender} {query}".strip()
-    print(f"🛍️ [Shopping] Searching: {full_query}")
-    if not full_query:
-        print("⚠️ Query is empty! Returning no results.")
-        return []
-
-    params = {
-        "engine": "google_shopping",
-        "q": full_query,
-        "google_domain": "google.com",
-        "hl": "en",
-        "gl": "us",
-        "api_key": API_KEY
-    }
-    print(f"📝 Params: {json.dumps(params)}")
-
-    search = GoogleSearch(params)
-    results = search.get_dict()
-    print("📝 RAW SERPAPI RESPONSE (truncated):")
-    print(json.dumps(results, indent=2)[:2000])
-
-    shopping_results = results.get("shopping_results", [])
-    if not shopping_results:
-        print(f"⚠️ No shopping results found for query: '{full_query}'")
-        if 'error' in results:
-            print(f"❌ SERPAPI ERROR: {results['error']}")
-    else:
-        print("🔍 FIRST PRODUCT STRUCTURE:")
-        first_product = shopping_results[0]
-        for key, value in first_product.items():
-            print(f"   {key}: {str(value)[:100]}...")
-
-    products = shopping_results[:num_results]
-    print(f"🔎 Found {len(products)} products for '{full_query}'")
-
-    processed_products = []
-    for i, product in enumerate(products):
-        print(f"\n📝 Processing product {i+1}/{len(products)}: {product.get('title', 'No title')[:50]}...")
-
-        # Try to get the best available link
-        raw_link = (
-            product.get("link") or 
-            product.get("product_link") or 
-            product.get("serpapi_product_api")
-        )
-
-        working_link = None
-        purchase_options = []
-
-        # If we have a basic link, try to resolve it
-        if raw_link:
-            print(f"🔗 Raw link found: {raw_link[:100]}...")
-
-            # First, try to resolve any redirects
-            resolved_link = resolve_redirect_link(raw_link)
-
-            # Then clean the URL
-            working_link = extract_clean_product_url(resolved_link)
-
-            if working_link and working_link != raw_link:
-                print(f"✅ Cleaned link: {working_link[:100]}...")
-
-            # Add as primary purchase option
-            if working_link:
-                purchase_options.append({
-                    "source": product.get("source", "Store"),
-                    "link": working_link,
-                    "price": product.get("price"),
-                    "delivery": product.get("delivery"),
-                    "primary": True
-                })
-
-        # Try to get additional purchase options from product API if we have product_id
-        product_id = product.get("product_id")
-        if product_id:
-            print(f"📋 Product ID found: {product_id}, fetching additional options...")
-            additional_options = get_additional_purchase_options(product_id)
-
-            # Add additional options (avoid duplicates)
-            existing_sources = {opt.get("source", "") for opt in purchase_options}
-            for option in additional_options:
-                if option.get("source") not in existing_sources:
-                    purchase_options.append(option)
-
-        # Create the enhanced product data
-        enhanced_product = {
-            "title": product.get("title"),
-            "price": product.get("price"),
-            "thumbnail": product.get("thumbnail"),
-            "source": product.get("source"),
-            "rating": product.get("rating"),
-            "reviews": product.get("reviews"),
-            "delivery": product.get("delivery"),
-            "product_id": product_id,
-            "link": working_link,  # Primary working link
-            "purchase_options": purchase_options  # All available options
-        }
-
-        print(f"✅ Product processed - Primary link: {'✓' if working_link else '✗'}, Total options: {len(purchase_options)}")
-
-        # Only include products with at least a title
-        if enhanced_product.get("title"):
-            processed_products.append(enhanced_product)
-
-        # Add small delay to avoid rate limiting
-        time.sleep(0.2)
-
-    print(f"\n🏯 Processed {len(processed_products)} products total")
-
-    # Print summary of working links
-    products_with_links = sum(1 for p in processed_products if p.get('link'))
-    print(f"📊 Link success rate: {products_with_links}/{len(processed_products)} products have working links")
-
-    return processed_products
-
-def get_additional_purchase_options(product_id: str) -> list[dict]:
-    """
-    Fetch additional purchase options from Google Product API
-    """
+SERPAPI_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_SLOW_READ_TIMEOUT)
+
+# Persistent cache of raw SerpAPI responses, shared by every worker on the host
+SERP_CACHE_ENABLED = os.getenv('SERP_CACHE_ENABLED', 'true').lower() == 'true'
+SERP_CACHE_TTLS = {
+    'google_shopping': int(os.getenv('SERP_CACHE_SHOPPING_TTL', 12 * 60 * 60)),
+    'google_product': int(os.getenv('SERP_CACHE_PRODUCT_TTL', 6 * 60 * 60)),  # seller prices move faster
+    'google_images': int(os.getenv('SERP_CACHE_IMAGES_TTL', 7 * 24 * 60 * 60)),
+}
+DEFAULT_SERP_CACHE_TTL = 6 * 60 * 60
+SERP_CACHE_PATH = os.getenv('SERP_CACHE_PATH', 'serp_cache.sqlite3')
+serp_cache = SQLiteCache(
+    SERP_CACHE_PATH,
+    max_entries=int(os.getenv('SERP_CACHE_MAX_ENTRIES', 5000)),
+    # Expired results are still served (and refreshed in the background) for this long
+    stale_seconds=int(os.getenv('SERP_CACHE_STALE_SECONDS', 3 * 24 * 60 * 60))
+)
+register_metrics_source('serp_cache', serp_cache.stats)
+
+# Parameters that don't change what SerpAPI returns
+CACHE_KEY_IGNORED_PARAMS = {'api_key', 'serp_api_key', 'source'}
+
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+# Identical concurrent searches in this process share one upstream call
+serp_flight = single_flight('serpapi', copy_results=True)
+# Optionally make other worker processes wait for an in-flight search to land in the shared cache
+SERP_CROSS_PROCESS_COALESCING = os.getenv('SERP_CROSS_PROCESS_COALESCING', 'false').lower() == 'true'
+serp_process_lock = (
+    ProcessLock(SERP_CACHE_PATH, table='serp_inflight', ttl=SERPAPI_TIMEOUT[1])
+    if SERP_CROSS_PROCESS_COALESCING else None
+)
+
+def serp_cache_key(params: dict) -> str:
+    """Cache key for a search: the result-shaping params with the query text normalized."""
+    key_params = {}
+    for name, value in params.items():
+        if name in CACHE_KEY_IGNORED_PARAMS:
+            continue
+        if name == 'q':
+            value = ' '.join(str(value).lower().split())
+        key_params[name] = str(value)
+    return json.dumps(key_params, sort_keys=True, separators=(',', ':'))
+
+def fetch_serpapi(params: dict) -> dict:
+    """Run a SerpAPI query through the shared pooled HTTP client."""
+    url, query = GoogleSearch(dict(params)).construct_url()
+    rate_limiter.acquire('serpapi')
+    with provider_limiter.slot('serpapi'), span('serpapi'):
+        response = http_client.get(url, params=query, timeout=SERPAPI_TIMEOUT)
+    return response.json()
+
+def revalidate_serpapi(key: str, params: dict, ttl: int) -> None:
+    """Refresh a stale cache entry; on failure the stale result keeps being served."""
     try:
-        print(f"🔍 Fetching additional options for product_id: {product_id}")
-        params = {
-            "engine": "google_product",
-            "product_id": product_id,
-            "offers": "1",  # Enable fetching online sellers
-            "api_key": API_KEY
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        results = fetch_serpapi(params)
         if "error" in results:
-            print(f"❌ Product API Error: {results['error']}")
-            return []
-        sellers_results = results.get("sellers_results", {})
-        online_sellers = sellers_results.get("online_sellers", [])
-        print(f"🏪 Found {len(online_sellers)} additional sellers")
-        purchase_options = []
-        for seller in online_sellers[:3]:  # Limit to 3 additional sellers
-            raw_link = seller.get("link")
-            if raw_link:
-                # Resolve and clean the seller link
-                resolved_link = resolve_redirect_link(raw_link)
-                clean_link = extract_clean_product_url(resolved_link)
-                if clean_link:
-                    option = {
-                        "source": seller.get("name", "Store"),
-                        "link": clean_link,
-                        "price": seller.get("price"),
-                        "delivery": seller.get("delivery"),
-                        "rating": seller.get("seller_rating", {}).get("rating"),
-                        "primary": False
-                    }
-                    purchase_options.append(option)
-                    print(f"   ✅ {option['source']}: {option['price']} - {clean_link[:50]}...")
-        return purchase_options
+            print(f"⚠️ SerpAPI refresh returned an error, keeping stale result: {results['error']}")
+        else:
+            serp_cache.set(key, results, ttl)
     except Exception as e:
-        print(f"❌ Error fetching additional options for {product_id}: {str(e)}")
-        return []
-
-def test_link_functionality(url: str) -> bool:
-    """Test if a product link is working and accessible."""
-    if not url or not url.startswith('http'):
-        return False
+        print(f"⚠️ SerpAPI refresh failed, keeping stale result: {e}")
+    finally:
+        with _revalidating_lock:
+            _revalidating.discard(key)
+
+def fetch_and_cache_serpapi(key: str, params: dict, ttl: int) -> dict:
+    """Fetch a search and cache it, first letting another worker's identical fetch finish."""
+    if serp_process_lock and not serp_process_lock.acquire(key):
+        print("⏳ Same SerpAPI search in flight in another worker, waiting for its result")
+        serp_process_lock.wait(key)
+        entry = serp_cache.get(key)
+        if entry and entry.fresh:
+            return entry.value
     try:
-        response = requests.head(url, timeout=10, allow_redirects=True)
-        is_working = response.status_code < 400
-        print(f"🔍 Link test for {url[:50]}... - Status: {response.status_code} ({'✅ Working' if is_working else '❌ Broken'})")
-        return is_working
-    except Exception as e:
-        print(f"❌ Link test failed for {url[:50]}... - Error: {e}")
-        return False
+        results = fetch_serpapi(params)
+        if "error" not in results:
+            serp_cache.set(key, results, ttl)
+        return results
+    finally:
+        if serp_process_lock:
+            serp_process_lock.release(key)
+
+def serpapi_search(params: dict) -> dict:
+    """
+    SerpAPI query with a persistent cache in front of it.
 
-def get_enhanced_shopping_items(query: str, gender: str = '', num_results: int = 3) -> list[dict]:
-    """Enhanced version that includes link testing and validation."""
-    products = get_shopping_items(query, gender, num_results)
-    # Test links and mark their status
-    for product in products:
-        if product.get('link'):
-            product['link_tested'] = test_link_functionality(product['link'])
-        # Test purchase options too
-        for option in product.get('purchase_options', []):
-            if option.get('link'):
-                option['link_tested'] = test_link_functionality(option['link'])
-    return products
\ No newline at end of file
+    Fresh hits skip SerpAPI entirely. Expired entries inside the stale window
+    are returned immediately while one background thread refreshes them, so a
+    SerpAPI outage keeps serving the last good result. Error responses are
+    never cached. Concurrent misses for the same search make one upstream call.
+    """
+    if not SERP_CACHE_ENABLED:
+        return serp_flight.do(serp_cache_key(params), fetch_serpapi, params)
+
+    key = serp_cache_key(params)
+    ttl = SERP_CACHE_TTLS.get(params.get('engine'), DEFAULT_SERP_CACHE_TTL)
+    entry = serp_cache.get(key)
+    if entry and entry.fresh:
+        print(f"💾 SerpAPI cache hit ({entry.age:.0f}s old)")
+        return entry.value
+    if entry:
+        with _revalidating_lock:
+            start_refresh = key not in _revalidating
+            _revalidating.add(key)
+        if start_refresh:
+            threading.Thread(target=revalidate_serpapi, args=(key, dict(params), ttl), daemon=True).start()
+        print(f"💾 SerpAPI cache stale hit ({entry.age:.0f}s old), refreshing in background")
+        return entry.value
+
+    return serp_flight.do(key, fetch_and_cache_serpapi, key, params, ttl)
@@ -0,0 +1,174 @@
+"""
+Shopping search backends.
+The shopping pipeline in shopping_service gets raw product results, seller
+offers and image results from a ShoppingProvider, so the upstream can be
+swapped (e.g. for offline load tests) without touching link resolution,
+caching or coalescing. Results use SerpAPI's field names, which is the
+format the pipeline works with.
+"""
+import os
+import re
+import copy
+import json
+import time
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from app.services.serp_service import serpapi_search, API_KEY
+
+logger = logging.getLogger(__name__)
+
+SHOPPING_PROVIDER = os.getenv('SHOPPING_PROVIDER', 'serpapi')
+DEFAULT_FIXTURE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'fixtures', 'shopping_catalog.json')
+
+class ShoppingProvider(ABC):
+    """Interface for a shopping search backend."""
+    name = None
+
+    @abstractmethod
+    def search_products(self, query: str, num_results: int) -> list[dict]:
+        """Product results with title, price, link, thumbnail, source and product_id."""
+
+    @abstractmethod
+    def product_offers(self, product_id: str) -> list[dict]:
+        """Online sellers for a product with name, link, price, delivery and seller_rating."""
+
+    @abstractmethod
+    def search_images(self, query: str) -> list[dict]:
+        """Image results, each with a thumbnail URL."""
+
+class SerpApiProvider(ShoppingProvider):
+    """Google Shopping, Product and Images results from SerpAPI (cached by serp_service)."""
+    name = 'serpapi'
+
+    def __init__(self, api_key=None):
+        self.api_key = API_KEY if api_key is None else api_key
+
+    def _search(self, params):
+        if not self.api_key:
+            print("❌ SERPAPI_KEY not configured")
+            return {}
+        params = dict(params, google_domain="google.com", hl="en", gl="us", api_key=self.api_key)
+        results = serpapi_search(params)
+        if 'error' in results:
+            print(f"❌ SERPAPI ERROR ({params['engine']}): {results['error']}")
+        return results
+
+    def search_products(self, query, num_results):
+        print(f"📝 Params: {json.dumps({'engine': 'google_shopping', 'q': query})}")
+        results = self._search({"engine": "google_shopping", "q": query})
+        print("📝 RAW SERPAPI RESPONSE (truncated):")
+        print(json.dumps(results, indent=2)[:2000])
+        return results.get("shopping_results", [])[:num_results]
+
+    def product_offers(self, product_id):
+        results = self._search({
+            "engine": "google_product",
+            "product_id": product_id,
+            "offers": "1"  # Enable fetching online sellers
+        })
+        return results.get("sellers_results", {}).get("online_sellers", [])
+
+    def search_images(self, query):
+        results = self._search({"engine": "google_images", "q": query})
+        print("🧾 RAW IMAGE RESPONSE:")
+        print(json.dumps(results, indent=2)[:1000])  # print first 1000 characters only
+        return results.get("images_results", [])
+
+class FixtureShoppingProvider(ShoppingProvider):
+    """
+    Deterministic offline provider backed by a JSON product catalog.
+    The same query always returns the same products, ranked by word overlap
+    with each product's title and keywords. Product links point at known
+    retailer pages, so link resolution needs no network either. ``latency``
+    seconds are slept per call to stand in for the upstream round trip.
+    """
+    name = 'fake'
+
+    def __init__(self, path=None, latency=None):
+        self.path = path or os.getenv('SHOPPING_FIXTURE_PATH', DEFAULT_FIXTURE_PATH)
+        self.latency = float(os.getenv('SHOPPING_FAKE_LATENCY_MS', 0)) / 1000 if latency is None else latency
+        self._catalog = None
+        self._lock = threading.Lock()
+
+    @property
+    def catalog(self):
+        with self._lock:
+            if self._catalog is None:
+                with open(self.path, encoding='utf-8') as f:
+                    products = json.load(f)['products']
+                self._catalog = [(product, set(_tokens(product['title'] + ' ' + ' '.join(product.get('keywords', [])))))
+                                 for product in products]
+            return self._catalog
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _ranked(self, query):
+        tokens = set(_tokens(query))
+
+        def rank(entry):
+            product, product_tokens = entry
+            tiebreak = hashlib.sha1(f"{query.lower()}|{product['product_id']}".encode('utf-8')).hexdigest()
+            return (-len(tokens & product_tokens), tiebreak)
+        return [product for product, _ in sorted(self.catalog, key=rank)]
+
+    def search_products(self, query, num_results):
+        self._wait()
+        return [
+            {name: copy.deepcopy(value) for name, value in product.items() if name not in ('keywords', 'offers')}
+            for product in self._ranked(query)[:num_results]
+        ]
+
+    def product_offers(self, product_id):
+        self._wait()
+        for product, _ in self.catalog:
+            if product['product_id'] == product_id:
+                return copy.deepcopy(product.get('offers', []))
+        return []
+
+    def search_images(self, query):
+        self._wait()
+        return [{'thumbnail': product['thumbnail'], 'title': product['title']}
+                for product in self._ranked(query)[:3]]
+
+def _tokens(text):
+    return re.findall(r'[a-z0-9]+', (text or '').lower())
+
+PROVIDERS = {
+    SerpApiProvider.name: SerpApiProvider,
+    FixtureShoppingProvider.name: FixtureShoppingProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def create_provider(name):
+    """Instantiate the provider registered under ``name``."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown shopping provider: {name}")
+    return PROVIDERS[name]()
+
+def get_shopping_provider():
+    """The provider the shopping pipeline uses, created from SHOPPING_PROVIDER on first use."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_provider(SHOPPING_PROVIDER)
+        return _provider
+
+def set_shopping_provider(provider):
+    """Switch providers by name or instance; returns the previous one."""
+    global _provider
+    if isinstance(provider, str):
+        provider = create_provider(provider)
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    logger.info(f"Shopping provider: {provider.name}")
+    return previous
+
+def init_app(app):
+    """Select the provider named by the app's SHOPPING_PROVIDER setting."""
+    set_shopping_provider(app.config.get('SHOPPING_PROVIDER', SHOPPING_PROVIDER))
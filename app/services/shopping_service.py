@@ -1,120 +1,228 @@
+"""
+Shopping pipeline.
+Turns raw results from the configured ShoppingProvider into product cards
+with clean, working links. Link resolution, purchase options and request
+coalescing live here once, whichever provider is in use.
+"""
 import os
-from serpapi import GoogleSearch
-import json
+import re
+import logging
+from app.services.link_resolver import resolve_links
+from app.services.link_health import check_link, check_links
+from app.services.shopping_providers import get_shopping_provider
+from app.utils.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Identical concurrent searches in this process share one search and link resolution
+shopping_flight = single_flight('shopping_items', copy_results=True)
+
+# Additional sellers cost a product-offers search plus link resolutions per
+# product, so by default they are only fetched when the user asks for them
+DEFER_PURCHASE_OPTIONS = os.getenv('DEFER_PURCHASE_OPTIONS', 'true').lower() == 'true'
+PRODUCT_ID_PATTERN = re.compile(r'^[\w-]{1,64}$')
+purchase_options_flight = single_flight('purchase_options', copy_results=True)
 
 def get_overall_outfit_image(query: str, gender: str = '') -> str:
     """Get one image representing the full outfit (from Google Images)"""
-    api_key = os.getenv("SERPAPI_KEY")
-    
-    if not api_key:
-        print("❌ SERPAPI_KEY not configured")
-        return None
-    
     full_query = f"{gender} {query}".strip()
     print(f"🖼️ [Images] Searching: {full_query}")
 
-    params = {
-        "engine": "google_images",
-        "q": full_query,
-        "google_domain": "google.com",
-        "hl": "en",
-        "gl": "us",
-        "api_key": api_key
-    }
-
     try:
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        images = get_shopping_provider().search_images(full_query)
+    except Exception as e:
+        print(f"❌ Error getting outfit image: {e}")
+        return None
+    print(f"📸 Found {len(images)} images for '{full_query}'")
 
-        print("🧾 RAW IMAGES RESPONSE:")
-        print(json.dumps(results, indent=2)[:500])  # print first 500 characters only
-        
-        images = results.get("images_results", [])
-        print(f"📸 Found {len(images)} images for '{full_query}'")
+    if images:
+        print("🔗 First Image URL:", images[0].get("thumbnail"))
+        return images[0].get("thumbnail")
 
-        if images:
-            thumbnail = images[0].get("thumbnail")
-            print("🔗 First Image URL:", thumbnail)
-            return thumbnail
+    return None
 
+def store_search_link(product: dict) -> str:
+    """Search URL at the product's store, for results that come without a usable product link."""
+    store_name = (product.get("source") or "").lower()
+    product_title = product.get("title") or ""
+
+    # Create a search URL for popular stores
+    if "amazon" in store_name:
+        return f"https://www.amazon.com/s?k={product_title.replace(' ', '+')}"
+    elif "target" in store_name:
+        return f"https://www.target.com/s?searchTerm={product_title.replace(' ', '%20')}"
+    elif "walmart" in store_name:
+        return f"https://www.walmart.com/search?q={product_title.replace(' ', '%20')}"
+    elif "loft" in store_name:
+        return f"https://www.loft.com/search?q={product_title.replace(' ', '%20')}"
+    # For other stores, use a Google search
+    return f"https://www.google.com/search?q={f'{product_title} {store_name}'.replace(' ', '+')}"
+
+def raw_product_link(product: dict):
+    """The product's own link, unless it is missing or only a SerpAPI API URL."""
+    raw_link = product.get("link") or product.get("product_link")
+    if not raw_link or 'serpapi.com' in raw_link:
         return None
-    except Exception as e:
-        print(f"❌ Error getting outfit image: {e}")
-        return None
+    return raw_link
 
 def get_shopping_items(query: str, gender: str = '', num_results: int = 3) -> list[dict]:
-    """Searches Google Shopping for product results, logs results for debugging."""
-    api_key = os.getenv("SERPAPI_KEY")
-    
-    if not api_key:
-        print("❌ SERPAPI_KEY not configured")
-        return []
-    
+    """
+    Searches for shopping results with REAL working product links.
+    Concurrent calls for the same query share one search and link resolution.
+    """
+    key = (' '.join(f"{gender} {query}".lower().split()), num_results)
+    return shopping_flight.do(key, search_shopping_items, query, gender, num_results)
+
+def search_shopping_items(query: str, gender: str = '', num_results: int = 3) -> list[dict]:
+    """Uncoalesced shopping search behind get_shopping_items."""
     full_query = f"{gender} {query}".strip()
     print(f"🛍️ [Shopping] Searching: {full_query}")
+    if not full_query:
+        print("⚠️ Query is empty! Returning no results.")
+        return []
 
-    params = {
-        "engine": "google_shopping",
-        "q": full_query,
-        "google_domain": "google.com",
-        "hl": "en",
-        "gl": "us",
-        "api_key": api_key
-    }
+    products = get_shopping_provider().search_products(full_query, num_results)
+    if not products:
+        print(f"⚠️ No shopping results found for query: '{full_query}'")
+    else:
+        print("🔍 FIRST PRODUCT STRUCTURE:")
+        for key, value in products[0].items():
+            print(f"   {key}: {str(value)[:100]}...")
+    print(f"🔎 Found {len(products)} products for '{full_query}'")
 
+    # Resolve every product's link in one concurrent batch before building results
+    resolved_links = resolve_links(raw_product_link(product) for product in products)
+
+    processed_products = []
+    for i, product in enumerate(products):
+        print(f"\n📝 Processing product {i+1}/{len(products)}: {product.get('title', 'No title')[:50]}...")
+
+        raw_link = raw_product_link(product)
+        purchase_options = []
+
+        if raw_link:
+            print(f"🔗 Raw link found: {raw_link[:100]}...")
+            # Redirects resolved and URL cleaned by the batch above
+            working_link = resolved_links.get(raw_link)
+            if working_link and working_link != raw_link:
+                print(f"✅ Cleaned link: {working_link[:100]}...")
+        else:
+            # No direct link; send the user to a search at the store instead
+            working_link = store_search_link(product) if product.get("title") else None
+
+        # Add as primary purchase option
+        if working_link:
+            purchase_options.append({
+                "source": product.get("source", "Store"),
+                "link": working_link,
+                "price": product.get("price"),
+                "delivery": product.get("delivery"),
+                "primary": True
+            })
+
+        # Try to get additional purchase options from product API if we have product_id
+        product_id = product.get("product_id")
+        if product_id and not DEFER_PURCHASE_OPTIONS:
+            print(f"📋 Product ID found: {product_id}, fetching additional options...")
+            additional_options = get_additional_purchase_options(product_id)
+
+            # Add additional options (avoid duplicates)
+            existing_sources = {opt.get("source", "") for opt in purchase_options}
+            for option in additional_options:
+                if option.get("source") not in existing_sources:
+                    purchase_options.append(option)
+
+        # Create the enhanced product data
+        enhanced_product = {
+            "title": product.get("title"),
+            "price": product.get("price"),
+            "thumbnail": product.get("thumbnail"),
+            "source": product.get("source"),
+            "rating": product.get("rating"),
+            "reviews": product.get("reviews"),
+            "delivery": product.get("delivery"),
+            "product_id": product_id,
+            "link": working_link,  # Primary working link
+            "purchase_options": purchase_options,  # All available options
+            # Additional sellers are left for get_purchase_options to fetch on demand
+            "purchase_options_deferred": bool(product_id) and DEFER_PURCHASE_OPTIONS
+        }
+
+        print(f"✅ Product processed - Primary link: {'✓' if working_link else '✗'}, Total options: {len(purchase_options)}")
+
+        # Only include products with at least a title
+        if enhanced_product.get("title"):
+            processed_products.append(enhanced_product)
+
+    print(f"\n🏯 Processed {len(processed_products)} products total")
+
+    # Print summary of working links
+    products_with_links = sum(1 for p in processed_products if p.get('link'))
+    print(f"📊 Link success rate: {products_with_links}/{len(processed_products)} products have working links")
+
+    return processed_products
+
+def get_additional_purchase_options(product_id: str) -> list[dict]:
+    """
+    Fetch additional purchase options from the provider's product offers
+    """
     try:
-        search = GoogleSearch(params)
-        results = search.get_dict()
-
-        products = results.get("shopping_results", [])[:num_results]
-        print(f"🔎 Found {len(products)} products for '{full_query}'")
-
-        processed_products = []
-        for p in products:
-            # Get the link - prefer direct links, fallback to SerpAPI
-            product_link = p.get("link")
-            
-            # If no direct link, try to construct a search URL for the store
-            if not product_link or 'serpapi.com' in product_link:
-                store_name = p.get("source", "").lower()
-                product_title = p.get("title", "")
-                
-                # Create a search URL for popular stores
-                if "amazon" in store_name:
-                    search_query = product_title.replace(" ", "+")
-                    product_link = f"https://www.amazon.com/s?k={search_query}"
-                elif "target" in store_name:
-                    search_query = product_title.replace(" ", "%20")
-                    product_link = f"https://www.target.com/s?searchTerm={search_query}"
-                elif "walmart" in store_name:
-                    search_query = product_title.replace(" ", "%20")
-                    product_link = f"https://www.walmart.com/search?q={search_query}"
-                elif "loft" in store_name:
-                    search_query = product_title.replace(" ", "%20")
-                    product_link = f"https://www.loft.com/search?q={search_query}"
-                else:
-                    # For other stores, use a Google search
-                    search_query = f"{product_title} {store_name}".replace(" ", "+")
-                    product_link = f"https://www.google.com/search?q={search_query}"
-            
-            product_data = {
-                "title": p.get("title"),
-                "price": p.get("price"),
-                "link": product_link,
-                "thumbnail": p.get("thumbnail"),
-                "source": p.get("source")
-            }
-            
-            if product_data["title"] and product_data["link"]:
-                processed_products.append(product_data)
-                print("🧾", {
-                    "title": product_data["title"][:30] + "...",
-                    "price": product_data["price"],
-                    "link": product_data["link"][:50] + "...",
-                    "source": product_data["source"]
-                })
-
-        return processed_products
+        print(f"🔍 Fetching additional options for product_id: {product_id}")
+        online_sellers = get_shopping_provider().product_offers(product_id)
+        print(f"🏪 Found {len(online_sellers)} additional sellers")
+        purchase_options = []
+        sellers = online_sellers[:3]  # Limit to 3 additional sellers
+        # Resolve and clean the seller links concurrently
+        resolved_links = resolve_links(seller.get("link") for seller in sellers)
+        for seller in sellers:
+            raw_link = seller.get("link")
+            if raw_link:
+                clean_link = resolved_links.get(raw_link)
+                if clean_link:
+                    option = {
+                        "source": seller.get("name", "Store"),
+                        "link": clean_link,
+                        "price": seller.get("price"),
+                        "delivery": seller.get("delivery"),
+                        "rating": (seller.get("seller_rating") or {}).get("rating"),
+                        "primary": False
+                    }
+                    purchase_options.append(option)
+                    print(f"   ✅ {option['source']}: {option['price']} - {clean_link[:50]}...")
+        return purchase_options
     except Exception as e:
-        print(f"❌ Error getting shopping items: {e}")
+        print(f"❌ Error fetching additional options for {product_id}: {str(e)}")
         return []
+
+def get_purchase_options(product_id: str, exclude_sources=()) -> list[dict]:
+    """
+    Additional sellers for a product, fetched when the UI asks for them.
+    Provider responses and resolved links come from the shared caches, and
+    concurrent requests for the same product share one fetch. Sellers named in
+    ``exclude_sources`` (usually the primary source already shown) are dropped.
+    """
+    if not product_id or not PRODUCT_ID_PATTERN.match(product_id):
+        raise ValueError(f"Invalid product_id: {product_id!r}")
+    options = purchase_options_flight.do(product_id, get_additional_purchase_options, product_id)
+    excluded = {source.lower() for source in exclude_sources if source}
+    return [option for option in options if (option.get("source") or "").lower() not in excluded]
+
+def test_link_functionality(url: str) -> bool:
+    """Test if a product link is working and accessible (cached, see link_health)."""
+    return check_link(url)
+
+def get_enhanced_shopping_items(query: str, gender: str = '', num_results: int = 3) -> list[dict]:
+    """Enhanced version that includes link testing and validation."""
+    products = get_shopping_items(query, gender, num_results)
+    # Check every product and purchase option link in one concurrent, cached batch
+    health = check_links(
+        [product.get('link') for product in products] +
+        [option.get('link') for product in products for option in product.get('purchase_options', [])]
+    )
+    for product in products:
+        if product.get('link'):
+            product['link_tested'] = health.get(product['link'], False)
+        for option in product.get('purchase_options', []):
+            if option.get('link'):
+                option['link_tested'] = health.get(option['link'], False)
+    return products
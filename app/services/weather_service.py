@@ -1,55 +1,132 @@
-from datetime import datetime
-import requests
+from datetime import datetime, date, timedelta
 import os
+from app.instrumentation import span, register_metrics_source
+from app.utils.cache import TTLCache
+from app.utils.http_client import http_client
+from app.utils.rate_limiter import rate_limiter
+from app.utils.singleflight import single_flight
+from app.models.weather import WeatherDay, WeatherSeries
 
-def get_weather_summary(city, region, start_date, end_date):
-    """Get weather summary for a given location and date range (future)."""
+WEATHER_API_URL = (
+    "https://weather.visualcrossing.com/VisualCrossingWebServices/"
+    "rest/services/timeline"
+)
+
+# VisualCrossing forecasts 15 days ahead; later dates come from historical normals
+FORECAST_HORIZON_DAYS = 15
+
+# Cache lifetime (seconds) of one day's weather, by how many days ahead of today it is
+FORECAST_TTLS = [
+    (1, 60 * 60),                      # today/tomorrow: forecasts are revised hourly
+    (7, 3 * 60 * 60),                  # this week
+    (FORECAST_HORIZON_DAYS, 12 * 60 * 60),
+]
+NORMALS_TTL = 7 * 24 * 60 * 60         # historical averages beyond the horizon
+PAST_TTL = 30 * 24 * 60 * 60           # observed weather doesn't change
+
+# WeatherDay records keyed by (normalized location, "YYYY-MM-DD")
+weather_cache = TTLCache(max_entries=int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', 5000)))
+register_metrics_source('weather_cache', weather_cache.stats)
+
+# Identical concurrent lookups share one cache assembly / upstream call
+weather_flight = single_flight('weather')
+
+def normalize_location(city, region):
+    """Cache key for a location: case and whitespace don't matter."""
+    return ','.join(' '.join((part or '').lower().split()) for part in (city, region))
+
+def day_ttl(day_date, normal=False, today=None):
+    """How long a day's weather stays cached, based on its forecast horizon."""
+    days_out = (day_date - (today or date.today())).days
+    if days_out < 0:
+        return PAST_TTL
+    if days_out > FORECAST_HORIZON_DAYS or normal:
+        return NORMALS_TTL
+    for max_days_out, ttl in FORECAST_TTLS:
+        if days_out <= max_days_out:
+            return ttl
+    return NORMALS_TTL
+
+def missing_ranges(dates, cached):
+    """Group the dates without a cached record into contiguous (start, end) ranges."""
+    ranges = []
+    for day_date in dates:
+        if day_date in cached:
+            continue
+        if ranges and ranges[-1][1] == day_date - timedelta(days=1):
+            ranges[-1][1] = day_date
+        else:
+            ranges.append([day_date, day_date])
+    return [tuple(r) for r in ranges]
+
+def get_weather(city, region, start_date, end_date):
+    """Get a WeatherSeries, sharing the result with identical lookups already in flight."""
+    key = (normalize_location(city, region), start_date, end_date)
+    return weather_flight.do(key, load_weather, city, region, start_date, end_date)
+
+def load_weather(city, region, start_date, end_date):
+    """
+    Get a WeatherSeries for a given location and date range (future).
+
+    Day records are cached per location and date, so only the dates missing
+    from the cache are requested from VisualCrossing, one call per
+    contiguous missing range. Failures come back as a series with a message.
+    """
     weather_key = os.getenv('WEATHER_API_KEY')
 
     if not weather_key:
-        return "Weather API key not configured."
+        return WeatherSeries.unavailable("Weather API key not configured.")
 
     location = f"{city},{region}"
-    url = (
-        f"https://weather.visualcrossing.com/VisualCrossingWebServices/"
-        f"rest/services/timeline/{location}/{start_date}/{end_date}"
-    )
-    params = {
-        "unitGroup": "us",
-        "key": weather_key,
-        "include": "days",
-        "contentType": "json"
-    }
-
-    print(f"📡 Requesting URL: {url} with params: {params}")
+    cache_location = normalize_location(city, region)
 
     try:
+        start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
+        today = date.today()
         # Check if forecast date range exceeds 15 days from today
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-        today = datetime.today()
-        forecast_days = (start_dt - today).days
-        if forecast_days > 15:
+        if (start_dt - today).days > FORECAST_HORIZON_DAYS:
             print("⚠️ Forecast is beyond 15-day range. Data may be historical averages.")
 
-        resp = requests.get(url, params=params)
-        if resp.status_code != 200:
-            return f"Weather data unavailable: {resp.text}"
-
-        data = resp.json()
-        lines = []
-        for day in data.get("days", []):
-            date = day.get("datetime")
-            high = day.get("tempmax")
-            low = day.get("tempmin")
-            cond = day.get("conditions")
-            precip_prob = day.get("precipprob", "N/A")
-            source = day.get("source", "unknown")
-            # Distinguish if data is from forecast or historical norms
-            source_note = " (historical average)" if "normal" in str(source).lower() else ""
-            lines.append(
-                f"{date}: high {high}°F, low {low}°F, {cond} (precip chance {precip_prob}%)"
-                f"{source_note}"
-            )
-        return "\n".join(lines)
+        dates = [start_dt + timedelta(days=i) for i in range((end_dt - start_dt).days + 1)]
+        records = {}
+        for day_date in dates:
+            day = weather_cache.get((cache_location, day_date.isoformat()))
+            if day is not None:
+                records[day_date] = day
+
+        gaps = missing_ranges(dates, records)
+        if not gaps:
+            print(f"🌤️ Weather for {location} {start_date}..{end_date} served from cache")
+        for range_start, range_end in gaps:
+            url = f"{WEATHER_API_URL}/{location}/{range_start.isoformat()}/{range_end.isoformat()}"
+            params = {
+                "unitGroup": "us",
+                "key": weather_key,
+                "include": "days",
+                "contentType": "json"
+            }
+            print(f"📡 Requesting URL: {url} with params: {params}")
+            rate_limiter.acquire('weather')
+            with span('weather'):
+                resp = http_client.get(url, params=params)
+            if resp.status_code != 200:
+                return WeatherSeries.unavailable(f"Weather data unavailable: {resp.text}")
+
+            for record in resp.json().get("days", []):
+                day = WeatherDay.from_api(record)
+                try:
+                    day_date = datetime.strptime(day.date, "%Y-%m-%d").date()
+                except (TypeError, ValueError):
+                    continue
+                weather_cache.set((cache_location, day.date), day,
+                                  day_ttl(day_date, day.normal, today))
+                records[day_date] = day
+
+        return WeatherSeries([records[d] for d in dates if d in records])
     except Exception as e:
-        return f"Error fetching weather data: {str(e)}"
+        return WeatherSeries.unavailable(f"Error fetching weather data: {str(e)}")
+
+def get_weather_summary(city, region, start_date, end_date):
+    """Get weather summary text for a given location and date range (future)."""
+    return get_weather(city, region, start_date, end_date).format()
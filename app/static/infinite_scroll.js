@@ -0,0 +1,46 @@
+// Appends the next page of a keyset-paginated list when its sentinel scrolls into view.
+// A sentinel is an element with data-next-url (a JSON endpoint returning {html, next_url})
+// and data-target (the id of the container the page's cards are appended to). Its
+// "load more" button does the same for browsers without IntersectionObserver.
+function loadNextPage(sentinel) {
+  if (sentinel.dataset.loading || !sentinel.dataset.nextUrl) return;
+  sentinel.dataset.loading = 'true';
+  const button = sentinel.querySelector('.load-more-btn');
+  if (button) button.disabled = true;
+  fetch(sentinel.dataset.nextUrl, {credentials: 'same-origin'})
+    .then(response => response.json())
+    .then(data => {
+      if (!data.success) throw new Error(data.message || 'Could not load more');
+      document.getElementById(sentinel.dataset.target).insertAdjacentHTML('beforeend', data.html);
+      if (data.next_url) {
+        sentinel.dataset.nextUrl = data.next_url;
+        // Observing again re-checks visibility, so a short page keeps loading
+        if (sentinel.observer) {
+          sentinel.observer.unobserve(sentinel);
+          sentinel.observer.observe(sentinel);
+        }
+      } else {
+        if (sentinel.observer) sentinel.observer.disconnect();
+        sentinel.remove();
+      }
+    })
+    .catch(() => {
+      if (button) button.textContent = 'Try again';
+    })
+    .finally(() => {
+      delete sentinel.dataset.loading;
+      if (button) button.disabled = false;
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+  document.querySelectorAll('.scroll-sentinel').forEach(sentinel => {
+    const button = sentinel.querySelector('.load-more-btn');
+    if (button) button.addEventListener('click', () => loadNextPage(sentinel));
+    if (!('IntersectionObserver' in window)) return;
+    sentinel.observer = new IntersectionObserver(entries => {
+      if (entries.some(entry => entry.isIntersecting)) loadNextPage(sentinel);
+    }, {rootMargin: '300px'});
+    sentinel.observer.observe(sentinel);
+  });
+});
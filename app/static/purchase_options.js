@@ -0,0 +1,44 @@
+// Loads a product's additional sellers the first time its "More Sellers" button is clicked
+function loadPurchaseOptions(btn) {
+  const list = btn.nextElementSibling;
+  if (!list) return;
+  if (btn.dataset.loaded) {
+    list.style.display = list.style.display === 'none' ? 'block' : 'none';
+    return;
+  }
+  btn.disabled = true;
+  btn.textContent = 'Loading sellers…';
+  fetch(btn.dataset.optionsUrl, {credentials: 'same-origin'})
+    .then(response => response.json())
+    .then(data => {
+      list.innerHTML = '';
+      const options = (data.success && data.purchase_options) || [];
+      if (!options.length) {
+        const empty = document.createElement('li');
+        empty.textContent = 'No other sellers found.';
+        list.appendChild(empty);
+      }
+      options.forEach(option => {
+        const item = document.createElement('li');
+        const link = document.createElement('a');
+        link.href = option.link;
+        link.target = '_blank';
+        link.rel = 'noopener noreferrer';
+        link.textContent = option.source || 'Store';
+        item.appendChild(link);
+        if (option.price) {
+          item.appendChild(document.createTextNode(' – ' + option.price));
+        }
+        list.appendChild(item);
+      });
+      list.style.display = 'block';
+      btn.dataset.loaded = '1';
+      btn.textContent = 'More Sellers';
+    })
+    .catch(() => {
+      btn.textContent = 'More Sellers';
+    })
+    .finally(() => {
+      btn.disabled = false;
+    });
+}
@@ -3,6 +3,7 @@ Utility modules for the TripStylist application.
 
 Contains:
 - helpers.py: Parsing utilities for outfit recommendations
+- outfit_parser.py: Single-pass parser for outfit recommendation responses
 - shared_utils.py: Error handling decorators and centralized messages
 - database_utils.py: Database initialization and maintenance functions
 - test_utils.py: Test utilities for validation and testing
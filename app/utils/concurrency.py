@@ -0,0 +1,77 @@
+"""
+Bounded-concurrency helpers for fanning out upstream API calls.
+Keeps the number of simultaneous requests per provider under a fixed limit
+so a large trip can't flood SerpAPI or the retailer redirect hosts.
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Maximum simultaneous in-flight calls per upstream provider
+DEFAULT_PROVIDER_LIMITS = {
+    'serpapi': int(os.getenv('SERPAPI_MAX_CONCURRENCY', 4)),
+    'redirect': int(os.getenv('REDIRECT_MAX_CONCURRENCY', 8)),
+}
+
+class ProviderLimiter:
+    """Per-provider semaphores shared by every thread in the worker process."""
+
+    def __init__(self, limits=None, default_limit=4):
+        self._limits = dict(limits or {})
+        self._default_limit = default_limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, provider):
+        with self._lock:
+            if provider not in self._semaphores:
+                limit = self._limits.get(provider, self._default_limit)
+                self._semaphores[provider] = threading.BoundedSemaphore(limit)
+            return self._semaphores[provider]
+
+    @contextmanager
+    def slot(self, provider):
+        """Hold one of the provider's concurrency slots for the duration of the block."""
+        semaphore = self._semaphore(provider)
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+provider_limiter = ProviderLimiter(DEFAULT_PROVIDER_LIMITS)
+
+def run_concurrently(calls, max_workers=8):
+    """
+    Run (func, args, kwargs) tuples on a thread pool.
+
+    Returns one dict per call, in the same order as ``calls``, holding the
+    ``result`` (or ``error``) and the wall time the call took in ``seconds``.
+    """
+    def timed_call(func, args, kwargs):
+        started = time.perf_counter()
+        try:
+            return {'result': func(*args, **kwargs), 'error': None,
+                    'seconds': time.perf_counter() - started}
+        except Exception as e:
+            logger.error(f"Concurrent call to {getattr(func, '__name__', func)} failed: {e}")
+            return {'result': None, 'error': e,
+                    'seconds': time.perf_counter() - started}
+
+    if not calls:
+        return []
+
+    workers = max(1, min(max_workers, len(calls)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Copy the caller's context into each task so request-scoped timing spans still apply
+        futures = [
+            executor.submit(contextvars.copy_context().run, timed_call, func, args, kwargs)
+            for func, args, kwargs in calls
+        ]
+        return [future.result() for future in futures]
@@ -1,45 +1,94 @@
 import re
+from app.utils.outfit_parser import DAY_PATTERN, parse_day, parse_response
 
-def parse_daily_outfits(gpt_response, gender=None):
-    """Parse GPT response to extract daily outfit details and product searches."""
-    days = []
-    if not gpt_response:
-        return days
+def _build_day(match, day_content):
+    """Build a day dict from a day header match and the text that follows it."""
+    return parse_day(match, day_content).to_dict()
+
+def parse_daily_outfits(gpt_response):
+    """
+    Parse a GPT response into day dicts: title, content (without the Product
+    Searches section) and the Complete Outfit items.
+    """
+    return [day.to_dict() for day in parse_response(gpt_response).days]
+
+class IncrementalDayParser:
+    """
+    Parse a streamed GPT response one chunk at a time.
+
+    A day is emitted as soon as the header of the following day has fully
+    arrived; the last day is emitted by ``close()``. The days produced are the
+    same as ``parse_daily_outfits`` would return for the complete text.
+    """
 
-    # Pattern: **Day X (date): ...**
-    day_pattern = re.compile(r'\*\*Day (\d+) ?(\([^)]+\))?:? ?([^\n\*]*)\*\*', re.IGNORECASE)
-    product_pattern = re.compile(r'\*\*Product Searches:\*\*(.*?)(?=\n\*\*|\Z)', re.DOTALL)
+    def __init__(self):
+        self.buffer = ''
+        self._current = None  # header match of the day still being streamed
+        self._scan_from = 0
 
-    # Split by day
-    day_matches = list(day_pattern.finditer(gpt_response))
-    for idx, match in enumerate(day_matches):
-        day_num = match.group(1)
-        date = match.group(2) or ''
-        title_extra = match.group(3).strip() if match.group(3) else ''
-        day_title = f"Day {day_num}{' ' + date if date else ''}{': ' + title_extra if title_extra else ''}".strip()
-        start = match.end()
-        end = day_matches[idx + 1].start() if idx + 1 < len(day_matches) else len(gpt_response)
-        day_content = gpt_response[start:end].strip()
+    def feed(self, chunk):
+        """Add streamed text and return any days that are now complete."""
+        completed = []
+        if not chunk:
+            return completed
+        self.buffer += chunk
+        while True:
+            # Only rescan the tail: a header can't start before the previous one ended
+            match = DAY_PATTERN.search(self.buffer, self._scan_from)
+            if not match:
+                # Headers never span lines, so a future one starts after the last newline
+                self._scan_from = max(self._scan_from, self.buffer.rfind('\n') + 1)
+                break
+            if self._current is not None:
+                completed.append(self._finish_current(match.start()))
+            self._current = match
+            self._scan_from = match.end()
+        return completed
 
-        # Extract product searches
-        product_searches = []
-        prod_match = product_pattern.search(day_content)
-        if prod_match:
-            for line in prod_match.group(1).split('\n'):
-                line = line.strip('-* ').strip()
-                if line:
-                    # Prefix gender if provided and not already present
-                    if gender and not line.lower().startswith(gender.lower()):
-                        line = f"{gender} {line}"
-                    product_searches.append(line)
+    def close(self):
+        """Flush the final day once the stream has ended."""
+        if self._current is None:
+            return []
+        return [self._finish_current(len(self.buffer))]
 
+    def _finish_current(self, end):
+        day = _build_day(self._current, self.buffer[self._current.end():end])
+        self._current = None
+        return day
+
+def outfit_plan_days(plan_days):
+    """
+    Day dicts (as parse_daily_outfits returns) built from a validated structured
+    outfit plan, with the day's markdown rendered from the structure and its
+    outfit ``items`` kept for the shopping search.
+    """
+    days = []
+    for plan_day in plan_days:
+        lines = []
+        if plan_day.get('weather_adjustments'):
+            lines += [f"**Weather Adjustments:** {plan_day['weather_adjustments']}", '']
+        lines.append('**Complete Outfit:**')
+        lines += [f"- {item['category']}: {item['description']}" for item in plan_day['items']]
+        lines.append('')
+        if plan_day.get('activity_considerations'):
+            lines.append(f"**Activity Considerations:** {plan_day['activity_considerations']}")
+        if plan_day.get('packing_notes'):
+            lines.append(f"**Packing Notes:** {plan_day['packing_notes']}")
         days.append({
-            'title': day_title,
-            'content': day_content,
-            # 'product_searches': product_searches  # No longer sent to template
+            'title': f"Day {plan_day['day']} ({plan_day['date']}): {plan_day['activity']}",
+            'content': '\n'.join(lines).strip(),
+            'items': [dict(item) for item in plan_day['items']]
         })
     return days
 
+def render_outfit_plan(days):
+    """Full markdown response, in the format the model is asked for, for structured days."""
+    sections = []
+    for day in days:
+        searches = '\n'.join(f"- {item['category']}: {item['search_query']}" for item in day.get('items', []))
+        sections.append(f"**{day['title']}**\n\n{day['content']}\n\n**Product Searches:**\n{searches}")
+    return '\n\n'.join(sections)
+
 def extract_clothing_items(content):
     """Extract clothing items from unstructured content."""
     items = []
@@ -57,12 +106,3 @@ def extract_clothing_items(content):
         items.extend(matches)
     
     return list(set(items))  # Remove duplicates
-
-def remove_product_searches_section(text):
-    """Remove the 'Product Searches' section and its list from markdown or HTML text."""
-    return re.sub(
-        r"(\*\*Product Searches:\*\*|<strong>Product Searches:</strong>)(.|\n)*?(?=(<br><br><strong>|---|$))",
-        "",
-        text,
-        flags=re.IGNORECASE
-    )
\ No newline at end of file
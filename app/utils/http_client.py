@@ -0,0 +1,147 @@
+"""
+Shared outbound HTTP client.
+Every upstream call (weather, SerpAPI, redirect resolution, link checks,
+dummyjson) goes through one pooled session so connections are kept alive
+per host, every request has connect/read timeouts, and idempotent calls are
+retried with jittered backoff instead of pinning a worker on a stalled host.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from app.instrumentation import register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+# Read timeout for upstreams that legitimately take several seconds (SerpAPI searches)
+HTTP_SLOW_READ_TIMEOUT = float(os.getenv('HTTP_SLOW_READ_TIMEOUT', 30))
+HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 20))  # hosts with a cached connection pool
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 10))  # kept-alive connections per host
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 2))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', 0.3))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', 5.0))
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HttpClient:
+    """
+    Thread-safe pooled session with default timeouts, retries and per-host counters.
+    ``adapter_class`` swaps in a requests HTTPAdapter subclass, e.g. one that vets connections.
+    """
+
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 max_retries=HTTP_MAX_RETRIES, backoff_base=HTTP_BACKOFF_BASE,
+                 backoff_max=HTTP_BACKOFF_MAX, pool_hosts=HTTP_POOL_HOSTS,
+                 pool_maxsize=HTTP_POOL_MAXSIZE, sleep=None, adapter_class=HTTPAdapter):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep or time.sleep
+        self.session = requests.Session()
+        # Retries are handled in request() so they can be counted and jittered
+        self._adapter = adapter_class(pool_connections=pool_hosts, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+        self._lock = threading.Lock()
+        self._hosts = defaultdict(lambda: {
+            'requests': 0, 'retries': 0, 'errors': 0, 'timeouts': 0,
+            'in_flight': 0, 'peak_in_flight': 0
+        })
+
+    def _count(self, host, field, delta=1):
+        with self._lock:
+            counters = self._hosts[host]
+            counters[field] += delta
+            if field == 'in_flight':
+                counters['peak_in_flight'] = max(counters['peak_in_flight'], counters['in_flight'])
+
+    def backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, honouring a numeric Retry-After header."""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, retries=None, timeout=None, **kwargs):
+        """
+        Send a request through the shared pool.
+
+        ``timeout`` defaults to the configured (connect, read) pair. GET/HEAD/OPTIONS
+        are retried on connection errors, timeouts and 429/5xx responses; other
+        methods are sent once. The last response is returned (or the last error
+        raised) when retries run out.
+        """
+        method = method.upper()
+        host = urlparse(url).netloc
+        retries = self.max_retries if retries is None else retries
+        if method not in IDEMPOTENT_METHODS:
+            retries = 0
+        kwargs['timeout'] = timeout or self.timeout
+
+        attempt = 0
+        while True:
+            self._count(host, 'requests')
+            self._count(host, 'in_flight')
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._count(host, 'timeouts' if isinstance(e, requests.Timeout) else 'errors')
+                if attempt >= retries:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"{method} {host} failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                self._count(host, 'errors')
+                delay = self.backoff(attempt, response.headers.get('Retry-After'))
+                logger.warning(f"{method} {host} returned {response.status_code}, retrying in {delay:.2f}s")
+                response.close()
+            finally:
+                self._count(host, 'in_flight', -1)
+            self._count(host, 'retries')
+            attempt += 1
+            self._sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def pool_stats(self):
+        """Connections opened and idle per host pool held by the adapter."""
+        pools = {}
+        manager = self._adapter.poolmanager
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            # The pool queue is pre-filled with None placeholders; real entries are idle connections
+            idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+            pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'connections_opened': pool.num_connections,
+                'requests': pool.num_requests,
+                'idle': idle
+            }
+        return pools
+
+    def stats(self):
+        """Per-host request counters and pool usage for the metrics endpoint."""
+        with self._lock:
+            hosts = {host: dict(counters) for host, counters in self._hosts.items()}
+        return {'hosts': hosts, 'pools': self.pool_stats()}
+
+http_client = HttpClient()
+register_metrics_source('http', http_client.stats)
@@ -0,0 +1,151 @@
+"""
+Size-bounded on-disk image cache.
+Each image is one file named by its cache key, written atomically so every
+worker process on the host can share the directory. File modification
+times track last use, and the least recently used files are deleted once
+the directory grows past its byte budget.
+"""
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the image formats the proxy accepts
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+def sniff_image_type(data):
+    """Content type of JPEG/PNG/GIF/WebP bytes, or None when the data isn't one of them."""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+class CachedImage:
+    """Bytes of a cached image with its content type and a content-derived ETag."""
+    __slots__ = ('data', 'content_type', 'etag')
+
+    def __init__(self, data, content_type, etag):
+        self.data = data
+        self.content_type = content_type
+        self.etag = etag
+
+class DiskImageCache:
+    """LRU image files under ``directory``, trimmed to ``max_bytes``. Counters are per process."""
+
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024, clock=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk, estimated from this process's writes between scans
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _count(self, field, delta=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def get(self, key):
+        """Return a CachedImage and mark it recently used, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            now = self._clock()
+            os.utime(path, (now, now))
+        except OSError:
+            self._count('misses')
+            return None
+        content_type = sniff_image_type(data)
+        if content_type is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return CachedImage(data, content_type, hashlib.sha1(data).hexdigest()[:20])
+
+    def put(self, key, data):
+        """Store image bytes (written atomically), trim the cache, and return the CachedImage."""
+        content_type = sniff_image_type(data)
+        if content_type is None:
+            raise ValueError("Not a supported image format")
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._count('writes')
+            with self._lock:
+                if self._size is not None:
+                    self._size += len(data)
+                over_budget = self._size is None or self._size > self.max_bytes
+            if over_budget:
+                self.trim()
+        except OSError as e:
+            logger.error(f"Image cache write failed for {key}: {e}")
+        return CachedImage(data, content_type, hashlib.sha1(data).hexdigest()[:20])
+
+    def _files(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def trim(self):
+        """Delete least recently used files until the directory fits in ``max_bytes``."""
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._size = total
+            self.evictions += evicted
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'directory': self.directory,
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'writes': self.writes,
+                'evictions': self.evictions
+            }
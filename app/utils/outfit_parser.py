@@ -0,0 +1,176 @@
+"""
+Single-pass parser for outfit recommendation responses.
+Turns a markdown response into a structured document (days with their title,
+date, sections, outfit items and search queries) by walking it once with
+precompiled patterns, instead of re-scanning the text with a separate regex
+for every piece the pipeline and templates need.
+"""
+import re
+from app.instrumentation import timed
+
+# **Day X (date): heading**
+DAY_PATTERN = re.compile(r'\*\*Day (\d+) ?(\([^)]+\))?:? ?([^\n\*]*)\*\*', re.IGNORECASE)
+# **Section Name:** optional text, at the start of a line
+SECTION_PATTERN = re.compile(r'\*\*([^*\n]+?):\*\*[ \t]*(.*)')
+# - Key: value
+ITEM_PATTERN = re.compile(r'[-*][ \t]*([A-Za-z ]+):[ \t]*(.+)')
+# **bold** or *emphasis*, converted by render_markdown in one substitution
+INLINE_PATTERN = re.compile(r'\*\*(.*?)\*\*|\*(.*?)\*')
+
+# Bump when render_markdown's output changes so stored day HTML is rendered again
+RENDERER_VERSION = 1
+
+OUTFIT_SECTION = 'complete outfit'
+SEARCH_SECTION = 'product searches'
+
+class Section:
+    """A bold-headed section of a day: its text lines and any ``- Key: value`` items."""
+    __slots__ = ('name', 'lines', 'items')
+
+    def __init__(self, name, lines=None, items=None):
+        self.name = name
+        self.lines = lines or []
+        self.items = items or []
+
+    @property
+    def text(self):
+        return '\n'.join(self.lines).strip()
+
+class OutfitDay:
+    """One parsed day of a response."""
+    __slots__ = ('number', 'date', 'heading', 'content', 'display_content', 'sections')
+
+    def __init__(self, number, date, heading, content, display_content, sections):
+        self.number = number
+        self.date = date
+        self.heading = heading
+        self.content = content
+        self.display_content = display_content
+        self.sections = sections
+
+    @property
+    def title(self):
+        date = f" ({self.date})" if self.date else ''
+        heading = f": {self.heading}" if self.heading else ''
+        return f"Day {self.number}{date}{heading}"
+
+    def section(self, name):
+        """The first section called ``name`` (case-insensitive), or None."""
+        name = name.lower()
+        return next((section for section in self.sections if section.name.lower() == name), None)
+
+    @property
+    def outfit_items(self):
+        """(item_type, description) pairs from the Complete Outfit section."""
+        section = self.section(OUTFIT_SECTION)
+        return list(section.items) if section else []
+
+    def search_queries(self, gender=None):
+        """Product search lines, prefixed with ``gender`` when they don't already start with it."""
+        section = self.section(SEARCH_SECTION)
+        queries = []
+        for line in (section.lines if section else []):
+            line = line.strip('-* ').strip()
+            if not line:
+                continue
+            if gender and not line.lower().startswith(gender.lower()):
+                line = f"{gender} {line}"
+            queries.append(line)
+        return queries
+
+    def to_dict(self):
+        """Day dict used by the pipeline and templates; content excludes the product searches."""
+        return {
+            'title': self.title,
+            'content': self.display_content,
+            'items': [{'category': kind, 'description': description} for kind, description in self.outfit_items]
+        }
+
+class OutfitDocument:
+    """A parsed response: any text before the first day, then the days in order."""
+    __slots__ = ('preamble', 'days')
+
+    def __init__(self, preamble, days):
+        self.preamble = preamble
+        self.days = days
+
+def parse_sections(body):
+    """
+    Walk a day's lines once, collecting its sections and the content shown to
+    users (everything except the Product Searches section).
+    Returns ``(sections, display_content)``.
+    """
+    sections = []
+    display_lines = []
+    current = None
+    hidden = False
+    for line in body.split('\n'):
+        stripped = line.strip()
+        # Cheap first-character checks keep the regexes off lines that can't match
+        header = SECTION_PATTERN.match(stripped) if stripped.startswith('**') else None
+        if header:
+            current = Section(header.group(1).strip())
+            if header.group(2):
+                current.lines.append(header.group(2))
+            sections.append(current)
+            hidden = current.name.lower() == SEARCH_SECTION
+        elif stripped.startswith('---'):
+            current = None
+            hidden = False
+        elif current is not None and stripped:
+            current.lines.append(stripped)
+            item = ITEM_PATTERN.match(stripped) if stripped[0] in '-*' else None
+            if item:
+                current.items.append((item.group(1).strip(), item.group(2).strip()))
+        if not hidden:
+            display_lines.append(line)
+    return sections, '\n'.join(display_lines).strip()
+
+def parse_day(match, body):
+    """OutfitDay from a DAY_PATTERN header match and the text that follows it."""
+    sections, display_content = parse_sections(body)
+    return OutfitDay(
+        number=match.group(1),
+        date=(match.group(2) or '').strip('()'),
+        heading=(match.group(3) or '').strip(),
+        content=body.strip(),
+        display_content=display_content,
+        sections=sections
+    )
+
+@timed('parse')
+def parse_response(text):
+    """Parse a whole response into an OutfitDocument."""
+    if not text:
+        return OutfitDocument('', [])
+    matches = list(DAY_PATTERN.finditer(text))
+    preamble = text[:matches[0].start()].strip() if matches else text.strip()
+    days = []
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        days.append(parse_day(match, text[match.end():end]))
+    return OutfitDocument(preamble, days)
+
+def render_markdown(text):
+    """The subset of markdown the templates use (bold, emphasis, line breaks) as HTML."""
+    if not text:
+        return text
+    text = INLINE_PATTERN.sub(
+        lambda m: f"<strong>{m.group(1)}</strong>" if m.group(1) is not None else f"<em>{m.group(2)}</em>",
+        text
+    )
+    return text.replace('\n', '<br>')
+
+def render_days_html(days):
+    """Pre-rendered HTML for each day's content, keyed by day title and tagged with the renderer version."""
+    return {
+        'version': RENDERER_VERSION,
+        'days': {day.get('title'): render_markdown(day.get('content', '')) for day in days}
+    }
+
+def stored_days_html(outfit_data):
+    """Day title -> HTML stored with a trip's outfit data, or None if missing or rendered by another version."""
+    rendered = outfit_data.get('rendered_html') if isinstance(outfit_data, dict) else None
+    if not isinstance(rendered, dict) or rendered.get('version') != RENDERER_VERSION:
+        return None
+    return rendered.get('days') or {}
@@ -0,0 +1,171 @@
+"""
+SQLite-backed cache shared by every worker process on a host.
+Entries survive restarts, expire after a TTL, can be served stale for a
+grace period while they are refreshed, and the least recently used rows are
+evicted once the cache grows past its size limit.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class CacheEntry:
+    """A cached value and whether it is still within its TTL."""
+    __slots__ = ('value', 'fresh', 'age')
+
+    def __init__(self, value, fresh, age):
+        self.value = value
+        self.fresh = fresh
+        self.age = age  # seconds since the value was stored
+
+class SQLiteCache:
+    """
+    JSON values in one SQLite table keyed by string. Several caches can share
+    a database file by using different ``table`` names.
+
+    Each thread gets its own connection; WAL mode lets the gunicorn workers
+    read while another writes. Counters are per process.
+    """
+
+    def __init__(self, path, max_entries=5000, stale_seconds=0, table='cache_entries', clock=None):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds  # how long past expiry an entry may still be served
+        self._clock = clock or time.time
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL,'
+                ' stored_at REAL NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL)'
+            )
+            conn.execute(f'CREATE INDEX IF NOT EXISTS ix_{self.table}_accessed_at ON {self.table} (accessed_at)')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, field, delta=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def get(self, key):
+        """
+        Return a CacheEntry, or None when the key is missing or past its stale window.
+        Expired entries inside the stale window come back with ``fresh`` False.
+        """
+        now = self._clock()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                f'SELECT value, stored_at, expires_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or row[2] + self.stale_seconds <= now:
+                self._count('misses')
+                return None
+            conn.execute(f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', (now, key))
+        except sqlite3.Error as e:
+            logger.error(f"Cache read failed for {key}: {e}")
+            self._count('misses')
+            return None
+
+        fresh = row[2] > now
+        self._count('hits' if fresh else 'stale_hits')
+        return CacheEntry(json.loads(row[0]), fresh, now - row[1])
+
+    def peek(self, key):
+        """
+        Like ``get``, for bookkeeping reads: the hit/miss counters and the
+        entry's LRU position are left as they were.
+        """
+        now = self._clock()
+        try:
+            row = self._connection().execute(
+                f'SELECT value, stored_at, expires_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Cache read failed for {key}: {e}")
+            return None
+        if row is None or row[2] + self.stale_seconds <= now:
+            return None
+        return CacheEntry(json.loads(row[0]), row[2] > now, now - row[1])
+
+    def set(self, key, value, ttl):
+        """Store a JSON-serializable value for ``ttl`` seconds, then trim to ``max_entries``."""
+        now = self._clock()
+        try:
+            conn = self._connection()
+            conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, stored_at, expires_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (key, json.dumps(value), now, now + ttl, now)
+            )
+            self._count('writes')
+            self._evict(conn, now)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"Cache write failed for {key}: {e}")
+
+    def _evict(self, conn, now):
+        # Drop entries past their stale window first, then least recently used ones
+        conn.execute(f'DELETE FROM {self.table} WHERE expires_at + ? <= ?', (self.stale_seconds, now))
+        overflow = conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                f'DELETE FROM {self.table} WHERE key IN ('
+                f' SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)', (overflow,)
+            )
+            self._count('evictions', overflow)
+
+    def delete(self, key):
+        self._connection().execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connection().execute(f'DELETE FROM {self.table}')
+        with self._lock:
+            self.hits = self.stale_hits = self.misses = self.writes = self.evictions = 0
+
+    def stats(self):
+        """Counters for the metrics endpoint."""
+        entries = 0
+        # Don't create the database file just to report on it
+        if getattr(self._local, 'conn', None) is not None or os.path.exists(self.path):
+            try:
+                entries = self._connection().execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'path': self.path,
+                'table': self.table,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.stale_hits) / lookups, 3) if lookups else None,
+                'writes': self.writes,
+                'evictions': self.evictions
+            }
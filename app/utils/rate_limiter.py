@@ -0,0 +1,138 @@
+"""
+Token-bucket rate limiting for upstream APIs.
+Bucket state lives in a local SQLite file, so every thread of every gunicorn
+worker (and the background job worker) on a host draws from the same
+buckets. Calls go out as fast as the provider allows and only wait when the
+bucket is empty.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import defaultdict
+from app.instrumentation import register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+def _limit(name, rate, burst):
+    """(tokens per second, burst size) for a provider, overridable from the environment."""
+    prefix = name.upper()
+    return (
+        float(os.getenv(f'{prefix}_RATE_PER_SEC', rate)),
+        float(os.getenv(f'{prefix}_RATE_BURST', burst)),
+    )
+
+DEFAULT_RATE_LIMITS = {
+    'serpapi': _limit('serpapi', 5, 10),
+    'weather': _limit('weather', 10, 10),
+    'openai': _limit('openai', 3, 5),
+    'dummyjson': _limit('dummyjson', 10, 20),
+}
+
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# Longest a caller waits for a token before going ahead anyway (and logging it)
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', 30))
+
+class RateLimiter:
+    """Named token buckets stored in SQLite and refilled continuously."""
+
+    def __init__(self, path, limits=None, max_wait=RATE_LIMIT_MAX_WAIT, clock=None, sleep=None):
+        self.path = path
+        self.limits = dict(limits or {})
+        self.max_wait = max_wait
+        self._clock = clock or time.time
+        self._sleep = sleep or time.sleep
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'overruns': 0})
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS token_buckets ('
+                ' name TEXT PRIMARY KEY,'
+                ' tokens REAL NOT NULL,'
+                ' updated_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def _take(self, name, rate, burst):
+        """
+        Refill the bucket and take one token if available.
+        Returns 0 on success, otherwise the seconds until a token will be available.
+        """
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front so two processes can't both spend the last token
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = self._clock()
+            row = conn.execute('SELECT tokens, updated_at FROM token_buckets WHERE name = ?', (name,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute('INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                         (name, tokens, now))
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def acquire(self, name):
+        """
+        Block until the ``name`` bucket has a token, then spend it.
+        Returns the seconds spent waiting. Unknown names and storage errors don't block.
+        """
+        if name not in self.limits:
+            return 0.0
+        rate, burst = self.limits[name]
+        waited = 0.0
+        while True:
+            try:
+                wait = self._take(name, rate, burst)
+            except sqlite3.Error as e:
+                logger.error(f"Rate limiter unavailable for {name}, not limiting: {e}")
+                wait = 0.0
+            if wait <= 0:
+                break
+            if waited + wait > self.max_wait:
+                logger.warning(f"Rate limit wait for {name} exceeded {self.max_wait}s, sending anyway")
+                self._record(name, waited, overrun=True)
+                return waited
+            self._sleep(wait)
+            waited += wait
+        self._record(name, waited)
+        return waited
+
+    def _record(self, name, waited, overrun=False):
+        with self._lock:
+            stats = self._stats[name]
+            stats['acquired'] += 1
+            stats['overruns'] += int(overrun)
+            if waited > 0:
+                stats['waited'] += 1
+                stats['wait_seconds'] = round(stats['wait_seconds'] + waited, 3)
+
+    def stats(self):
+        """Per-bucket configuration and this process's wait counters."""
+        with self._lock:
+            return {
+                name: dict(self._stats[name], rate_per_sec=rate, burst=burst)
+                for name, (rate, burst) in self.limits.items()
+            }
+
+rate_limiter = RateLimiter(
+    os.getenv('RATE_LIMIT_PATH', 'rate_limits.sqlite3'),
+    DEFAULT_RATE_LIMITS if RATE_LIMIT_ENABLED else {}
+)
+register_metrics_source('rate_limits', rate_limiter.stats)
@@ -0,0 +1,161 @@
+"""
+Request coalescing for identical upstream calls.
+When several threads ask for the same thing at once, one of them (the
+leader) makes the upstream call and the rest wait for and share its result.
+ProcessLock extends this across worker processes for calls whose result
+lands in a shared cache.
+"""
+import os
+import copy
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from app.instrumentation import register_metrics_source
+
+logger = logging.getLogger(__name__)
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key within this process."""
+
+    def __init__(self, name, copy_results=False):
+        self.name = name
+        # Followers get a deep copy when callers may mutate the shared result
+        self.copy_results = copy_results
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """Run ``func`` once per key at a time; concurrent callers with the same key share the outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result) if self.copy_results else call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
+
+_flights = {}
+
+def single_flight(name, copy_results=False):
+    """Get (or create) the named SingleFlight; its counters appear on /metrics."""
+    if name not in _flights:
+        _flights[name] = SingleFlight(name, copy_results)
+    return _flights[name]
+
+def flight_stats():
+    return {name: flight.stats() for name, flight in _flights.items()}
+
+register_metrics_source('singleflight', flight_stats)
+
+class ProcessLock:
+    """
+    Advisory per-key locks in a SQLite table, shared by every process on the host.
+    A lock expires after ``ttl`` seconds so a crashed holder can't block others.
+    """
+
+    def __init__(self, path, table='inflight_locks', ttl=30, poll_interval=0.1, clock=None, sleep=None):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid lock table name: {table}")
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._clock = clock or time.time
+        self._sleep = sleep or time.sleep
+        self._local = threading.local()
+        self.waits = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                ' key TEXT PRIMARY KEY,'
+                ' owner TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key):
+        """Take the lock for ``key``; False when another live holder has it. Errors fail open."""
+        now = self._clock()
+        try:
+            conn = self._connection()
+            conn.execute(f'DELETE FROM {self.table} WHERE key = ? AND expires_at <= ?', (key, now))
+            cursor = conn.execute(
+                f'INSERT OR IGNORE INTO {self.table} (key, owner, expires_at) VALUES (?, ?, ?)',
+                (key, self.owner, now + self.ttl)
+            )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            logger.error(f"Process lock unavailable for {key}: {e}")
+            return True
+
+    def release(self, key):
+        try:
+            self._connection().execute(f'DELETE FROM {self.table} WHERE key = ? AND owner = ?', (key, self.owner))
+        except sqlite3.Error as e:
+            logger.error(f"Could not release process lock for {key}: {e}")
+
+    def wait(self, key, timeout=None):
+        """Wait until ``key`` is released (or its lock expires); False on timeout."""
+        self.waits += 1
+        deadline = self._clock() + (self.ttl if timeout is None else timeout)
+        while self._clock() < deadline:
+            try:
+                row = self._connection().execute(
+                    f'SELECT expires_at FROM {self.table} WHERE key = ?', (key,)
+                ).fetchone()
+            except sqlite3.Error:
+                return False
+            if row is None or row[0] <= self._clock():
+                return True
+            self._sleep(self.poll_interval)
+        return False
@@ -8,6 +8,17 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///tripstylist.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Expose /metrics with per-stage latency percentiles for this worker process
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+    # Run recommendation generation in the background worker (worker.py)
+    RECOMMENDATION_JOBS_ENABLED = os.environ.get('RECOMMENDATION_JOBS_ENABLED', 'false').lower() == 'true'
+    # Stream each day to the browser as OpenAI generates it (inline mode only)
+    RECOMMENDATION_STREAMING_ENABLED = os.environ.get('RECOMMENDATION_STREAMING_ENABLED', 'false').lower() == 'true'
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2.0))
+    # How long a Server-Sent Events status stream stays open before the page reconnects
+    JOB_EVENTS_TIMEOUT = int(os.environ.get('JOB_EVENTS_TIMEOUT', 60))
+    # Shopping search backend: 'serpapi', or 'fake' for the offline fixture catalog (load tests)
+    SHOPPING_PROVIDER = os.environ.get('SHOPPING_PROVIDER', 'serpapi')
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -27,6 +38,7 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'  # In-memory database for tests
     WTF_CSRF_ENABLED = False
+    RECOMMENDATION_JOBS_ENABLED = False
 
 config = {
     'development': DevelopmentConfig,
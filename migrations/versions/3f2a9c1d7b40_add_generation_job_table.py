@@ -0,0 +1,48 @@
+"""add generation_job table
+
+Revision ID: 3f2a9c1d7b40
+Revises: 
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so the table may already exist
+    if sa.inspect(op.get_bind()).has_table('generation_job'):
+        return
+    op.create_table(
+        'generation_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('stage', sa.String(length=20), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('trip_id', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['trip_id'], ['trip.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_generation_job_status', 'generation_job', ['status'])
+    op.create_index('ix_generation_job_user_id', 'generation_job', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_generation_job_user_id', table_name='generation_job')
+    op.drop_index('ix_generation_job_status', table_name='generation_job')
+    op.drop_table('generation_job')
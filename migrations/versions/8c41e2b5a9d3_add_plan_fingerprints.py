@@ -0,0 +1,59 @@
+"""add plan fingerprints to trip and generation_job
+
+Revision ID: 8c41e2b5a9d3
+Revises: 3f2a9c1d7b40
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e2b5a9d3'
+down_revision = '3f2a9c1d7b40'
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def _unique_constraints(table):
+    return {constraint['name'] for constraint in sa.inspect(op.get_bind()).get_unique_constraints(table)}
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so fresh databases already have these columns
+    if 'plan_fingerprint' not in _columns('trip'):
+        with op.batch_alter_table('trip') as batch_op:
+            batch_op.add_column(sa.Column('plan_fingerprint', sa.String(length=64), nullable=True))
+    if 'ix_trip_plan_fingerprint' not in _indexes('trip'):
+        op.create_index('ix_trip_plan_fingerprint', 'trip', ['plan_fingerprint'])
+
+    job_columns = _columns('generation_job')
+    with op.batch_alter_table('generation_job') as batch_op:
+        if 'fingerprint' not in job_columns:
+            batch_op.add_column(sa.Column('fingerprint', sa.String(length=64), nullable=True))
+        if 'active_key' not in job_columns:
+            batch_op.add_column(sa.Column('active_key', sa.String(length=100), nullable=True))
+            batch_op.create_unique_constraint('uq_generation_job_active_key', ['active_key'])
+
+
+def downgrade():
+    # Tables made by create_all() before the model named this constraint have an
+    # unnamed one, which batch mode drops along with the column
+    named = 'uq_generation_job_active_key' in _unique_constraints('generation_job')
+    with op.batch_alter_table('generation_job') as batch_op:
+        if named:
+            batch_op.drop_constraint('uq_generation_job_active_key', type_='unique')
+        batch_op.drop_column('active_key')
+        batch_op.drop_column('fingerprint')
+    op.drop_index('ix_trip_plan_fingerprint', table_name='trip')
+    with op.batch_alter_table('trip') as batch_op:
+        batch_op.drop_column('plan_fingerprint')
@@ -0,0 +1,35 @@
+"""make trip.created_at NOT NULL
+
+Revision ID: a7c2e9d4b816
+Revises: f3b9d2e6a174
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c2e9d4b816'
+down_revision = 'f3b9d2e6a174'
+branch_labels = None
+depends_on = None
+
+
+def _nullable(table, column):
+    columns = {col['name']: col for col in sa.inspect(op.get_bind()).get_columns(table)}
+    return columns[column]['nullable']
+
+
+def upgrade():
+    # Trip pages are keyed on created_at, which a NULL never compares against.
+    # Trips without one sort as the oldest; create_all() databases are already NOT NULL.
+    op.execute("UPDATE trip SET created_at = '1970-01-01 00:00:00.000000' WHERE created_at IS NULL")
+    if _nullable('trip', 'created_at'):
+        with op.batch_alter_table('trip') as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('trip') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,216 @@
+"""move trip outfit data into trip_day and trip_shopping_item tables
+
+Revision ID: b7d4e1f0c2a6
+Revises: 8c41e2b5a9d3
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e1f0c2a6'
+down_revision = '8c41e2b5a9d3'
+branch_labels = None
+depends_on = None
+
+# Trips read and converted per query while backfilling
+BATCH_SIZE = 200
+
+NORMALIZED_KEYS = ('days', 'outfit_data', 'rendered_html')
+SHOPPING_ITEM_COLUMNS = ('title', 'price', 'source', 'thumbnail', 'link', 'product_id')
+
+# Standalone table definitions so the migration doesn't depend on the app's models
+metadata = sa.MetaData()
+trip = sa.Table(
+    'trip', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('outfit_data', sa.Text),
+)
+trip_day = sa.Table(
+    'trip_day', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('trip_id', sa.Integer),
+    sa.Column('position', sa.Integer),
+    sa.Column('title', sa.String),
+    sa.Column('content', sa.Text),
+    sa.Column('details', sa.Text),
+    sa.Column('rendered_html', sa.Text),
+    sa.Column('renderer_version', sa.Integer),
+)
+trip_shopping_item = sa.Table(
+    'trip_shopping_item', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('trip_day_id', sa.Integer),
+    sa.Column('position', sa.Integer),
+    sa.Column('title', sa.String),
+    sa.Column('price', sa.String),
+    sa.Column('source', sa.String),
+    sa.Column('thumbnail', sa.Text),
+    sa.Column('link', sa.Text),
+    sa.Column('product_id', sa.String),
+    sa.Column('purchase_options', sa.Text),
+    sa.Column('details', sa.Text),
+)
+
+
+def _tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def _dumps(value):
+    return json.dumps(value) if value else None
+
+
+def _backfill_trip(bind, trip_id, data):
+    """Insert rows for one trip's outfit data; returns the JSON left in trip.outfit_data."""
+    shopping = data.get('outfit_data') or {}
+    rendered = data.get('rendered_html') or {}
+    rendered_days = rendered.get('days') or {}
+    for position, day in enumerate(data['days']):
+        if not isinstance(day, dict):
+            continue
+        title = day.get('title')
+        html = rendered_days.get(title)
+        details = {key: value for key, value in day.items() if key not in ('title', 'content')}
+        day_id = bind.execute(trip_day.insert().values(
+            trip_id=trip_id,
+            position=position,
+            title=title,
+            content=day.get('content'),
+            details=_dumps(details),
+            rendered_html=html,
+            renderer_version=rendered.get('version') if html is not None else None,
+        )).inserted_primary_key[0]
+        items = (shopping.get(title) or {}).get('shopping') or []
+        for index, item in enumerate(items):
+            item = dict(item)
+            columns = {key: item.pop(key, None) for key in SHOPPING_ITEM_COLUMNS}
+            purchase_options = item.pop('purchase_options', None)
+            bind.execute(trip_shopping_item.insert().values(
+                trip_day_id=day_id,
+                position=index,
+                purchase_options=json.dumps(purchase_options) if purchase_options is not None else None,
+                details=_dumps(item),
+                **columns
+            ))
+    return _dumps({key: value for key, value in data.items() if key not in NORMALIZED_KEYS})
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so fresh databases already have these tables
+    tables = _tables()
+    if 'trip_day' not in tables:
+        op.create_table(
+            'trip_day',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('trip_id', sa.Integer(), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=300), nullable=True),
+            sa.Column('content', sa.Text(), nullable=True),
+            sa.Column('details', sa.Text(), nullable=True),
+            sa.Column('rendered_html', sa.Text(), nullable=True),
+            sa.Column('renderer_version', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['trip_id'], ['trip.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_trip_day_trip_id', 'trip_day', ['trip_id'])
+    if 'trip_shopping_item' not in tables:
+        op.create_table(
+            'trip_shopping_item',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('trip_day_id', sa.Integer(), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=500), nullable=True),
+            sa.Column('price', sa.String(length=50), nullable=True),
+            sa.Column('source', sa.String(length=200), nullable=True),
+            sa.Column('thumbnail', sa.Text(), nullable=True),
+            sa.Column('link', sa.Text(), nullable=True),
+            sa.Column('product_id', sa.String(length=100), nullable=True),
+            sa.Column('purchase_options', sa.Text(), nullable=True),
+            sa.Column('details', sa.Text(), nullable=True),
+            sa.ForeignKeyConstraint(['trip_day_id'], ['trip_day.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_trip_shopping_item_trip_day_id', 'trip_shopping_item', ['trip_day_id'])
+        op.create_index('ix_trip_shopping_item_product_id', 'trip_shopping_item', ['product_id'])
+
+    # Backfill in batches of trip ids; trips that already have day rows are skipped,
+    # so the migration can be rerun after an interruption
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(trip.c.id, trip.c.outfit_data)
+            .where(trip.c.id > last_id, trip.c.outfit_data.isnot(None))
+            .where(~sa.exists().where(trip_day.c.trip_id == trip.c.id))
+            .order_by(trip.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not batch:
+            break
+        for trip_id, outfit_data in batch:
+            try:
+                data = json.loads(outfit_data)
+            except ValueError:
+                continue
+            if isinstance(data, dict) and isinstance(data.get('days'), list):
+                rest = _backfill_trip(bind, trip_id, data)
+                bind.execute(trip.update().where(trip.c.id == trip_id).values(outfit_data=rest))
+        last_id = batch[-1][0]
+
+
+def _fold_trip(bind, trip_id, outfit_data):
+    """The outfit data JSON for one trip, rebuilt from its rows."""
+    data = json.loads(outfit_data) if outfit_data else {}
+    if not isinstance(data, dict):
+        data = {}
+    days = bind.execute(
+        sa.select(trip_day).where(trip_day.c.trip_id == trip_id).order_by(trip_day.c.position)
+    ).mappings().fetchall()
+    data['days'] = []
+    data['outfit_data'] = {}
+    rendered = {}
+    versions = set()
+    for day in days:
+        day_dict = json.loads(day['details']) if day['details'] else {}
+        day_dict.update(title=day['title'], content=day['content'])
+        data['days'].append(day_dict)
+        items = bind.execute(
+            sa.select(trip_shopping_item)
+            .where(trip_shopping_item.c.trip_day_id == day['id'])
+            .order_by(trip_shopping_item.c.position)
+        ).mappings().fetchall()
+        shopping = []
+        for item in items:
+            item_dict = json.loads(item['details']) if item['details'] else {}
+            item_dict.update({key: item[key] for key in SHOPPING_ITEM_COLUMNS})
+            if item['purchase_options'] is not None:
+                item_dict['purchase_options'] = json.loads(item['purchase_options'])
+            shopping.append(item_dict)
+        data['outfit_data'][day['title']] = {'content': day['content'], 'shopping': shopping}
+        rendered[day['title']] = day['rendered_html']
+        versions.add(day['renderer_version'])
+    if len(versions) == 1 and None not in versions:
+        data['rendered_html'] = {'version': versions.pop(), 'days': rendered}
+    return json.dumps(data)
+
+
+def downgrade():
+    bind = op.get_bind()
+    trip_ids = [row[0] for row in bind.execute(sa.select(trip_day.c.trip_id).distinct()).fetchall()]
+    for start in range(0, len(trip_ids), BATCH_SIZE):
+        batch = trip_ids[start:start + BATCH_SIZE]
+        rows = bind.execute(sa.select(trip.c.id, trip.c.outfit_data).where(trip.c.id.in_(batch))).fetchall()
+        for trip_id, outfit_data in rows:
+            bind.execute(trip.update().where(trip.c.id == trip_id)
+                         .values(outfit_data=_fold_trip(bind, trip_id, outfit_data)))
+
+    op.drop_index('ix_trip_shopping_item_product_id', table_name='trip_shopping_item')
+    op.drop_index('ix_trip_shopping_item_trip_day_id', table_name='trip_shopping_item')
+    op.drop_table('trip_shopping_item')
+    op.drop_index('ix_trip_day_trip_id', table_name='trip_day')
+    op.drop_table('trip_day')
@@ -0,0 +1,34 @@
+"""add summary to trip
+
+Revision ID: d2a8f3c91e57
+Revises: b7d4e1f0c2a6
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8f3c91e57'
+down_revision = 'b7d4e1f0c2a6'
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so fresh databases already have this column.
+    # Existing trips are left NULL; fetch_trips_by_user_orm fills each one in the
+    # first time its owner's trip list is shown.
+    if 'summary' not in _columns('trip'):
+        with op.batch_alter_table('trip') as batch_op:
+            batch_op.add_column(sa.Column('summary', sa.String(length=201), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('trip') as batch_op:
+        batch_op.drop_column('summary')
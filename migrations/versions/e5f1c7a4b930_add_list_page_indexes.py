@@ -0,0 +1,33 @@
+"""add indexes for keyset-paginated trip and closet lists
+
+Revision ID: e5f1c7a4b930
+Revises: d2a8f3c91e57
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f1c7a4b930'
+down_revision = 'd2a8f3c91e57'
+branch_labels = None
+depends_on = None
+
+
+def _indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # create_app() runs db.create_all(), which only creates indexes for new tables
+    if 'ix_trip_user_created' not in _indexes('trip'):
+        op.create_index('ix_trip_user_created', 'trip', ['user_id', 'created_at', 'id'])
+    if 'ix_closet_item_user_type_title' not in _indexes('closet_item'):
+        op.create_index('ix_closet_item_user_type_title', 'closet_item', ['user_id', 'item_type', 'title', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_closet_item_user_type_title', table_name='closet_item')
+    op.drop_index('ix_trip_user_created', table_name='trip')
@@ -0,0 +1,28 @@
+"""store trip created_at with microseconds on SQLite
+
+Revision ID: f3b9d2e6a174
+Revises: e5f1c7a4b930
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d2e6a174'
+down_revision = 'e5f1c7a4b930'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Trips used to get CURRENT_TIMESTAMP, which SQLite stores without the
+    # fractional seconds SQLAlchemy writes and binds. Trip page cursors compare
+    # created_at as a string there, so older rows are brought to the same format.
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("UPDATE trip SET created_at = created_at || '.000000' WHERE length(created_at) = 19")
+
+
+def downgrade():
+    # Both formats read back as the same datetime
+    pass
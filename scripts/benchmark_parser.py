@@ -0,0 +1,96 @@
+"""
+Benchmark the outfit response parser on a synthetic 30-day response.
+
+Compares the single-pass parser (app/utils/outfit_parser.py) with the
+previous multi-regex pipeline: split days, strip Product Searches per day,
+extract Complete Outfit items per day and run the template filter regexes.
+
+    python scripts/benchmark_parser.py [--days 30] [--repeat 200]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.outfit_parser import parse_response, render_markdown
+
+DAY_TEMPLATE = """**Day {n} (2025-07-{date:02d}): Walking tour and dinner in Lisbon, sunny and 82°F**
+
+**Weather Adjustments:** Sunscreen, a light layer for the evening breeze and *breathable* fabrics.
+
+**Complete Outfit:**
+- Top: White linen button-down shirt with rolled sleeves
+- Bottom: Navy chino shorts with a 7 inch inseam
+- Shoes: White leather sneakers with cushioned soles
+- Accessories: Polarized sunglasses, canvas tote bag and a straw fedora
+
+**Activity Considerations:** Comfortable for cobblestones and hills; smart enough for dinner.
+**Packing Notes:** Pack the sneakers and shorts; buy the straw hat locally.
+
+**Product Searches:**
+- Top: mens white linen button down shirt relaxed fit
+- Bottom: mens navy chino shorts 7 inch cotton stretch
+- Shoes: mens white leather sneakers cushioned
+- Accessories: polarized sunglasses, canvas tote, straw fedora
+
+"""
+
+# The pipeline the parser replaced, kept here for comparison
+LEGACY_DAY = re.compile(r'\*\*Day (\d+) ?(\([^)]+\))?:? ?([^\n\*]*)\*\*', re.IGNORECASE)
+LEGACY_PRODUCTS = re.compile(r'\*\*Product Searches:\*\*(.*?)(?=\n\*\*|\Z)', re.DOTALL)
+LEGACY_OUTFIT = re.compile(r'\*\*Complete Outfit:\*\*(.*?)(\*\*|$)', re.DOTALL)
+LEGACY_ITEM = re.compile(r'-\s*([A-Za-z ]+):\s*(.+)')
+
+def legacy_pipeline(text):
+    days = []
+    matches = list(LEGACY_DAY.finditer(text))
+    for idx, match in enumerate(matches):
+        end = matches[idx + 1].start() if idx + 1 < len(matches) else len(text)
+        content = text[match.end():end].strip()
+        LEGACY_PRODUCTS.search(content)
+        content = re.sub(
+            r"(\*\*Product Searches:\*\*|<strong>Product Searches:</strong>)(.|\n)*?(?=(<br><br><strong>|---|$))",
+            "", content, flags=re.IGNORECASE
+        )
+        outfit = LEGACY_OUTFIT.search(content)
+        items = LEGACY_ITEM.findall(outfit.group(1)) if outfit else []
+        html = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', content)
+        html = re.sub(r'\*(.*?)\*', r'<em>\1</em>', html).replace('\n', '<br>')
+        days.append((content, items, html))
+    return days
+
+def single_pass_pipeline(text):
+    days = []
+    for day in parse_response(text).days:
+        days.append((day.display_content, day.outfit_items, render_markdown(day.display_content)))
+    return days
+
+def benchmark(func, text, repeat):
+    func(text)  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - started) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    text = ''.join(DAY_TEMPLATE.format(n=n, date=(n - 1) % 28 + 1) for n in range(1, args.days + 1))
+    size_mb = len(text.encode('utf-8')) / 1e6
+    print(f"{args.days}-day response, {len(text):,} characters, {args.repeat} runs each")
+    results = {}
+    for name, func in (('legacy regexes', legacy_pipeline), ('single pass', single_pass_pipeline)):
+        seconds = benchmark(func, text, args.repeat)
+        results[name] = seconds
+        print(f"  {name:15s} {seconds * 1000:8.3f} ms/response  {1 / seconds:8.1f} responses/s  "
+              f"{size_mb / seconds:7.2f} MB/s")
+    print(f"  speedup: {results['legacy regexes'] / results['single pass']:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Tests for generating long trips as concurrent day-range completions.
+"""
+import unittest
+import sys
+import os
+import re
+import shutil
+import tempfile
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app.utils.persistent_cache import SQLiteCache
+from app.services import genai_service
+from app.services.recommendation_service import generation_chunks
+from app.models.weather import WeatherDay, WeatherSeries
+
+TRIP = {'city': 'Lisbon', 'region': 'PT', 'start_date': '2025-09-01', 'end_date': '2025-09-09',
+        'days': 9, 'activities': ['walking']}
+PROFILE = {'gender': 'men', 'age': 40}
+WEATHER = WeatherSeries([WeatherDay(f'2025-09-0{i}', 80, 65, 'Clear', 0) for i in range(1, 10)])
+
+def fake_completion(prompt, params=None):
+    """A response with a header for each day the prompt lists."""
+    days = re.findall(r'- Day (\d+): (\S+)', prompt)
+    return "Here you go!\n" + "\n".join(f"**Day {n} ({d}): Walking**\n- Top: tee" for n, d in days)
+
+class TestChunkedGeneration(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        path = os.path.join(self.tmpdir, 'completions.sqlite3')
+        for name, value in (('completion_cache', SQLiteCache(path, table='completion_cache')),
+                            ('similar_trip_cache', SQLiteCache(path, table='similar_trip_cache')),
+                            ('SIMILAR_TRIP_CACHE_ENABLED', True)):
+            patcher = patch.object(genai_service, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_plan_day_chunks(self):
+        """Test days are split into even ranges no longer than the chunk size"""
+        self.assertEqual(genai_service.plan_day_chunks(3, 4), [(1, 3)])
+        self.assertEqual(genai_service.plan_day_chunks(9, 4), [(1, 3), (4, 6), (7, 9)])
+        self.assertEqual(genai_service.plan_day_chunks(10, 4), [(1, 4), (5, 7), (8, 10)])
+
+    def test_chunk_prompts_cover_their_days(self):
+        """Test each chunk lists only its days and weather, with max_tokens sized to them"""
+        chunks = generation_chunks(TRIP, WEATHER)
+        self.assertEqual(len(chunks), 3)
+        prompt, params = chunks[1]
+        self.assertEqual(re.findall(r'- Day (\d+):', prompt), ['4', '5', '6'])
+        self.assertIn('2025-09-04: high 80', prompt)
+        self.assertNotIn('2025-09-01: high 80', prompt)
+        self.assertEqual(params['max_tokens'], genai_service.completion_params(3)['max_tokens'])
+
+        short = generation_chunks(dict(TRIP, end_date='2025-09-02'), WEATHER)
+        self.assertEqual(len(short), 1)
+        self.assertNotIn('This request covers only', short[0][0])
+
+    @patch('app.services.genai_service.request_completion', side_effect=fake_completion)
+    def test_chunks_merged_in_day_order(self, mock_request):
+        """Test chunk responses are joined in order without later chunks' preambles"""
+        response = genai_service.get_chunked_recommendations(generation_chunks(TRIP, WEATHER), (TRIP, PROFILE))
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertEqual(re.findall(r'\*\*Day (\d+)', response), [str(n) for n in range(1, 10)])
+        self.assertEqual(response.count('Here you go!'), 1)
+
+        # The merged trip is reusable by the similar-trip tier
+        later = dict(TRIP, start_date='2026-09-03', end_date='2026-09-11')
+        shifted = genai_service.get_chunked_recommendations(generation_chunks(later, WEATHER), (later, PROFILE))
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertIn('**Day 9 (2026-09-11)', shifted)
+
+    def test_failed_chunk_left_out(self):
+        """Test a failed chunk drops its days and keeps the trip out of the similar-trip cache"""
+        def flaky(prompt, params=None):
+            if '- Day 4:' in prompt:
+                return f"{genai_service.ERROR_PREFIX} timeout"
+            return fake_completion(prompt)
+
+        with patch('app.services.genai_service.request_completion', side_effect=flaky):
+            response = genai_service.get_chunked_recommendations(generation_chunks(TRIP, WEATHER), (TRIP, PROFILE))
+        self.assertEqual(re.findall(r'\*\*Day (\d+)', response), ['1', '2', '3', '7', '8', '9'])
+        self.assertIsNone(genai_service.cached_similar_trip((TRIP, PROFILE)))
+
+    @patch('app.services.genai_service.request_completion', side_effect=fake_completion)
+    def test_stream_yields_chunks_in_order(self, mock_request):
+        """Test the first chunk streams while the others are generated, in day order"""
+        chunks = generation_chunks(TRIP, WEATHER)
+        first_response = fake_completion(chunks[0][0])
+        with patch('app.services.genai_service.stream_recommendations', return_value=iter([first_response])):
+            response = ''.join(genai_service.stream_chunked_recommendations(chunks))
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(re.findall(r'\*\*Day (\d+)', response), [str(n) for n in range(1, 10)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Tests for the OpenAI completion cache and its similar-trip tier.
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app.utils.persistent_cache import SQLiteCache
+from app.services import genai_service
+
+TRIP = {'city': 'Miami', 'region': 'FL', 'start_date': '2025-07-20', 'end_date': '2025-07-21',
+        'activities': ['beach', 'dinner']}
+PROFILE = {'gender': 'female', 'age': 27}
+RESPONSE = "**Day 1 (2025-07-20): Beach**\n...\n**Day 2 (2025-07-21): Dinner**\n..."
+
+class TestCompletionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        path = os.path.join(self.tmpdir, 'completions.sqlite3')
+        for name, value in (('completion_cache', SQLiteCache(path, table='completion_cache')),
+                            ('similar_trip_cache', SQLiteCache(path, table='similar_trip_cache')),
+                            ('COMPLETION_CACHE_ENABLED', True),
+                            ('SIMILAR_TRIP_CACHE_ENABLED', True)):
+            patcher = patch.object(genai_service, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @patch('app.services.genai_service.request_completion', return_value=RESPONSE)
+    def test_identical_prompt_served_from_cache(self, mock_request):
+        """Test a repeated prompt is answered without calling OpenAI"""
+        before = genai_service.completion_cache_stats()['exact_hits']
+        self.assertEqual(genai_service.get_recommendations('prompt'), RESPONSE)
+        self.assertEqual(genai_service.get_recommendations('prompt'), RESPONSE)
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(genai_service.completion_cache_stats()['exact_hits'], before + 1)
+
+    @patch('app.services.genai_service.request_completion', return_value=RESPONSE)
+    def test_disabled_cache_counts_bypasses_not_misses(self, mock_request):
+        """Test calls with every tier disabled don't count as cache misses"""
+        before = genai_service.completion_cache_stats()
+        with patch.object(genai_service, 'COMPLETION_CACHE_ENABLED', False), \
+                patch.object(genai_service, 'SIMILAR_TRIP_CACHE_ENABLED', False):
+            genai_service.get_recommendations('prompt', similar_trip=(TRIP, PROFILE))
+        after = genai_service.completion_cache_stats()
+        self.assertEqual(after['misses'], before['misses'])
+        self.assertEqual(after['bypassed'], before['bypassed'] + 1)
+
+        genai_service.get_recommendations('prompt')
+        self.assertEqual(genai_service.completion_cache_stats()['misses'], before['misses'] + 1)
+
+    @patch('app.services.genai_service.request_completion')
+    def test_errors_not_cached(self, mock_request):
+        """Test an error response is retried next time"""
+        mock_request.return_value = f"{genai_service.ERROR_PREFIX} timeout"
+        genai_service.get_recommendations('prompt')
+        genai_service.get_recommendations('prompt')
+        self.assertEqual(mock_request.call_count, 2)
+
+    @patch('app.services.genai_service.request_completion', return_value=RESPONSE)
+    def test_similar_trip_reuses_response_with_shifted_dates(self, mock_request):
+        """Test a same-month trip with a nearby age gets the cached outfits on its own dates"""
+        genai_service.get_recommendations('prompt one', similar_trip=(TRIP, PROFILE))
+        later = dict(TRIP, start_date='2026-07-04', end_date='2026-07-05', activities=['Dinner', 'beach'])
+        response = genai_service.get_recommendations('prompt two', similar_trip=(later, {'gender': 'female', 'age': 31}))
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertIn('Day 1 (2026-07-04)', response)
+        self.assertIn('Day 2 (2026-07-05)', response)
+
+        longer = dict(TRIP, end_date='2025-07-22')
+        genai_service.get_recommendations('prompt three', similar_trip=(longer, PROFILE))
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_shift_is_single_pass(self):
+        """Test moving dates by one day doesn't shift a date twice"""
+        shifted = genai_service.shift_trip_dates('2025-07-20 2025-07-21', '2025-07-20', '2025-07-21', 2)
+        self.assertEqual(shifted, '2025-07-21 2025-07-22')
+
+    def test_age_bands(self):
+        self.assertEqual(genai_service.age_band('27'), '25-34')
+        self.assertEqual(genai_service.age_band(70), '65+')
+        self.assertEqual(genai_service.age_band(None), 'unknown')
+
+    def test_stream_uses_cache(self):
+        """Test a cached prompt streams the stored response without calling OpenAI"""
+        genai_service.store_completion('prompt', RESPONSE)
+        with patch.object(genai_service.client.chat.completions, 'create') as mock_create:
+            self.assertEqual(''.join(genai_service.stream_recommendations('prompt')), RESPONSE)
+        mock_create.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -107,7 +107,28 @@ class TestDatabaseService(unittest.TestCase):
         """Test trip retrieval with invalid user ID."""
         with self.assertRaises(DatabaseValidationError):
             fetch_trips_by_user_orm(999)  # Non-existent user
-    
+
+    def test_fetch_trips_by_user_orm_defers_content(self):
+        """Test trip lists read summaries instead of the large content columns."""
+        user_id = self.test_user.id
+        trip = Trip(user_id=user_id, city='Rome', region='Italy', weather='sunny',
+                    recommendations='**Day 1 (2025-05-01): Colosseum**\n- Top: linen shirt')
+        db.session.add(trip)
+        db.session.commit()
+        self.assertIsNone(trip.summary)
+        db.session.expunge_all()
+
+        trips = fetch_trips_by_user_orm(user_id)
+        self.assertEqual(trips[0]['summary'], 'Colosseum')
+        self.assertNotIn('recommendations', trips[0])
+
+        db.session.expunge_all()
+        with patch('app.models.trip.Trip.build_summary') as mock_summary:
+            fetch_trips_by_user_orm(user_id)
+        mock_summary.assert_not_called()
+        listed = db.session.get(Trip, trips[0]['id'])
+        self.assertTrue({'recommendations', 'weather', 'outfit_data'} <= db.inspect(listed).unloaded)
+
     def test_create_user_success(self):
         """Test successful user creation."""
         user = create_user(
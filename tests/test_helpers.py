@@ -5,7 +5,7 @@ import os
 # Add the parent directory to the path so we can import the app
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.utils.helpers import parse_daily_outfits
+from app.utils.helpers import parse_daily_outfits, IncrementalDayParser
 
 class TestHelpers(unittest.TestCase):
     def test_parse_daily_outfits_success(self):
@@ -56,5 +56,35 @@ class TestHelpers(unittest.TestCase):
         result = parse_daily_outfits(gpt_response)
         self.assertEqual(result, {})
 
+class TestIncrementalDayParser(unittest.TestCase):
+    RESPONSE = (
+        "Here is your plan.\n\n"
+        "**Day 1 (2025-07-20): Beach Day in Miami**\n\n"
+        "**Complete Outfit:**\n- Top: white linen shirt\n\n"
+        "**Day 2 (2025-07-21): Museum Visit**\n\n"
+        "**Complete Outfit:**\n- Shoes: white sneakers\n"
+    )
+
+    def test_matches_full_parse_for_any_chunking(self):
+        """Test streamed parsing yields the same days as parsing the whole response"""
+        expected = parse_daily_outfits(self.RESPONSE)
+        for size in (1, 4, 17, len(self.RESPONSE)):
+            parser = IncrementalDayParser()
+            days = []
+            for i in range(0, len(self.RESPONSE), size):
+                days.extend(parser.feed(self.RESPONSE[i:i + size]))
+            days.extend(parser.close())
+            self.assertEqual(days, expected)
+
+    def test_day_emitted_when_next_header_closes(self):
+        """Test a day is released as soon as the following day's header arrives"""
+        parser = IncrementalDayParser()
+        head, tail = self.RESPONSE.split("**Day 2")
+        self.assertEqual(parser.feed(head), [])
+        self.assertEqual(parser.feed("**Day 2 (2025-07-21): Muse"), [])
+        days = parser.feed("um Visit**\n")
+        self.assertEqual([d['title'] for d in days], ['Day 1 (2025-07-20): Beach Day in Miami'])
+        self.assertEqual([d['title'] for d in parser.close()], ['Day 2 (2025-07-21): Museum Visit'])
+
 if __name__ == '__main__':
     unittest.main()
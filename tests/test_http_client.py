@@ -0,0 +1,70 @@
+"""
+Tests for the shared outbound HTTP client.
+"""
+import unittest
+import sys
+import os
+import requests
+from unittest.mock import patch, Mock
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.http_client import HttpClient
+
+def fake_response(status_code, headers=None):
+    response = Mock(status_code=status_code)
+    response.headers = headers or {}
+    return response
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.client = HttpClient(connect_timeout=1, read_timeout=2, max_retries=2,
+                                 sleep=self.sleeps.append)
+
+    def test_default_timeout_applied(self):
+        """Test every request gets the configured connect/read timeout"""
+        with patch.object(self.client.session, 'request', return_value=fake_response(200)) as mock_request:
+            self.client.get('https://example.com/a')
+            self.assertEqual(mock_request.call_args.kwargs['timeout'], (1, 2))
+            self.client.get('https://example.com/a', timeout=5)
+            self.assertEqual(mock_request.call_args.kwargs['timeout'], 5)
+
+    def test_retries_idempotent_calls_with_backoff(self):
+        """Test 5xx responses and timeouts are retried, then the good response is returned"""
+        responses = [fake_response(503), requests.Timeout("slow"), fake_response(200)]
+        with patch.object(self.client.session, 'request', side_effect=responses):
+            response = self.client.get('https://example.com/a')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(all(0 <= delay <= self.client.backoff_max for delay in self.sleeps))
+
+        stats = self.client.stats()['hosts']['example.com']
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['retries'], 2)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_gives_up_after_max_retries(self):
+        """Test the last error is raised once retries are exhausted"""
+        with patch.object(self.client.session, 'request', side_effect=requests.ConnectionError("down")):
+            with self.assertRaises(requests.ConnectionError):
+                self.client.head('https://example.com/a')
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_non_idempotent_not_retried(self):
+        """Test POSTs are sent once even on a retryable status"""
+        with patch.object(self.client.session, 'request', return_value=fake_response(503)) as mock_request:
+            response = self.client.request('POST', 'https://example.com/a')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_retry_after_header_honoured(self):
+        """Test a numeric Retry-After caps at the max backoff"""
+        self.assertEqual(self.client.backoff(0, '1.5'), 1.5)
+        self.assertEqual(self.client.backoff(0, '600'), self.client.backoff_max)
+
+if __name__ == '__main__':
+    unittest.main()
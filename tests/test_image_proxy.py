@@ -0,0 +1,147 @@
+"""
+Tests for the image proxy and its on-disk cache.
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from unittest.mock import patch, Mock
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app import create_app
+from app.utils.cache import TTLCache
+from app.utils.image_cache import DiskImageCache, sniff_image_type
+from app.services import image_proxy
+
+GIF = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+       b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
+SOURCE = 'https://images.example.com/shorts.gif'
+
+def image_response(data=GIF, status=200):
+    return Mock(status_code=status, headers={}, iter_content=Mock(return_value=[data]))
+
+class TestDiskImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.now = [1000.0]
+        self.cache = DiskImageCache(self.tmpdir, max_bytes=len(GIF) * 2, clock=lambda: self.now[0])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_sniff_rejects_non_images(self):
+        """Test only known image signatures are accepted"""
+        self.assertEqual(sniff_image_type(GIF), 'image/gif')
+        self.assertIsNone(sniff_image_type(b'<html>nope</html>'))
+        with self.assertRaises(ValueError):
+            self.cache.put('k', b'<html>nope</html>')
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache stays within its byte budget by dropping the oldest use"""
+        for key in ('a', 'b'):
+            self.cache.put(key, GIF)
+            os.utime(self.cache._path(key), (self.now[0], self.now[0]))
+            self.now[0] += 10
+        self.assertEqual(self.cache.get('a').etag, self.cache.put('c', GIF).etag)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+class TestImageProxyRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name, value in (('image_cache', DiskImageCache(self.tmpdir)),
+                            ('failed_images', TTLCache()),
+                            ('is_public_host', lambda host: host == 'images.example.com')):
+            patcher = patch.object(image_proxy, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def proxy_url(self, url, size='thumb'):
+        with self.app.test_request_context():
+            return image_proxy.proxied_image_url(url, size)
+
+    @patch('app.services.image_proxy.image_http_client.get')
+    def test_fetched_once_then_served_from_cache(self, mock_get):
+        """Test the first request downloads the image and later ones hit disk or revalidate"""
+        mock_get.return_value = image_response()
+        url = self.proxy_url(SOURCE)
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.mimetype, 'image/gif')
+        self.assertEqual(first.data, GIF)
+        self.assertIn('immutable', first.headers['Cache-Control'])
+
+        again = self.client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('app.services.image_proxy.image_http_client.get')
+    def test_unsigned_and_private_urls_refused(self, mock_get):
+        """Test tampered signatures 404 and internal hosts are never fetched"""
+        url = self.proxy_url(SOURCE)
+        self.assertEqual(self.client.get(url.replace('shorts', 'other')).status_code, 404)
+
+        internal = 'http://169.254.169.254/latest/meta-data'
+        response = self.client.get(self.proxy_url(internal))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.headers['Location'], internal)
+        mock_get.assert_not_called()
+
+    def test_local_urls_left_alone(self):
+        """Test static and empty image URLs are not proxied"""
+        self.assertEqual(self.proxy_url('/static/images/womansmiling.png'), '/static/images/womansmiling.png')
+        self.assertIsNone(self.proxy_url(None))
+
+class TestImageFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.requests = []
+        requests = self.requests
+
+        class ImageHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.path)
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(GIF)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), ImageHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://localhost:{self.server.server_port}/shorts.gif'
+
+    def test_rebound_host_refused_at_connect(self):
+        """Test a host that passed the DNS check but connects to a private address gets no request"""
+        with patch.object(image_proxy, 'is_public_host', return_value=True):
+            with self.assertRaises(image_proxy.ImageProxyError):
+                image_proxy.fetch_image(self.url)
+        self.assertEqual(self.requests, [])
+
+    def test_public_peer_fetched(self):
+        """Test the vetted connection still downloads the image when its peer is allowed"""
+        with patch.object(image_proxy, 'is_public_host', return_value=True), \
+                patch.object(image_proxy, 'is_public_address', return_value=True):
+            self.assertEqual(image_proxy.fetch_image(self.url), GIF)
+        self.assertEqual(self.requests, ['/shorts.gif'])
+
+if __name__ == '__main__':
+    unittest.main()
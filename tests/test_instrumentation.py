@@ -0,0 +1,84 @@
+"""
+Tests for per-stage latency instrumentation.
+"""
+import unittest
+import sys
+import os
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app import create_app
+from app.instrumentation import (
+    span, timed, collect_timings, percentile, StageStats, stage_stats
+)
+from app.utils.concurrency import run_concurrently
+
+class TestInstrumentation(unittest.TestCase):
+    def test_spans_accumulate_per_stage(self):
+        """Test spans add wall time and call counts to the active collector"""
+        @timed('parse')
+        def parse():
+            return 'parsed'
+
+        with collect_timings() as timings:
+            with span('weather'):
+                pass
+            parse()
+            parse()
+
+        stages = timings.stages()
+        self.assertEqual(stages['weather'][1], 1)
+        self.assertEqual(stages['parse'][1], 2)
+        self.assertIn('parse=', timings.summary())
+
+    def test_spans_in_thread_pool_reach_caller_collector(self):
+        """Test spans recorded on pool threads count toward the calling request"""
+        def search():
+            with span('serpapi'):
+                return True
+
+        with collect_timings() as timings:
+            run_concurrently([(search, (), {}) for _ in range(4)], max_workers=4)
+
+        self.assertEqual(timings.stages()['serpapi'][1], 4)
+
+    def test_percentiles(self):
+        """Test nearest-rank percentiles over the sample window"""
+        samples = [i / 1000.0 for i in range(1, 101)]
+        self.assertEqual(percentile(samples, 50), 0.05)
+        self.assertEqual(percentile(samples, 99), 0.099)
+        self.assertEqual(percentile([], 50), 0.0)
+
+        stats = StageStats(window=10)
+        for i in range(20):
+            stats.record('openai', i / 1000.0)
+        summary = stats.summary()['openai']
+        self.assertEqual(summary['count'], 20)
+        self.assertEqual(summary['samples'], 10)
+        self.assertEqual(summary['p50_ms'], 14.0)
+
+    def test_server_timing_header(self):
+        """Test responses carry the request's stage timings"""
+        app = create_app('testing')
+        app.config['METRICS_ENABLED'] = True
+
+        @app.route('/_timed')
+        def timed_view():
+            with span('weather'):
+                pass
+            return 'ok'
+
+        client = app.test_client()
+        header = client.get('/_timed').headers['Server-Timing']
+        self.assertIn('weather;dur=', header)
+        self.assertIn('desc="1 call"', header)
+        self.assertIn('total;dur=', header)
+
+        metrics = client.get('/metrics').get_json()
+        self.assertIn('weather', metrics['stages'])
+
+if __name__ == '__main__':
+    unittest.main()
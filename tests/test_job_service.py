@@ -0,0 +1,230 @@
+"""
+Tests for the background recommendation job queue.
+"""
+import unittest
+import sys
+import os
+from unittest.mock import patch, Mock
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app import create_app, db
+from app.models.user import User
+from app.models.job import GenerationJob
+from app.models.trip import Trip
+from app.services.job_service import (
+    enqueue_job, claim_next_job, process_job, run_worker, get_job_for_user,
+    start_generation, complete_job, requeue_stale_jobs
+)
+from app.services.recommendation_service import plan_fingerprint
+from app.services.database_service import DatabaseValidationError, delete_trip_orm
+from sqlalchemy.exc import OperationalError
+from datetime import datetime, timedelta
+
+TRIP_DATA = {
+    'city': 'Miami', 'region': 'FL', 'start_date': '2025-07-20',
+    'end_date': '2025-07-21', 'days': 2, 'activities': ['beach']
+}
+USER_PROFILE = {'gender': 'female', 'age': 25}
+
+class TestJobService(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test database and app context."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.test_user = User(username='testuser', email='test@example.com', password='hashedpassword')
+        db.session.add(self.test_user)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_enqueue_and_claim(self):
+        """Test a queued job is claimed exactly once"""
+        job = enqueue_job(self.test_user.id, TRIP_DATA, USER_PROFILE)
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.get_payload()['trip_data']['city'], 'Miami')
+
+        claimed = claim_next_job('worker-1')
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.status, 'running')
+        self.assertEqual(claimed.worker_id, 'worker-1')
+        self.assertIsNone(claim_next_job('worker-2'))
+
+    def test_get_job_for_other_user(self):
+        """Test users can't read each other's jobs"""
+        job = enqueue_job(self.test_user.id, TRIP_DATA, USER_PROFILE)
+        with self.assertRaises(DatabaseValidationError):
+            get_job_for_user(job.id, self.test_user.id + 1)
+
+    @patch('app.services.job_service.save_recommendations')
+    @patch('app.services.job_service.generate_recommendations')
+    def test_process_job_success(self, mock_generate, mock_save):
+        """Test a processed job records stages and links the saved trip"""
+        stages = []
+
+        def fake_generate(trip_data, user_profile, on_stage=None):
+            for stage in ['weather', 'generating', 'parsing', 'shopping']:
+                on_stage(stage)
+                stages.append(db.session.get(GenerationJob, job.id).stage)
+            return {'template_data': {}, 'response': '', 'days': [], 'outfit_data': {}}
+        mock_generate.side_effect = fake_generate
+        mock_save.return_value = Mock(id=42)
+
+        job = enqueue_job(self.test_user.id, TRIP_DATA, USER_PROFILE)
+        job = claim_next_job()
+        process_job(job)
+
+        self.assertEqual(stages, ['weather', 'generating', 'parsing', 'shopping'])
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.trip_id, 42)
+        self.assertIsNotNone(job.finished_at)
+
+    @patch('app.services.job_service.generate_recommendations')
+    def test_process_job_failure(self, mock_generate):
+        """Test pipeline errors mark the job failed instead of crashing the worker"""
+        mock_generate.side_effect = RuntimeError("OpenAI timeout")
+        enqueue_job(self.test_user.id, TRIP_DATA, USER_PROFILE)
+        enqueue_job(self.test_user.id, dict(TRIP_DATA, city='Tampa'), USER_PROFILE)
+
+        processed = run_worker(once=True)
+
+        self.assertEqual(processed, 2)
+        statuses = [job.status for job in GenerationJob.query.all()]
+        self.assertEqual(statuses, ['failed', 'failed'])
+        self.assertEqual(GenerationJob.query.first().error, 'OpenAI timeout')
+
+    @patch('app.services.job_service.generate_recommendations', side_effect=RuntimeError("OpenAI timeout"))
+    def test_worker_survives_database_errors(self, mock_generate):
+        """Test a failed claim is logged and retried instead of stopping the worker"""
+        enqueue_job(self.test_user.id, TRIP_DATA, USER_PROFILE)
+        job = claim_next_job('worker-1')
+        locked = OperationalError('UPDATE generation_job', {}, Exception('database is locked'))
+        sleep = Mock()
+        with patch('app.services.job_service.claim_next_job', side_effect=[locked, job, None]) as mock_claim:
+            processed = run_worker('worker-1', poll_interval=5, once=True, sleep=sleep)
+
+        self.assertEqual(processed, 1)
+        self.assertEqual(mock_claim.call_count, 3)
+        sleep.assert_called_once_with(5)
+        self.assertEqual(GenerationJob.query.first().status, 'failed')
+
+    def test_recommendations_route_enqueues_job(self):
+        """Test the route returns immediately with a job when background mode is on"""
+        self.app.config['RECOMMENDATION_JOBS_ENABLED'] = True
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.test_user.id)
+            sess['trip_data'] = TRIP_DATA
+            sess['user_profile'] = USER_PROFILE
+
+        response = client.get('/recommendations')
+        job = GenerationJob.query.first()
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(f'/recommendations/jobs/{job.id}', response.headers['Location'])
+
+        status = client.get(f'/recommendations/jobs/{job.id}/status').get_json()
+        self.assertEqual(status['status'], 'queued')
+
+    def test_duplicate_plan_reuses_active_job(self):
+        """Test the same plan can't be generated twice at once"""
+        job, created = start_generation(self.test_user.id, TRIP_DATA, USER_PROFILE, inline=True)
+        self.assertTrue(created)
+        self.assertEqual(job.status, 'running')
+
+        same_plan = dict(TRIP_DATA, city=' miami ', activities=['Beach'])
+        duplicate, created = start_generation(self.test_user.id, same_plan, USER_PROFILE)
+        self.assertFalse(created)
+        self.assertEqual(duplicate.id, job.id)
+
+        # Once finished the plan can be generated again
+        complete_job(job, None)
+        again, created = start_generation(self.test_user.id, TRIP_DATA, USER_PROFILE)
+        self.assertTrue(created)
+        self.assertNotEqual(again.id, job.id)
+
+    def test_stale_active_job_is_released(self):
+        """Test an abandoned running job doesn't block its plan forever"""
+        job, _ = start_generation(self.test_user.id, TRIP_DATA, USER_PROFILE, inline=True)
+        job.started_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+
+        fresh, created = start_generation(self.test_user.id, TRIP_DATA, USER_PROFILE, inline=True)
+        self.assertTrue(created)
+        self.assertEqual(db.session.get(GenerationJob, job.id).status, 'failed')
+
+    def test_requeue_skips_inline_jobs(self):
+        """Test only worker jobs are requeued when stale; inline jobs stay with the web process"""
+        inline_job, _ = start_generation(self.test_user.id, TRIP_DATA, USER_PROFILE, inline=True)
+        enqueue_job(self.test_user.id, dict(TRIP_DATA, city='Lisbon'), USER_PROFILE)
+        worker_job = claim_next_job('worker-1')
+        started = datetime.utcnow() - timedelta(hours=1)
+        inline_job.started_at = worker_job.started_at = started
+        db.session.commit()
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(db.session.get(GenerationJob, worker_job.id).status, 'queued')
+        self.assertEqual(db.session.get(GenerationJob, inline_job.id).status, 'running')
+
+    def test_trip_with_completed_job_can_be_deleted(self):
+        """Test deleting a generated trip clears its job's reference instead of failing the foreign key"""
+        db.session.execute(db.text('PRAGMA foreign_keys=ON'))
+        trip = Trip(user_id=self.test_user.id, city='Miami', region='FL')
+        db.session.add(trip)
+        db.session.commit()
+        job, _ = start_generation(self.test_user.id, TRIP_DATA, USER_PROFILE, inline=True)
+        complete_job(job, trip.id)
+        trip_id = trip.id
+
+        self.assertTrue(delete_trip_orm(trip_id, self.test_user.id))
+        self.assertIsNone(db.session.get(Trip, trip_id))
+        job = db.session.get(GenerationJob, job.id)
+        self.assertEqual(job.status, 'completed')
+        self.assertIsNone(job.trip_id)
+
+    def _logged_in_client(self):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.test_user.id)
+            sess['trip_data'] = TRIP_DATA
+            sess['user_profile'] = USER_PROFILE
+        return client
+
+    @patch('app.routes.recommendations.generate_recommendations')
+    def test_repeat_plan_served_from_stored_trip(self, mock_generate):
+        """Test a repeated plan redirects to its stored trip unless regenerate is asked for"""
+        trip = Trip(user_id=self.test_user.id, city='Miami', region='FL',
+                    plan_fingerprint=plan_fingerprint(TRIP_DATA, USER_PROFILE))
+        db.session.add(trip)
+        db.session.commit()
+        client = self._logged_in_client()
+
+        response = client.get('/recommendations')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(f'/trip/{trip.id}/view', response.headers['Location'])
+        mock_generate.assert_not_called()
+
+        mock_generate.side_effect = RuntimeError("OpenAI timeout")
+        client.get('/recommendations?regenerate=1')
+        mock_generate.assert_called_once()
+        self.assertEqual(GenerationJob.query.one().status, 'failed')
+
+    def test_duplicate_request_waits_on_running_job(self):
+        """Test a second request for an in-flight plan is sent to its progress page"""
+        job, _ = start_generation(self.test_user.id, TRIP_DATA, USER_PROFILE, inline=True)
+        response = self._logged_in_client().get('/recommendations')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(f'/recommendations/jobs/{job.id}', response.headers['Location'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Tests for cached, concurrent product link health checks.
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import patch, Mock
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app import create_app, db
+from app.models.user import User
+from app.models.trip import Trip
+from app.utils.persistent_cache import SQLiteCache
+from app.services import link_health
+
+OUTFIT_DATA = {
+    'days': [{'title': 'Day 1'}],
+    'outfit_data': {'Day 1': {'shopping': [{
+        'title': 'Shorts', 'link': 'https://shop.example.com/ok',
+        'purchase_options': [
+            {'source': 'Shop', 'link': 'https://shop.example.com/ok'},
+            {'source': 'Other', 'link': 'https://other.example.com/gone'}
+        ]
+    }]}}
+}
+
+def fake_head(url, **kwargs):
+    return Mock(status_code=404 if 'gone' in url else 200)
+
+class TestLinkHealth(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.now = [1000.0]
+        cache = SQLiteCache(os.path.join(self.tmpdir, 'health.sqlite3'), stale_seconds=1000,
+                            table='link_health', clock=lambda: self.now[0])
+        patcher = patch.object(link_health, 'link_health_cache', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @patch('app.services.link_health.http_client.head', side_effect=fake_head)
+    def test_batch_checked_once_and_cached(self, mock_head):
+        """Test duplicate links are probed once and repeat checks hit the cache"""
+        urls = link_health.collect_outfit_links(OUTFIT_DATA)
+        self.assertEqual(urls, ['https://shop.example.com/ok', 'https://other.example.com/gone'])
+        health = link_health.check_links(urls + urls)
+        self.assertEqual(health, {'https://shop.example.com/ok': True, 'https://other.example.com/gone': False})
+        link_health.check_links(urls)
+        self.assertEqual(mock_head.call_count, 2)
+        self.assertEqual(link_health.cached_link_health(urls + ['https://new.example.com']),
+                         dict(health, **{'https://new.example.com': None}))
+
+    @patch('app.services.link_health.http_client.get')
+    @patch('app.services.link_health.http_client.head')
+    def test_head_refused_falls_back_to_get(self, mock_head, mock_get):
+        """Test hosts that reject HEAD are checked with a body-less GET"""
+        mock_head.return_value = Mock(status_code=405)
+        mock_get.return_value = Mock(status_code=200)
+        self.assertTrue(link_health.check_link('https://shop.example.com/item'))
+        self.assertTrue(mock_get.call_args.kwargs['stream'])
+
+    @patch('app.services.link_health.http_client.head', side_effect=fake_head)
+    def test_revalidation_rechecks_expired_links(self, mock_head):
+        """Test the background pass checks only saved links whose status is missing or expired"""
+        app = create_app('testing')
+        with app.app_context():
+            db.create_all()
+            user = User(username='testuser', email='test@example.com', password='hashedpassword')
+            db.session.add(user)
+            db.session.commit()
+            trip = Trip(user_id=user.id, city='Miami', region='FL')
+            trip.set_outfit_data(OUTFIT_DATA)
+            db.session.add(trip)
+            db.session.commit()
+
+            link_health.check_link('https://shop.example.com/ok')
+            summary = link_health.revalidate_trip_links()
+            self.assertEqual(summary, {'trips': 1, 'links': 2, 'checked': 1, 'broken': 1})
+
+            self.now[0] += link_health.LINK_HEALTH_BROKEN_TTL + 1
+            summary = link_health.revalidate_trip_links()
+            self.assertEqual(summary['checked'], 1)  # only the broken link has expired
+            # Only check_link's lookup is counted; freshness checks and page renders aren't
+            link_health.cached_link_health(['https://shop.example.com/ok'])
+            stats = link_health.link_health_cache.stats()
+            self.assertEqual((stats['hits'], stats['stale_hits'], stats['misses']), (0, 0, 1))
+            db.session.remove()
+            db.drop_all()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests for product link resolution.
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import patch, Mock
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.persistent_cache import SQLiteCache
+from app.services import link_resolver
+from app.services.link_resolver import (
+    is_retailer_product_url, resolve_redirect_link, resolve_links
+)
+
+def redirect_response(location=None, status_code=302):
+    response = Mock(status_code=status_code)
+    response.headers = {'Location': location} if location else {}
+    return response
+
+class TestLinkResolver(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        cache = SQLiteCache(os.path.join(self.tmpdir, 'links.sqlite3'), table='redirect_cache')
+        patcher = patch.object(link_resolver, 'link_cache', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_retailer_patterns(self):
+        """Test known retailer product URLs are recognised by host and path"""
+        self.assertTrue(is_retailer_product_url('https://www.amazon.com/Linen-Shorts/dp/B0ABC?tag=x'))
+        self.assertTrue(is_retailer_product_url('https://www.walmart.com/ip/12345'))
+        self.assertFalse(is_retailer_product_url('https://www.amazon.com/s?k=shorts'))
+        self.assertFalse(is_retailer_product_url('https://www.google.com/url?q=https://www.amazon.com/dp/B0'))
+
+    @patch('app.services.link_resolver.http_client.head')
+    def test_short_circuits_without_network(self, mock_head):
+        """Test retailer URLs and Google redirects resolve without HEAD requests"""
+        self.assertEqual(resolve_redirect_link('https://www.target.com/p/shirt/-/A-1?ref=x'),
+                         'https://www.target.com/p/shirt/-/A-1?ref=x')
+        self.assertEqual(resolve_redirect_link('https://www.google.com/url?url=https://shop.example/item'),
+                         'https://shop.example/item')
+        mock_head.assert_not_called()
+
+    @patch('app.services.link_resolver.http_client.head')
+    def test_resolution_cached(self, mock_head):
+        """Test a followed redirect chain is cached for the next lookup"""
+        mock_head.side_effect = [redirect_response('/item/1'), redirect_response(status_code=200)]
+        raw = 'https://click.example/track?id=1'
+        self.assertEqual(resolve_redirect_link(raw), 'https://click.example/item/1')
+        self.assertEqual(resolve_redirect_link(raw), 'https://click.example/item/1')
+        self.assertEqual(mock_head.call_count, 2)
+
+    @patch('app.services.link_resolver.http_client.head')
+    def test_resolve_links_batch(self, mock_head):
+        """Test a batch is deduplicated, resolved and cleaned"""
+        def fake_head(url, **kwargs):
+            if url == 'https://click.example/a':
+                return redirect_response('https://www.amazon.com/gp/product/B0XYZ/ref=abc')
+            return redirect_response(status_code=200)
+        mock_head.side_effect = fake_head
+
+        links = resolve_links([
+            'https://click.example/a', 'https://click.example/a', None,
+            'https://shop.example/item?utm_source=serp'
+        ])
+        self.assertEqual(links, {
+            'https://click.example/a': 'https://www.amazon.com/dp/B0XYZ',
+            'https://shop.example/item?utm_source=serp': 'https://shop.example/item',
+        })
+        # The duplicate is followed once; the Amazon hop ends the chain without another HEAD
+        self.assertEqual(mock_head.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
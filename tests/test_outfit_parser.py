@@ -0,0 +1,76 @@
+"""
+Tests for the single-pass outfit response parser.
+"""
+import unittest
+import sys
+import os
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.outfit_parser import parse_response, render_markdown
+
+RESPONSE = """Here is your plan.
+
+**Day 1 (2025-07-20): Beach Day in Miami**
+
+**Weather Adjustments:** Sunscreen and a *light* hat.
+
+**Complete Outfit:**
+- Top: white linen shirt
+- Shoes: **white** sneakers
+
+**Packing Notes:** Pack everything.
+
+**Product Searches:**
+- Top: linen shirt
+- Shoes: women white sneakers
+
+---
+
+**Day 2: Museum Visit**
+**Complete Outfit:**
+- Bottom: denim shorts
+"""
+
+class TestOutfitParser(unittest.TestCase):
+
+    def test_document_structure(self):
+        """Test days, titles, dates, sections and items come out of one parse"""
+        document = parse_response(RESPONSE)
+        self.assertEqual(document.preamble, 'Here is your plan.')
+        first, second = document.days
+        self.assertEqual(first.title, 'Day 1 (2025-07-20): Beach Day in Miami')
+        self.assertEqual(first.date, '2025-07-20')
+        self.assertEqual(second.title, 'Day 2: Museum Visit')
+        self.assertEqual([section.name for section in first.sections],
+                         ['Weather Adjustments', 'Complete Outfit', 'Packing Notes', 'Product Searches'])
+        self.assertEqual(first.section('weather adjustments').text, 'Sunscreen and a *light* hat.')
+        # Bold text inside an item doesn't end the Complete Outfit section
+        self.assertEqual(first.outfit_items, [('Top', 'white linen shirt'), ('Shoes', '**white** sneakers')])
+        self.assertEqual(first.search_queries('women'), ['women Top: linen shirt', 'women Shoes: women white sneakers'])
+        self.assertEqual(second.outfit_items, [('Bottom', 'denim shorts')])
+
+    def test_display_content_hides_product_searches(self):
+        """Test the shown content keeps every section except Product Searches"""
+        day = parse_response(RESPONSE).days[0]
+        self.assertNotIn('Product Searches', day.display_content)
+        self.assertNotIn('linen shirt\n- Shoes: women', day.display_content)
+        self.assertIn('**Packing Notes:** Pack everything.', day.display_content)
+        self.assertTrue(day.display_content.endswith('---'))
+        self.assertIn('Product Searches', day.content)
+
+    def test_empty_and_headerless_responses(self):
+        self.assertEqual(parse_response('').days, [])
+        document = parse_response('Sorry, no plan today.')
+        self.assertEqual(document.days, [])
+        self.assertEqual(document.preamble, 'Sorry, no plan today.')
+
+    def test_render_markdown(self):
+        """Test bold, emphasis and line breaks are converted in one pass"""
+        self.assertEqual(render_markdown('**Top:** a *light* shirt\nnext'),
+                         '<strong>Top:</strong> a <em>light</em> shirt<br>next')
+        self.assertIsNone(render_markdown(None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+import time
+import threading
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+
+from app.services.outfit_service import build_outfit_data, extract_outfit_items, normalize_item_query
+from app.utils.concurrency import ProviderLimiter, run_concurrently
+from unittest.mock import patch
+
+DAY_ONE = """**Complete Outfit:**
+- Top: white linen shirt
+- Shoes: white sneakers
+
+**Activity Considerations:** Walking"""
+
+DAY_TWO = """**Complete Outfit:**
+- Bottom: denim shorts
+
+**Packing Notes:** Pack"""
+
+class TestOutfitService(unittest.TestCase):
+    def test_extract_outfit_items(self):
+        """Test extracting item lines from the Complete Outfit section"""
+        items = extract_outfit_items(DAY_ONE)
+        self.assertEqual(items, [('Top', 'white linen shirt'), ('Shoes', 'white sneakers')])
+        self.assertEqual(extract_outfit_items("No outfit here"), [])
+
+    @patch('app.services.outfit_service.get_shopping_items')
+    def test_build_outfit_data_preserves_order(self, mock_search):
+        """Test concurrent searches are mapped back to their day and item order"""
+        def fake_search(item_desc, gender, num_results=3):
+            # Finish the first item last to prove ordering doesn't depend on completion
+            if item_desc == 'white linen shirt':
+                time.sleep(0.05)
+            if item_desc == 'denim shorts':
+                return []
+            return [{'title': f"{gender} {item_desc}"}]
+        mock_search.side_effect = fake_search
+
+        days = [{'title': 'Day 1', 'content': DAY_ONE}, {'title': 'Day 2', 'content': DAY_TWO}]
+        outfit_data, timings, stats = build_outfit_data(days, 'women', max_workers=4)
+
+        self.assertEqual(list(outfit_data.keys()), ['Day 1', 'Day 2'])
+        self.assertEqual(
+            [p['title'] for p in outfit_data['Day 1']['shopping']],
+            ['women white linen shirt', 'women white sneakers']
+        )
+        # Empty results fall back to a placeholder entry
+        self.assertEqual(outfit_data['Day 2']['shopping'][0]['title'], 'denim shorts')
+        self.assertIsNone(outfit_data['Day 2']['shopping'][0]['link'])
+        self.assertEqual([t['query'] for t in timings],
+                         ['white linen shirt', 'white sneakers', 'denim shorts'])
+        self.assertGreaterEqual(timings[0]['seconds'], 0.05)
+
+    @patch('app.services.outfit_service.get_shopping_items')
+    def test_build_outfit_data_search_error(self, mock_search):
+        """Test a failing search doesn't abort the rest of the trip"""
+        mock_search.side_effect = RuntimeError("SerpAPI down")
+        outfit_data, timings, stats = build_outfit_data([{'title': 'Day 2', 'content': DAY_TWO}], 'men')
+        self.assertEqual(outfit_data['Day 2']['shopping'][0]['title'], 'denim shorts')
+        self.assertEqual(timings[0]['error'], 'SerpAPI down')
+
+    def test_normalize_item_query(self):
+        """Test equivalent queries normalize to the same key"""
+        self.assertEqual(normalize_item_query("Women's  White Sneakers", 'women'),
+                         normalize_item_query("sneakers, white"))
+        self.assertEqual(normalize_item_query("a crossbody bag"),
+                         normalize_item_query("Crossbody Bag", 'female'))
+        self.assertNotEqual(normalize_item_query("white sneakers"),
+                            normalize_item_query("black sneakers"))
+
+    @patch('app.services.outfit_service.get_shopping_items')
+    def test_build_outfit_data_deduplicates_across_days(self, mock_search):
+        """Test a query repeated across days is searched once and fanned back out"""
+        mock_search.return_value = [{'title': 'Sneaker', 'purchase_options': []}]
+        repeat = """**Complete Outfit:**
+- Shoes: White sneakers
+- Accessories: crossbody bag
+"""
+        days = [
+            {'title': 'Day 1', 'content': DAY_ONE},
+            {'title': 'Day 2', 'content': repeat},
+            {'title': 'Day 3', 'content': repeat},
+        ]
+        outfit_data, timings, stats = build_outfit_data(days, 'women')
+
+        self.assertEqual(mock_search.call_count, 3)
+        self.assertEqual(stats, {'item_searches': 6, 'upstream_searches': 3, 'searches_saved': 3})
+        self.assertEqual([t['deduplicated'] for t in timings], [False, False, True, False, True, True])
+        self.assertEqual(len(outfit_data['Day 3']['shopping']), 2)
+        # Fanned-out results are independent copies
+        outfit_data['Day 2']['shopping'][0]['title'] = 'Changed'
+        self.assertEqual(outfit_data['Day 3']['shopping'][0]['title'], 'Sneaker')
+
+class TestConcurrency(unittest.TestCase):
+    def test_provider_limiter_bounds_concurrency(self):
+        """Test no more than the configured number of calls hold a provider slot"""
+        limiter = ProviderLimiter({'serpapi': 2})
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def call():
+            with limiter.slot('serpapi'):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.02)
+                with lock:
+                    active.pop()
+
+        run_concurrently([(call, (), {}) for _ in range(6)], max_workers=6)
+        self.assertLessEqual(max(peak), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+"""
+Tests for keyset-paginated trip and closet lists.
+"""
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import patch
+from sqlalchemy.exc import IntegrityError
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app import create_app, db
+from app.models.user import User
+from app.models.trip import Trip
+from app.models.closet import ClosetItem
+from app.services.database_service import (
+    fetch_trips_page_orm, count_trips_orm, fetch_closet_page_orm, count_closet_items_orm,
+    DatabaseError, DatabaseValidationError
+)
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.test_user = User(username='testuser', email='test@example.com', password='hashedpassword')
+        db.session.add(self.test_user)
+        db.session.commit()
+        self.user_id = self.test_user.id
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.user_id)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_trips(self, count):
+        # Pairs of trips share a timestamp, so pages have to break ties on id
+        for n in range(count):
+            db.session.add(Trip(user_id=self.user_id, city=f'City {n}', region='R', summary='',
+                                created_at=datetime(2025, 1, 1 + n // 2)))
+        db.session.commit()
+
+    def test_trip_pages_cover_every_trip_once(self):
+        """Test trips are paged newest first without repeats or gaps"""
+        self.add_trips(7)
+        seen = []
+        cursor = None
+        while True:
+            trips, cursor = fetch_trips_page_orm(self.user_id, cursor, limit=3)
+            seen.extend(trip['city'] for trip in trips)
+            if not cursor:
+                break
+        self.assertEqual(seen, ['City 6', 'City 5', 'City 4', 'City 3', 'City 2', 'City 1', 'City 0'])
+        self.assertEqual(count_trips_orm(self.user_id), 7)
+
+    def test_trip_cursor_survives_deleting_last_trip(self):
+        """Test the next page still follows a cursor whose trip was deleted"""
+        self.add_trips(5)
+        first, cursor = fetch_trips_page_orm(self.user_id, limit=2)
+        self.assertEqual([trip['city'] for trip in first], ['City 4', 'City 3'])
+        db.session.delete(db.session.get(Trip, first[-1]['id']))
+        db.session.commit()
+
+        rest, cursor = fetch_trips_page_orm(self.user_id, cursor, limit=5)
+        self.assertEqual([trip['city'] for trip in rest], ['City 2', 'City 1', 'City 0'])
+        self.assertIsNone(cursor)
+
+    def test_trip_cursor_scoped_to_user(self):
+        """Test a cursor only pages the requesting user's trips"""
+        other = User(username='other', email='other@example.com', password='hashedpassword')
+        db.session.add(other)
+        db.session.commit()
+        db.session.add(Trip(user_id=other.id, city='Elsewhere', region='R', summary='',
+                            created_at=datetime(2025, 1, 2)))
+        self.add_trips(4)
+        first, cursor = fetch_trips_page_orm(self.user_id, limit=2)
+        rest, _ = fetch_trips_page_orm(self.user_id, cursor, limit=5)
+        self.assertEqual([trip['city'] for trip in first + rest], ['City 3', 'City 2', 'City 1', 'City 0'])
+
+    def test_trip_requires_created_at(self):
+        """Test a trip can't be stored without the timestamp its pages are keyed on"""
+        with self.assertRaises(IntegrityError):
+            db.session.execute(db.text("INSERT INTO trip (user_id, city, region, created_at) "
+                                       "VALUES (:user_id, 'Nowhen', 'R', NULL)"), {'user_id': self.user_id})
+        db.session.rollback()
+
+    def test_trips_with_default_timestamps_page_once(self):
+        """Test trips created without an explicit timestamp are paged without repeats"""
+        for n in range(5):
+            db.session.add(Trip(user_id=self.user_id, city=f'City {n}', region='R', summary=''))
+        db.session.commit()
+        seen = []
+        cursor = None
+        while True:
+            trips, cursor = fetch_trips_page_orm(self.user_id, cursor, limit=2)
+            seen.extend(trip['city'] for trip in trips)
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), [f'City {n}' for n in range(5)])
+
+    def test_closet_pages_in_type_title_order(self):
+        """Test closet items are paged by type and title, untyped items first"""
+        for title, item_type in [('Tee', 'top'), ('Boots', 'shoe'), ('Scarf', None), ('Blouse', 'top'),
+                                 ('Jeans', 'bottom')]:
+            db.session.add(ClosetItem(user_id=self.user_id, title=title, item_type=item_type))
+        db.session.commit()
+
+        first, cursor = fetch_closet_page_orm(self.user_id, limit=2)
+        second, cursor = fetch_closet_page_orm(self.user_id, cursor=cursor, limit=2)
+        third, cursor = fetch_closet_page_orm(self.user_id, cursor=cursor, limit=2)
+        self.assertEqual([item.title for item in first + second + third],
+                         ['Scarf', 'Jeans', 'Boots', 'Blouse', 'Tee'])
+        self.assertIsNone(cursor)
+
+        tops, _ = fetch_closet_page_orm(self.user_id, 'top')
+        self.assertEqual([item.title for item in tops], ['Blouse', 'Tee'])
+        self.assertEqual(count_closet_items_orm(self.user_id), {None: 1, 'bottom': 1, 'shoe': 1, 'top': 2})
+
+    def test_other_category_includes_untyped_items(self):
+        """Test the 'other' filter pages and counts untyped items, matching the closet header"""
+        for title, item_type in [('Scarf', None), ('Umbrella', 'other'), ('Tee', 'top')]:
+            db.session.add(ClosetItem(user_id=self.user_id, title=title, item_type=item_type))
+        db.session.commit()
+
+        items, _ = fetch_closet_page_orm(self.user_id, 'other')
+        self.assertEqual([item.title for item in items], ['Scarf', 'Umbrella'])
+        self.assertEqual(count_closet_items_orm(self.user_id, 'other'), {None: 1, 'other': 1})
+        response = self.client.get('/closet?filter=other')
+        self.assertIn(b'<span class="stat-number">2</span>', response.data)
+
+    def test_closet_page_survives_database_error(self):
+        """Test a database error renders an empty closet instead of a 500"""
+        with patch('app.routes.closet.fetch_closet_page_orm', side_effect=DatabaseError('locked')):
+            response = self.client.get('/closet')
+        self.assertEqual(response.status_code, 200)
+        with self.client.session_transaction() as sess:
+            self.assertIn(('error', 'Could not load your closet. Please try again.'), sess['_flashes'])
+
+    def test_invalid_cursor_rejected(self):
+        """Test a malformed cursor raises a validation error and a 400 from the endpoint"""
+        with self.assertRaises(DatabaseValidationError):
+            fetch_trips_page_orm(self.user_id, 'not-a-cursor')
+        response = self.client.get('/closet/items?cursor=bm90IGpzb24')
+        self.assertEqual(response.status_code, 400)
+
+    def test_trip_endpoint_pages_through_profile(self):
+        """Test the profile shows the first page and the JSON endpoint serves the rest"""
+        self.add_trips(12)
+        response = self.client.get('/profile')
+        self.assertIn(b'>City 11, R<', response.data)
+        self.assertNotIn(b'>City 1, R<', response.data)
+        self.assertIn(b'data-next-url="/profile/trips?cursor=', response.data)
+
+        next_url = '/profile/trips'
+        cities = []
+        while next_url:
+            data = self.client.get(next_url).get_json()
+            self.assertTrue(data['success'])
+            cities.extend(trip['location'] for trip in data['trips'])
+            next_url = data['next_url']
+        self.assertEqual(len(cities), 12)
+        self.assertIn('City 0, R', data['html'])
+
+    def test_closet_page_counts_without_loading_items(self):
+        """Test the closet page's totals come from counts while only the first page is rendered"""
+        for n in range(35):
+            db.session.add(ClosetItem(user_id=self.user_id, title=f'Tee {n:02d}', item_type='top'))
+        db.session.add(ClosetItem(user_id=self.user_id, title='Boots', item_type='shoe'))
+        db.session.commit()
+
+        response = self.client.get('/closet?filter=top')
+        self.assertIn(b'<span class="stat-number">35</span>', response.data)
+        self.assertIn(b'<span class="stat-number">36</span>', response.data)
+        self.assertIn(b'Tee 29', response.data)
+        self.assertNotIn(b'Tee 30', response.data)
+
+        data = self.client.get('/closet/items?filter=top&cursor=' +
+                               fetch_closet_page_orm(self.user_id, 'top')[1]).get_json()
+        self.assertEqual([item['title'] for item in data['items']], [f'Tee {n}' for n in range(30, 35)])
+        self.assertIsNone(data['next_url'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests for on-demand loading of additional purchase options.
+"""
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app import create_app, db
+from app.models.user import User
+from app.services import shopping_service
+from app.services.shopping_providers import SerpApiProvider, set_shopping_provider
+
+SHOPPING_RESPONSE = {'shopping_results': [{
+    'title': 'Linen Shorts', 'price': '$30', 'source': 'Target',
+    'link': 'https://www.target.com/p/linen-shorts/-/A-1', 'product_id': '12345'
+}]}
+PRODUCT_RESPONSE = {'sellers_results': {'online_sellers': [
+    {'name': 'Target', 'link': 'https://www.target.com/p/linen-shorts/-/A-1', 'price': '$30'},
+    {'name': 'Walmart', 'link': 'https://www.walmart.com/ip/linen-shorts/2', 'price': '$28'},
+]}}
+
+def fake_search(params):
+    return SHOPPING_RESPONSE if params['engine'] == 'google_shopping' else PRODUCT_RESPONSE
+
+class TestPurchaseOptions(unittest.TestCase):
+
+    def setUp(self):
+        previous = set_shopping_provider(SerpApiProvider(api_key='test-serp-key'))
+        self.addCleanup(set_shopping_provider, previous or 'serpapi')
+
+    @patch.object(shopping_service, 'DEFER_PURCHASE_OPTIONS', True)
+    @patch('app.services.shopping_providers.serpapi_search', side_effect=fake_search)
+    def test_deferred_search_skips_product_api(self, mock_search):
+        """Test the shopping search returns primary data only and flags deferred sellers"""
+        products = shopping_service.search_shopping_items('linen shorts', 'women', 1)
+        self.assertEqual([call.args[0]['engine'] for call in mock_search.call_args_list], ['google_shopping'])
+        self.assertEqual(products[0]['product_id'], '12345')
+        self.assertTrue(products[0]['purchase_options_deferred'])
+        self.assertEqual(len(products[0]['purchase_options']), 1)
+
+    @patch.object(shopping_service, 'DEFER_PURCHASE_OPTIONS', False)
+    @patch('app.services.shopping_providers.serpapi_search', side_effect=fake_search)
+    def test_eager_mode_still_fetches_sellers(self, mock_search):
+        """Test turning deferral off restores the eager product API call"""
+        products = shopping_service.search_shopping_items('linen shorts', 'women', 1)
+        self.assertEqual(mock_search.call_count, 2)
+        self.assertFalse(products[0]['purchase_options_deferred'])
+        self.assertEqual([o['source'] for o in products[0]['purchase_options']], ['Target', 'Walmart'])
+
+    @patch('app.services.shopping_providers.serpapi_search', side_effect=fake_search)
+    def test_get_purchase_options_excludes_primary(self, mock_search):
+        """Test the primary source is dropped and bad product ids are rejected"""
+        options = shopping_service.get_purchase_options('12345', exclude_sources=['target'])
+        self.assertEqual([o['source'] for o in options], ['Walmart'])
+        with self.assertRaises(ValueError):
+            shopping_service.get_purchase_options('../etc')
+
+class TestPurchaseOptionsRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.test_user = User(username='testuser', email='test@example.com', password='hashedpassword')
+        db.session.add(self.test_user)
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.test_user.id)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    @patch('app.routes.recommendations.get_purchase_options')
+    def test_endpoint_returns_options(self, mock_options):
+        """Test the JSON endpoint passes the excluded source through"""
+        mock_options.return_value = [{'source': 'Walmart', 'link': 'https://www.walmart.com/ip/2', 'price': '$28'}]
+        response = self.client.get('/recommendations/products/12345/purchase-options?exclude=Target')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['purchase_options'][0]['source'], 'Walmart')
+        mock_options.assert_called_once_with('12345', exclude_sources=['Target'])
+
+    def test_endpoint_rejects_invalid_product(self):
+        """Test a malformed product id is a 400, not an upstream call"""
+        response = self.client.get('/recommendations/products/bad%20id/purchase-options')
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Tests for the shared token-bucket rate limiter.
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.rate_limiter import RateLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'limits.sqlite3')
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def limiter(self, **kwargs):
+        return RateLimiter(self.path, {'serpapi': (2, 3)}, clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_burst_then_rate(self):
+        """Test the burst goes out immediately and later calls wait for the refill rate"""
+        limiter = self.limiter()
+        self.assertEqual([limiter.acquire('serpapi') for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(limiter.acquire('serpapi'), 0.5)
+        self.assertAlmostEqual(limiter.acquire('serpapi'), 0.5)
+        stats = limiter.stats()['serpapi']
+        self.assertEqual((stats['acquired'], stats['waited']), (5, 2))
+
+    def test_idle_time_refills_without_waiting(self):
+        """Test an idle bucket never makes callers wait"""
+        limiter = self.limiter()
+        for _ in range(3):
+            limiter.acquire('serpapi')
+        self.clock.now += 10
+        self.assertEqual([limiter.acquire('serpapi') for _ in range(3)], [0.0, 0.0, 0.0])
+
+    def test_shared_between_processes(self):
+        """Test two limiters on the same file (two workers) draw from one bucket"""
+        first, second = self.limiter(), self.limiter()
+        first.acquire('serpapi')
+        first.acquire('serpapi')
+        second.acquire('serpapi')
+        self.assertAlmostEqual(second.acquire('serpapi'), 0.5)
+
+    def test_unknown_provider_and_max_wait(self):
+        """Test unlimited names pass through and waits are capped"""
+        limiter = self.limiter(max_wait=0.1)
+        self.assertEqual(limiter.acquire('other'), 0.0)
+        for _ in range(3):
+            limiter.acquire('serpapi')
+        self.assertEqual(limiter.acquire('serpapi'), 0.0)
+        self.assertEqual(limiter.stats()['serpapi']['overruns'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Tests for the recommendation generation pipeline.
+"""
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app.services.recommendation_service import stream_generation, plan_fingerprint
+from app.models.weather import WeatherDay, WeatherSeries
+
+TRIP_DATA = {
+    'city': 'Miami', 'region': 'FL', 'start_date': '2025-07-20',
+    'end_date': '2025-07-21', 'days': 2, 'activities': ['beach']
+}
+USER_PROFILE = {'gender': 'women', 'age': 25}
+
+STREAMED = [
+    "**Day 1 (2025-07-20): Beach**\n**Complete Outfit:**\n- Top: linen shirt\n",
+    "**Product Searches:**\n- Top: women linen shirt\n",
+    "**Day 2 (2025-07-21): Museum**\n**Complete Outfit:**\n- Shoes: sneakers\n",
+]
+
+class TestStreamGeneration(unittest.TestCase):
+    @patch('app.services.recommendation_service.build_outfit_data')
+    @patch('app.services.recommendation_service.stream_recommendations')
+    @patch('app.services.recommendation_service.get_weather')
+    def test_events_in_order(self, mock_weather, mock_stream, mock_outfits):
+        """Test days are yielded as they close, before shopping and the final result"""
+        mock_weather.return_value = WeatherSeries([WeatherDay('2025-07-20', 85, 70, 'Sunny', 10)])
+        mock_stream.return_value = iter(STREAMED)
+        mock_outfits.return_value = ({'Day 1 (2025-07-20): Beach': {'content': '', 'shopping': []}}, [],
+                                      {'item_searches': 0, 'upstream_searches': 0, 'searches_saved': 0})
+
+        events = list(stream_generation(TRIP_DATA, USER_PROFILE))
+        kinds = [event[0] for event in events]
+
+        self.assertEqual(kinds, ['weather', 'day', 'day', 'generated', 'shopping', 'result'])
+        # Day 1 is released by the Day 2 header, before the stream finishes
+        self.assertEqual(events[1][1], 0)
+        self.assertEqual(events[1][2]['title'], 'Day 1 (2025-07-20): Beach')
+        self.assertNotIn('Product Searches', events[1][2]['content'])
+        result = events[-1][1]
+        self.assertEqual(result['response'], ''.join(STREAMED))
+        self.assertEqual(len(result['days']), 2)
+        self.assertEqual(str(result['template_data']['weather_summary']),
+                         "2025-07-20: high 85°F, low 70°F, Sunny (precip chance 10%)")
+
+class TestPlanFingerprint(unittest.TestCase):
+    def test_equivalent_plans_match(self):
+        """Test formatting differences don't change the fingerprint"""
+        reordered = {
+            'activities': ['Beach '], 'days': 2, 'end_date': '2025-07-21',
+            'start_date': '2025-07-20', 'region': 'fl', 'city': ' MIAMI'
+        }
+        self.assertEqual(plan_fingerprint(TRIP_DATA, USER_PROFILE),
+                         plan_fingerprint(reordered, {'age': '25', 'gender': 'Women'}))
+
+    def test_different_plans_differ(self):
+        """Test dates, activities and profile all change the fingerprint"""
+        base = plan_fingerprint(TRIP_DATA, USER_PROFILE)
+        self.assertNotEqual(base, plan_fingerprint(dict(TRIP_DATA, end_date='2025-07-22'), USER_PROFILE))
+        self.assertNotEqual(base, plan_fingerprint(dict(TRIP_DATA, activities=['hiking']), USER_PROFILE))
+        self.assertNotEqual(base, plan_fingerprint(TRIP_DATA, dict(USER_PROFILE, gender='men')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for day HTML rendered once and stored with a trip.
+"""
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app import create_app, db
+from app.models.user import User
+from app.models.trip import Trip
+from app.utils import outfit_parser
+
+TITLE = 'Day 1 (2025-07-20): Beach'
+OUTFIT_DATA = {
+    'days': [{'title': TITLE, 'content': '**Complete Outfit:**\n- Top: linen shirt'}],
+    'outfit_data': {TITLE: {'content': '**Complete Outfit:**\n- Top: linen shirt', 'shopping': []}}
+}
+
+class TestRenderedHtml(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.test_user = User(username='testuser', email='test@example.com', password='hashedpassword')
+        db.session.add(self.test_user)
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.test_user.id)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_trip(self, outfit_data):
+        trip = Trip(user_id=self.test_user.id, city='Miami', region='FL')
+        trip.set_outfit_data(outfit_data)
+        db.session.add(trip)
+        db.session.commit()
+        return trip.id
+
+    def test_rendered_on_first_view_then_reused(self):
+        """Test an older trip is rendered and stored once, then served without rendering"""
+        trip_id = self.add_trip(OUTFIT_DATA)
+        response = self.client.get(f'/trip/{trip_id}/view')
+        self.assertIn(b'<strong>Complete Outfit:</strong><br>- Top: linen shirt', response.data)
+        stored = db.session.get(Trip, trip_id).get_outfit_data()['rendered_html']
+        self.assertEqual(stored['version'], outfit_parser.RENDERER_VERSION)
+
+        with patch('app.routes.main.render_days_html') as mock_render:
+            response = self.client.get(f'/trip/{trip_id}/view')
+        mock_render.assert_not_called()
+        self.assertIn(b'<strong>Complete Outfit:</strong>', response.data)
+
+    def test_outdated_renderer_version_rerendered(self):
+        """Test HTML stored by another renderer version is ignored and replaced"""
+        stale = dict(OUTFIT_DATA, rendered_html={'version': 0, 'days': {TITLE: 'stale html'}})
+        trip_id = self.add_trip(stale)
+        response = self.client.get(f'/trip/{trip_id}/view')
+        self.assertNotIn(b'stale html', response.data)
+        self.assertEqual(db.session.get(Trip, trip_id).get_outfit_data()['rendered_html']['version'],
+                         outfit_parser.RENDERER_VERSION)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,7 +11,7 @@ from datetime import date, timedelta
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.schemas import (
-    UserRegistrationSchema, TripSchema, ClosetItemSchema,
+    UserRegistrationSchema, TripSchema, ClosetItemSchema, OutfitPlanSchema,
     validate_request_data
 )
 from marshmallow import ValidationError
@@ -154,5 +154,35 @@ class TestClosetSchema(unittest.TestCase):
         self.assertIsNotNone(errors)
         self.assertIn('category', errors)
 
+class TestOutfitPlanSchema(unittest.TestCase):
+    """Test the schema for structured outfit generation."""
+
+    def test_outfit_plan_valid(self):
+        """Test a generated plan loads, ignoring extra keys."""
+        data = {'days': [{
+            'day': 1, 'date': '2025-07-20', 'activity': 'Beach in Miami', 'mood': 'sunny',
+            'items': [{'category': 'Top', 'description': 'Linen shirt', 'search_query': 'white linen shirt'}]
+        }]}
+
+        validated_data, errors = validate_request_data(OutfitPlanSchema, data)
+
+        self.assertIsNone(errors)
+        self.assertEqual(validated_data['days'][0]['packing_notes'], '')
+        self.assertNotIn('mood', validated_data['days'][0])
+
+    def test_outfit_plan_invalid_item(self):
+        """Test unknown categories and days without items are rejected."""
+        data = {'days': [
+            {'day': 1, 'date': '2025-07-20', 'activity': 'Beach',
+             'items': [{'category': 'Hat', 'description': 'Straw hat', 'search_query': 'straw hat'}]},
+            {'day': 2, 'date': '2025-07-21', 'activity': 'Museum', 'items': []}
+        ]}
+
+        validated_data, errors = validate_request_data(OutfitPlanSchema, data)
+
+        self.assertIsNone(validated_data)
+        self.assertIn('category', errors['days'][0]['items'][0])
+        self.assertIn('items', errors['days'][1])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+"""
+Tests for the persistent SerpAPI response cache.
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+
+from app.utils.persistent_cache import SQLiteCache
+from app.services import serp_service
+
+SHOPPING_PARAMS = {'engine': 'google_shopping', 'q': "Women's  Linen Shorts", 'api_key': 'k1'}
+
+class TestSQLiteCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache.sqlite3')
+        self.now = [1000.0]
+        self.cache = SQLiteCache(self.path, max_entries=2, stale_seconds=50, clock=lambda: self.now[0])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_fresh_then_stale_then_gone(self):
+        """Test an entry is fresh within its TTL, stale in the grace window, then missing"""
+        self.cache.set('a', {'x': 1}, ttl=10)
+        self.assertTrue(self.cache.get('a').fresh)
+        self.now[0] += 20
+        entry = self.cache.get('a')
+        self.assertFalse(entry.fresh)
+        self.assertEqual(entry.value, {'x': 1})
+        self.now[0] += 50
+        self.assertIsNone(self.cache.get('a'))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['stale_hits'], stats['misses']), (1, 1, 1))
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry goes when the cache is full"""
+        self.cache.set('a', 1, ttl=100)
+        self.now[0] += 1
+        self.cache.set('b', 2, ttl=100)
+        self.now[0] += 1
+        self.cache.get('a')  # 'b' is now least recently used
+        self.now[0] += 1
+        self.cache.set('c', 3, ttl=100)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a').value, 1)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_peek_leaves_counters_and_lru_alone(self):
+        """Test a peek reads an entry without counting it or refreshing its LRU position"""
+        self.cache.set('a', 1, ttl=100)
+        self.now[0] += 1
+        self.cache.set('b', 2, ttl=100)
+        self.now[0] += 1
+        self.assertEqual(self.cache.peek('a').value, 1)
+        self.assertIsNone(self.cache.peek('missing'))
+        self.now[0] += 1
+        self.cache.set('c', 3, ttl=100)
+        self.assertIsNone(self.cache.peek('a'))  # still least recently used
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['stale_hits'], stats['misses']), (0, 0, 0))
+
+    def test_shared_between_instances(self):
+        """Test a second cache on the same file (another worker) sees stored entries"""
+        self.cache.set('a', [1, 2], ttl=100)
+        other = SQLiteCache(self.path, clock=lambda: self.now[0])
+        self.assertEqual(other.get('a').value, [1, 2])
+
+class TestSerpApiSearchCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = SQLiteCache(os.path.join(self.tmpdir, 'serp.sqlite3'), stale_seconds=3600)
+        patcher = patch.object(serp_service, 'serp_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(serp_service, 'SERP_CACHE_ENABLED', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_cache_key_normalizes_query(self):
+        """Test case, spacing and API key don't split the cache"""
+        other = {'engine': 'google_shopping', 'q': "women's linen shorts", 'api_key': 'k2'}
+        self.assertEqual(serp_service.serp_cache_key(SHOPPING_PARAMS), serp_service.serp_cache_key(other))
+        self.assertNotEqual(serp_service.serp_cache_key(SHOPPING_PARAMS),
+                            serp_service.serp_cache_key(dict(other, engine='google_images')))
+
+    @patch('app.services.serp_service.fetch_serpapi')
+    def test_repeat_query_served_from_cache(self, mock_fetch):
+        """Test a repeated search doesn't call SerpAPI again"""
+        mock_fetch.return_value = {'shopping_results': [{'title': 'Shorts'}]}
+        serp_service.serpapi_search(SHOPPING_PARAMS)
+        results = serp_service.serpapi_search(dict(SHOPPING_PARAMS, q='women\'s linen shorts'))
+        self.assertEqual(results['shopping_results'][0]['title'], 'Shorts')
+        self.assertEqual(mock_fetch.call_count, 1)
+
+    @patch('app.services.serp_service.fetch_serpapi')
+    def test_errors_not_cached(self, mock_fetch):
+        """Test SerpAPI error responses are retried next time"""
+        mock_fetch.return_value = {'error': 'Rate limited'}
+        serp_service.serpapi_search(SHOPPING_PARAMS)
+        serp_service.serpapi_search(SHOPPING_PARAMS)
+        self.assertEqual(mock_fetch.call_count, 2)
+
+    @patch('app.services.serp_service.fetch_serpapi')
+    def test_stale_result_served_when_refresh_fails(self, mock_fetch):
+        """Test an expired entry is served while a failing refresh leaves it in place"""
+        key = serp_service.serp_cache_key(SHOPPING_PARAMS)
+        self.cache.set(key, {'shopping_results': [{'title': 'Old'}]}, ttl=-1)
+        mock_fetch.side_effect = RuntimeError("SerpAPI down")
+
+        results = serp_service.serpapi_search(SHOPPING_PARAMS)
+        self.assertEqual(results['shopping_results'][0]['title'], 'Old')
+        for thread in list(serp_service.threading.enumerate()):
+            if thread.name != 'MainThread' and thread.daemon:
+                thread.join(timeout=2)
+        mock_fetch.assert_called_once()
+        self.assertEqual(self.cache.get(key).value['shopping_results'][0]['title'], 'Old')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for the pluggable shopping providers.
+"""
+import unittest
+import sys
+import os
+from unittest.mock import patch, Mock
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app import create_app
+from app.services import shopping_service, shopping_providers
+from app.services.shopping_providers import (
+    ShoppingProvider, FixtureShoppingProvider, SerpApiProvider, create_provider, get_shopping_provider, set_shopping_provider
+)
+
+class TestFixtureShoppingProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.provider = FixtureShoppingProvider(latency=0)
+
+    def test_search_is_deterministic_and_relevant(self):
+        """Test the same query returns the same best-matching products"""
+        first = self.provider.search_products("women's white leather sneakers", 3)
+        second = FixtureShoppingProvider(latency=0).search_products("women's white leather sneakers", 3)
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(first[0]['product_id'], 'fixture-white-sneakers')
+        self.assertNotIn('offers', first[0])
+
+    def test_offers_and_images(self):
+        """Test offers come from the catalog and unknown products have none"""
+        offers = self.provider.product_offers('fixture-white-sneakers')
+        self.assertTrue(offers)
+        self.assertNotIn('Amazon.com', [offer['name'] for offer in offers])
+        self.assertEqual(self.provider.product_offers('missing'), [])
+        self.assertTrue(self.provider.search_images('straw hat')[0]['thumbnail'].endswith('straw-hat.jpg'))
+
+    @patch('app.services.link_resolver.http_client.head')
+    def test_pipeline_runs_offline(self, mock_head):
+        """Test the shopping pipeline needs no network with the fake provider"""
+        previous = set_shopping_provider(self.provider)
+        self.addCleanup(set_shopping_provider, previous or 'serpapi')
+
+        products = shopping_service.search_shopping_items('linen shorts', 'women', 2)
+        options = shopping_service.get_purchase_options(products[0]['product_id'])
+        self.assertEqual(products[0]['link'], 'https://www.target.com/p/high-waisted-linen-shorts/-/A-90000007')
+        self.assertTrue(options)
+        mock_head.assert_not_called()
+
+class TestProviderSelection(unittest.TestCase):
+
+    def tearDown(self):
+        set_shopping_provider('serpapi')
+
+    def test_unknown_provider_rejected(self):
+        """Test a typo in SHOPPING_PROVIDER fails loudly"""
+        with self.assertRaises(ValueError):
+            create_provider('serpapii')
+
+    def test_incomplete_provider_rejected(self):
+        """Test a provider missing one of the interface methods can't be created"""
+        class ImagesOnly(ShoppingProvider):
+            def search_images(self, query):
+                return []
+
+        with self.assertRaises(TypeError):
+            ImagesOnly()
+
+    def test_app_config_selects_provider(self):
+        """Test init_app picks the provider named in the app config"""
+        shopping_providers.init_app(Mock(config={'SHOPPING_PROVIDER': 'fake'}))
+        self.assertIsInstance(get_shopping_provider(), FixtureShoppingProvider)
+        create_app('testing')
+        self.assertIsInstance(get_shopping_provider(), SerpApiProvider)
+
+if __name__ == '__main__':
+    unittest.main()
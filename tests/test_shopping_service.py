@@ -1,50 +1,68 @@
 import unittest
 import sys
 import os
+import shutil
+import tempfile
 
 # Add the parent directory to the path so we can import the app
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.services.shopping_service import get_overall_outfit_image, get_shopping_items
+from app.services.shopping_providers import SerpApiProvider, set_shopping_provider
+from app.services import serp_service, link_resolver, link_health
+from app.utils.persistent_cache import SQLiteCache
 from unittest.mock import patch, Mock
 
 class TestShoppingService(unittest.TestCase):
-    @patch('app.services.shopping_service.GoogleSearch')
-    @patch('os.getenv')
-    def test_get_overall_outfit_image_success(self, mock_getenv, mock_google_search):
+    def setUp(self):
+        # Searches and resolved links are cached in a scratch directory, not the working tree
+        self.tmpdir = tempfile.mkdtemp()
+        path = os.path.join(self.tmpdir, 'serp.sqlite3')
+        for module, name, cache in ((serp_service, 'serp_cache', SQLiteCache(path)),
+                                    (link_resolver, 'link_cache', SQLiteCache(path, table='redirect_cache')),
+                                    (link_health, 'link_health_cache', SQLiteCache(path, table='link_health'))):
+            patcher = patch.object(module, name, cache)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def use_provider(self, provider):
+        previous = set_shopping_provider(provider)
+        self.addCleanup(set_shopping_provider, previous or 'serpapi')
+
+    @patch('app.services.shopping_providers.serpapi_search')
+    def test_get_overall_outfit_image_success(self, mock_search):
         """Test successful outfit image retrieval"""
-        mock_getenv.return_value = 'test-serp-key'
-        
-        # Mock the GoogleSearch response
-        mock_search_instance = Mock()
-        mock_search_instance.get_dict.return_value = {
+        self.use_provider(SerpApiProvider(api_key='test-serp-key'))
+        mock_search.return_value = {
             "images_results": [
                 {"thumbnail": "http://example.com/image1.jpg"},
                 {"thumbnail": "http://example.com/image2.jpg"},
             ]
         }
-        mock_google_search.return_value = mock_search_instance
-        
+
         result = get_overall_outfit_image("summer dress", "female")
         self.assertEqual(result, "http://example.com/image1.jpg")
+        self.assertEqual(mock_search.call_args.args[0]['engine'], 'google_images')
 
-    @patch('os.getenv')
-    def test_get_overall_outfit_image_missing_key(self, mock_getenv):
+    @patch('app.services.shopping_providers.serpapi_search')
+    def test_get_overall_outfit_image_missing_key(self, mock_search):
         """Test handling missing SERP API key"""
-        mock_getenv.return_value = None
-        
+        self.use_provider(SerpApiProvider(api_key=''))
+
         result = get_overall_outfit_image("summer dress", "female")
         self.assertIsNone(result)
+        mock_search.assert_not_called()
 
-    @patch('app.services.shopping_service.GoogleSearch')
-    @patch('os.getenv')
-    def test_get_shopping_items_success(self, mock_getenv, mock_google_search):
+    @patch('app.services.link_resolver.http_client.head')
+    @patch('app.services.shopping_providers.serpapi_search')
+    def test_get_shopping_items_success(self, mock_search, mock_head):
         """Test successful shopping items retrieval"""
-        mock_getenv.return_value = 'test-serp-key'
-        
-        # Mock the GoogleSearch response
-        mock_search_instance = Mock()
-        mock_search_instance.get_dict.return_value = {
+        self.use_provider(SerpApiProvider(api_key='test-serp-key'))
+        mock_head.return_value = Mock(status_code=200, headers={})
+        mock_search.return_value = {
             "shopping_results": [
                 {
                     "title": "Summer Dress",
@@ -55,28 +73,30 @@ class TestShoppingService(unittest.TestCase):
                 },
                 {
                     "title": "Casual Dress",
-                    "price": "$39.99", 
-                    "link": "http://store.com/dress2",
+                    "price": "$39.99",
+                    "link": "https://serpapi.com/search.json?engine=google_product&product_id=2",
                     "thumbnail": "http://store.com/thumb2.jpg",
-                    "source": "Store B"
+                    "source": "Target"
                 }
             ]
         }
-        mock_google_search.return_value = mock_search_instance
-        
-        result = get_shopping_items("dress", "female", 2)
+
+        result = get_shopping_items("summer dress", "female", 2)
         self.assertEqual(len(result), 2)
         self.assertEqual(result[0]["title"], "Summer Dress")
         self.assertEqual(result[0]["price"], "$29.99")
         self.assertEqual(result[1]["title"], "Casual Dress")
+        # A SerpAPI API URL isn't a shopper-facing link; fall back to a store search
+        self.assertEqual(result[1]["link"], "https://www.target.com/s?searchTerm=Casual%20Dress")
 
-    @patch('os.getenv')
-    def test_get_shopping_items_missing_key(self, mock_getenv):
+    @patch('app.services.shopping_providers.serpapi_search')
+    def test_get_shopping_items_missing_key(self, mock_search):
         """Test handling missing SERP API key for shopping"""
-        mock_getenv.return_value = None
-        
+        self.use_provider(SerpApiProvider(api_key=''))
+
         result = get_shopping_items("dress", "female")
         self.assertEqual(result, [])
+        mock_search.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main()
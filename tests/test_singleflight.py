@@ -0,0 +1,119 @@
+"""
+Tests for single-flight request coalescing.
+"""
+import unittest
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+
+from app.utils.singleflight import SingleFlight, ProcessLock
+from app.services.weather_service import get_weather, weather_flight
+
+def run_together(count, func):
+    """Start ``count`` threads calling ``func`` at once and collect their results."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        results[index] = func()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        """Test concurrent callers with the same key make one call and share its result"""
+        flight = SingleFlight('test', copy_results=True)
+        calls = []
+
+        def slow_lookup():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'items': [1, 2]}
+
+        results = run_together(5, lambda: flight.do('key', slow_lookup))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result == {'items': [1, 2]} for result in results))
+        # Followers get copies, so one caller's edits can't leak to another
+        self.assertEqual(len({id(result) for result in results}), 5)
+        self.assertEqual(flight.stats(), {'leaders': 1, 'coalesced': 4, 'in_flight': 0})
+
+    def test_errors_shared_and_not_remembered(self):
+        """Test waiters see the leader's error and the next call runs again"""
+        flight = SingleFlight('test')
+        attempts = []
+
+        def failing():
+            attempts.append(1)
+            time.sleep(0.05)
+            raise RuntimeError("upstream down")
+
+        def call():
+            try:
+                return flight.do('key', failing)
+            except RuntimeError as e:
+                return str(e)
+
+        self.assertEqual(run_together(3, call), ['upstream down'] * 3)
+        self.assertEqual(flight.do('key', lambda: 'ok'), 'ok')
+        self.assertEqual(len(attempts), 1)
+
+    @patch('app.services.weather_service.load_weather')
+    def test_weather_lookups_coalesced(self, mock_load):
+        """Test identical concurrent weather lookups hit the service once"""
+        def slow_weather(*args):
+            time.sleep(0.1)
+            return 'series'
+        mock_load.side_effect = slow_weather
+        before = weather_flight.stats()['coalesced']
+
+        results = run_together(4, lambda: get_weather('Paris', 'France', '2025-07-20', '2025-07-21'))
+        self.assertEqual(results, ['series'] * 4)
+        self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(weather_flight.stats()['coalesced'] - before, 3)
+
+class TestProcessLock(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'locks.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_second_process_waits_for_release(self):
+        """Test only one holder per key and waiters are released with the lock"""
+        first = ProcessLock(self.path, ttl=5, poll_interval=0.01)
+        second = ProcessLock(self.path, ttl=5, poll_interval=0.01)
+        second.owner = 'other-worker'
+        self.assertTrue(first.acquire('k'))
+        self.assertFalse(second.acquire('k'))
+
+        threading.Timer(0.05, first.release, args=('k',)).start()
+        self.assertTrue(second.wait('k', timeout=2))
+        self.assertTrue(second.acquire('k'))
+
+    def test_expired_lock_taken_over(self):
+        """Test a crashed holder's lock expires"""
+        now = [100.0]
+        first = ProcessLock(self.path, ttl=5, clock=lambda: now[0])
+        second = ProcessLock(self.path, ttl=5, clock=lambda: now[0])
+        second.owner = 'other-worker'
+        first.acquire('k')
+        now[0] += 6
+        self.assertTrue(second.acquire('k'))
+
+if __name__ == '__main__':
+    unittest.main()
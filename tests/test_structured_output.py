@@ -0,0 +1,93 @@
+"""
+Tests for structured (function-calling) outfit generation.
+"""
+import unittest
+import sys
+import os
+import re
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app.utils.persistent_cache import SQLiteCache
+from app.utils.helpers import parse_daily_outfits, outfit_plan_days, render_outfit_plan
+from app.services import genai_service
+from app.services.recommendation_service import generate_recommendations
+from app.models.weather import WeatherSeries
+
+TRIP = {'city': 'Lisbon', 'region': 'PT', 'start_date': '2025-09-01', 'end_date': '2025-09-06',
+        'days': 6, 'activities': ['walking']}
+PROFILE = {'gender': 'men', 'age': 40}
+
+def plan_day(number, date):
+    return {
+        'day': number, 'date': date, 'activity': 'Walking in Lisbon',
+        'weather_adjustments': 'Sunscreen',
+        'items': [
+            {'category': 'Top', 'description': 'Linen shirt', 'search_query': 'white linen shirt'},
+            {'category': 'Shoes', 'description': 'Leather loafers', 'search_query': 'brown suede loafers'}
+        ],
+        'packing_notes': 'Pack'
+    }
+
+def fake_function_call(prompt, params=None):
+    """Arguments of a save_outfit_plan call covering the days the prompt lists."""
+    assert params['tool_choice']['function']['name'] == 'save_outfit_plan'
+    days = re.findall(r'- Day (\d+): (\S+)', prompt)
+    return json.dumps({'days': [plan_day(int(n), d) for n, d in days]})
+
+class TestStructuredOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        path = os.path.join(self.tmpdir, 'completions.sqlite3')
+        for target, name, value in (
+                (genai_service, 'completion_cache', SQLiteCache(path, table='completion_cache')),
+                (genai_service, 'similar_trip_cache', SQLiteCache(path, table='similar_trip_cache'))):
+            patcher = patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch('app.services.recommendation_service.STRUCTURED_OUTPUT', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_rendered_markdown_matches_parsed_format(self):
+        """Test markdown rendered from a plan parses back to the same days"""
+        days = outfit_plan_days([plan_day(1, '2025-09-01'), plan_day(2, '2025-09-02')])
+        self.assertEqual(days[0]['title'], 'Day 1 (2025-09-01): Walking in Lisbon')
+        parsed = parse_daily_outfits(render_outfit_plan(days))
+        self.assertEqual([day['title'] for day in parsed], [day['title'] for day in days])
+        self.assertIn('- Shoes: Leather loafers', days[0]['content'])
+
+    @patch('app.services.recommendation_service.build_outfit_data')
+    @patch('app.services.recommendation_service.get_weather', return_value=WeatherSeries.unavailable('n/a'))
+    @patch('app.services.genai_service.request_completion', side_effect=fake_function_call)
+    def test_pipeline_uses_structured_days(self, mock_request, mock_weather, mock_outfits):
+        """Test days and search queries come from the validated plan, not regexes"""
+        mock_outfits.return_value = ({}, [], {'item_searches': 0, 'upstream_searches': 0, 'searches_saved': 0})
+        result = generate_recommendations(TRIP, PROFILE)
+        self.assertEqual(mock_request.call_count, 2)  # 6 days in two chunks
+        self.assertEqual(len(result['days']), 6)
+        self.assertEqual(result['days'][5]['title'], 'Day 6 (2025-09-06): Walking in Lisbon')
+        self.assertEqual(result['days'][0]['items'][0]['search_query'], 'white linen shirt')
+        self.assertIn('**Product Searches:**\n- Top: white linen shirt', result['response'])
+
+    def test_invalid_chunk_not_cached(self):
+        """Test a plan failing validation is dropped and retried next time"""
+        chunks = [(genai_service.build_prompt_from_session(TRIP, structured=True), genai_service.completion_params(6))]
+        with patch('app.services.genai_service.request_completion', return_value='{"days": []}') as mock_request:
+            self.assertEqual(genai_service.get_outfit_plan(chunks), [])
+            self.assertEqual(genai_service.get_outfit_plan(chunks), [])
+        self.assertEqual(mock_request.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
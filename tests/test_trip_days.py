@@ -0,0 +1,133 @@
+"""
+Tests for trip days and shopping items stored as rows.
+"""
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SERPAPI_KEY', 'test-serp-key')
+os.environ.setdefault('OPENAI_API_KEY', 'test-openai-key')
+
+from app import create_app, db
+from app.models.user import User
+from app.models.trip import Trip, TripDay, TripShoppingItem
+from app.services.database_service import get_trip_by_id_orm
+from app.services import link_health
+from app.utils.persistent_cache import SQLiteCache
+
+TITLES = ['Day 1 (2025-07-20): Beach', 'Day 2 (2025-07-21): Museum']
+SHIRT = {
+    'title': 'Linen Shirt', 'price': '$29.99', 'thumbnail': 'https://img.example.com/shirt.jpg',
+    'source': 'Shop', 'rating': 4.5, 'reviews': 120, 'delivery': 'Free delivery',
+    'product_id': '123', 'link': 'https://shop.example.com/shirt',
+    'purchase_options': [{'source': 'Shop', 'link': 'https://shop.example.com/shirt', 'price': '$29.99'}],
+    'purchase_options_deferred': False
+}
+OUTFIT_DATA = {
+    'days': [
+        {'title': TITLES[0], 'content': '- Top: linen shirt', 'items': [{'category': 'Top', 'description': 'linen shirt'}]},
+        {'title': TITLES[1], 'content': '- Shoes: loafers'}
+    ],
+    'outfit_data': {
+        TITLES[0]: {'content': '- Top: linen shirt', 'shopping': [SHIRT]},
+        TITLES[1]: {'content': '- Shoes: loafers', 'shopping': []}
+    },
+    'rendered_html': {'version': 1, 'days': {TITLES[0]: 'day one', TITLES[1]: 'day two'}},
+    'overall_outfit_image': 'https://img.example.com/outfit.jpg'
+}
+
+class TestTripDays(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        cache = SQLiteCache(os.path.join(self.tmpdir, 'health.sqlite3'), table='link_health')
+        patcher = patch.object(link_health, 'link_health_cache', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.test_user = User(username='testuser', email='test@example.com', password='hashedpassword')
+        db.session.add(self.test_user)
+        db.session.commit()
+        self.user_id = self.test_user.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.tmpdir)
+
+    def add_trip(self, outfit_data):
+        trip = Trip(user_id=self.user_id, city='Miami', region='FL')
+        trip.set_outfit_data(outfit_data)
+        db.session.add(trip)
+        db.session.commit()
+        trip_id = trip.id
+        db.session.expunge_all()
+        return trip_id
+
+    def test_outfit_data_round_trip(self):
+        """Test outfit data saved as rows reads back unchanged, with only other keys left as JSON"""
+        trip_id = self.add_trip(OUTFIT_DATA)
+        self.assertEqual(TripDay.query.filter_by(trip_id=trip_id).count(), 2)
+        item = TripShoppingItem.query.one()
+        self.assertEqual(item.product_id, '123')
+        self.assertEqual(item.get_purchase_options(), SHIRT['purchase_options'])
+
+        trip = get_trip_by_id_orm(trip_id, self.user_id, full=True)
+        self.assertEqual(json.loads(trip.outfit_data), {'overall_outfit_image': OUTFIT_DATA['overall_outfit_image']})
+        self.assertEqual(trip.get_outfit_data(), OUTFIT_DATA)
+
+    def test_legacy_outfit_data_kept_as_json(self):
+        """Test data without a days list is stored and returned as JSON"""
+        trip_id = self.add_trip([{'title': TITLES[0], 'content': 'x'}])
+        trip = db.session.get(Trip, trip_id)
+        self.assertEqual(trip.days, [])
+        self.assertEqual(trip.get_outfit_data(), [{'title': TITLES[0], 'content': 'x'}])
+
+    def test_rendered_html_updated_in_place(self):
+        """Test storing rendered HTML keeps the existing day rows"""
+        trip_id = self.add_trip(dict(OUTFIT_DATA, rendered_html=None))
+        trip = db.session.get(Trip, trip_id)
+        day_ids = [day.id for day in trip.days]
+        self.assertNotIn('rendered_html', trip.get_outfit_data())
+
+        trip.set_rendered_html({'version': 1, 'days': {TITLES[0]: 'one', TITLES[1]: 'two'}})
+        db.session.commit()
+        self.assertEqual([day.id for day in trip.days], day_ids)
+        self.assertEqual(trip.get_outfit_data()['rendered_html']['days'][TITLES[1]], 'two')
+
+    def test_replacing_and_deleting_remove_rows(self):
+        """Test rows are removed when a trip's outfit data is replaced or the trip is deleted"""
+        trip_id = self.add_trip(OUTFIT_DATA)
+        trip = db.session.get(Trip, trip_id)
+        trip.set_outfit_data({'days': [{'title': TITLES[1], 'content': 'new'}], 'outfit_data': {}})
+        db.session.commit()
+        self.assertEqual([day.title for day in TripDay.query.all()], [TITLES[1]])
+        self.assertEqual(TripShoppingItem.query.count(), 0)
+
+        db.session.delete(trip)
+        db.session.commit()
+        self.assertEqual(TripDay.query.count(), 0)
+
+    def test_view_trip_shows_stored_days(self):
+        """Test the trip page renders days and shopping items from the rows"""
+        trip_id = self.add_trip(OUTFIT_DATA)
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.user_id)
+        response = client.get(f'/trip/{trip_id}/view')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'day one', response.data)
+        self.assertIn(b'Linen Shirt', response.data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,35 @@
 import unittest
 import sys
 import os
+import shutil
+import tempfile
 
 # Add the parent directory to the path so we can import the app
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.services.weather_service import get_weather_summary
+from app.services.weather_service import (
+    get_weather_summary, weather_cache, day_ttl, missing_ranges,
+    PAST_TTL, NORMALS_TTL
+)
+from app.utils.cache import TTLCache
+from app.utils.rate_limiter import RateLimiter, DEFAULT_RATE_LIMITS
+from app.models.weather import WeatherDay, WeatherSeries
+from datetime import date, timedelta
 from unittest.mock import patch, Mock
 
-class TestWeatherService(unittest.TestCase):
-    @patch('app.services.weather_service.requests.get')
+class IsolatedRateLimit:
+    """Mixin: weather calls take tokens from a limiter in a scratch directory."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        limiter = RateLimiter(os.path.join(self.tmpdir, 'limits.sqlite3'), DEFAULT_RATE_LIMITS)
+        patcher = patch('app.services.weather_service.rate_limiter', limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+class TestWeatherService(IsolatedRateLimit, unittest.TestCase):
+    @patch('app.services.weather_service.http_client.get')
     @patch('os.getenv')
     def test_get_weather_summary_success(self, mock_getenv, mock_get):
         """Test successful weather API call"""
@@ -33,7 +53,7 @@ class TestWeatherService(unittest.TestCase):
         )
         self.assertEqual(summary, expected)
 
-    @patch('app.services.weather_service.requests.get')
+    @patch('app.services.weather_service.http_client.get')
     @patch('os.getenv')
     def test_get_weather_summary_api_fail(self, mock_getenv, mock_get):
         """Test handling weather API failure"""
@@ -52,5 +72,102 @@ class TestWeatherService(unittest.TestCase):
         result = get_weather_summary("City", "Region", "2025-01-01", "2025-01-02")
         self.assertEqual(result, "Weather API key not configured.")
 
+def weather_day(day_date, high=80):
+    return {"datetime": day_date, "tempmax": high, "tempmin": 60,
+            "conditions": "Clear", "precipprob": 0}
+
+class TestWeatherCache(IsolatedRateLimit, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        weather_cache.clear()
+
+    @patch('app.services.weather_service.http_client.get')
+    @patch('os.getenv')
+    def test_overlapping_range_fetches_only_missing_days(self, mock_getenv, mock_get):
+        """Test cached days are reused and only the gap is requested"""
+        mock_getenv.return_value = 'test-weather-key'
+        first = Mock(status_code=200)
+        first.json.return_value = {"days": [weather_day("2025-07-20"), weather_day("2025-07-21")]}
+        second = Mock(status_code=200)
+        second.json.return_value = {"days": [weather_day("2025-07-22", high=90)]}
+        mock_get.side_effect = [first, second]
+
+        get_weather_summary("Paris", "France", "2025-07-20", "2025-07-21")
+        summary = get_weather_summary(" paris", "FRANCE ", "2025-07-20", "2025-07-22")
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertTrue(mock_get.call_args[0][0].endswith("/2025-07-22/2025-07-22"))
+        self.assertEqual(summary.splitlines()[2],
+                         "2025-07-22: high 90°F, low 60°F, Clear (precip chance 0%)")
+
+        # Fully cached range makes no request at all
+        get_weather_summary("Paris", "France", "2025-07-21", "2025-07-22")
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_missing_ranges(self):
+        """Test uncached dates are grouped into contiguous ranges"""
+        start = date(2025, 7, 1)
+        dates = [start + timedelta(days=i) for i in range(6)]
+        cached = {dates[2], dates[3]}
+        self.assertEqual(missing_ranges(dates, cached),
+                         [(dates[0], dates[1]), (dates[4], dates[5])])
+
+    def test_day_ttl_by_horizon(self):
+        """Test near forecasts expire sooner than distant or past days"""
+        today = date(2025, 7, 1)
+        tomorrow = day_ttl(today + timedelta(days=1), today=today)
+        next_week = day_ttl(today + timedelta(days=10), today=today)
+        self.assertLess(tomorrow, next_week)
+        self.assertEqual(day_ttl(today + timedelta(days=30), today=today), NORMALS_TTL)
+        self.assertEqual(day_ttl(today + timedelta(days=3), True, today), NORMALS_TTL)
+        self.assertEqual(day_ttl(today - timedelta(days=1), today=today), PAST_TTL)
+
+    def test_ttl_cache_expiry_and_lru(self):
+        """Test entries expire after their TTL and the oldest is evicted when full"""
+        now = [1000.0]
+        cache = TTLCache(max_entries=2, clock=lambda: now[0])
+        cache.set('a', 1, ttl=10)
+        cache.set('b', 2, ttl=100)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3, ttl=100)  # evicts 'b', the least recently used
+        self.assertIsNone(cache.get('b'))
+        now[0] += 20
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+class TestWeatherSeries(unittest.TestCase):
+    def setUp(self):
+        self.series = WeatherSeries([
+            WeatherDay.from_api({"datetime": "2025-07-20", "tempmax": 85, "tempmin": 70,
+                                 "conditions": "Sunny", "precipprob": 10}),
+            WeatherDay.from_api({"datetime": "2025-07-21", "tempmax": 80.5, "tempmin": 65,
+                                 "conditions": "Rain, Overcast", "precipprob": 60,
+                                 "source": "stats,normal"}),
+        ])
+
+    def test_numbers_without_parsing(self):
+        """Test downstream code can read values directly"""
+        self.assertEqual(self.series.max_high, 85)
+        self.assertEqual(self.series.min_low, 65)
+        self.assertTrue(self.series.days[1].normal)
+        self.assertTrue(str(self.series).endswith("(precip chance 60%) (historical average)"))
+
+    def test_json_round_trip_is_smaller_than_text(self):
+        """Test the stored form restores the same days and beats the summary string"""
+        stored = self.series.to_json()
+        restored = WeatherSeries.from_json(stored)
+        self.assertEqual(restored.days, self.series.days)
+        self.assertLess(len(stored.encode('utf-8')), len(str(self.series).encode('utf-8')))
+
+    def test_legacy_and_error_text(self):
+        """Test plain-text weather from older trips and failed lookups survives storage"""
+        legacy = "2025-07-20: high 85°F, low 70°F, Sunny (precip chance 10%)"
+        self.assertEqual(str(WeatherSeries.from_json(legacy)), legacy)
+        failed = WeatherSeries.unavailable("Weather API key not configured.")
+        self.assertEqual(str(WeatherSeries.from_json(failed.to_json())), "Weather API key not configured.")
+        self.assertFalse(WeatherSeries.from_json(None))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Background worker entry point for recommendation generation jobs.
+Run alongside the web process with: python worker.py
+"""
+import os
+import sys
+import argparse
+import logging
+
+# Ensure the app directory is in the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from app import create_app
+from app.services.job_service import run_worker
+from app.services.link_health import revalidate_trip_links
+
+def main():
+    parser = argparse.ArgumentParser(description='TripStylist Generation Worker')
+    parser.add_argument('--once', action='store_true',
+                        help='Process queued jobs and exit when the queue is empty')
+    parser.add_argument('--poll-interval', type=float, default=None,
+                        help='Seconds to wait between polls of an empty queue')
+    parser.add_argument('--revalidate-links', action='store_true',
+                        help='Recheck shopping links on recent saved trips and exit')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    app = create_app(os.getenv('FLASK_ENV', 'development'))
+    poll_interval = args.poll_interval or app.config['JOB_POLL_INTERVAL']
+    with app.app_context():
+        if args.revalidate_links:
+            print(revalidate_trip_links())
+            return
+        run_worker(poll_interval=poll_interval, once=args.once)
+
+if __name__ == '__main__':
+    main()